@@ -0,0 +1,137 @@
+import dis
+import subprocess
+import sys
+import threading
+
+from support import ROOT, add_rows, app_client, bearer, run, user
+
+# Checks GET /permissions/check and the access index behind it: grants and
+# revokes are seen on the next check, including those committed by another
+# process, of two overlapping loads the older never replaces the newer, and
+# checks made while loads run on another thread always see one whole load.
+# Usage: python Tests/access_index.py  (DB_MODE=async to check that stack)
+
+REVOKE = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from database import SessionLocal
+from models import Permission
+import table_versions
+db = SessionLocal()
+db.query(Permission).filter(Permission.competition_access == sys.argv[2]).delete()
+db.commit()
+db.close()
+"""
+
+
+class _Rows:
+    """Stands in for a Session in load(): returns fixed permission rows without a query."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, statement):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+def checks_during_loads(check, rounds: int = 200):
+    """Alternate loads that number the same competitions differently while another thread checks.
+
+    Before each attribute store in ``load`` the loading thread waits for the
+    checking thread to run a full check, so a check lands at every point
+    where a half-installed index could be seen.
+    """
+    from access_index import CompetitionAccessIndex
+
+    # User 1 holds X and not Y in both; the bit numbers of X and Y swap
+    sources = [_Rows([(1, "X"), (2, "Y")]), _Rows([(2, "Y"), (1, "X")])]
+    index = CompetitionAccessIndex()
+    index.load(sources[0], 0)
+    requested, answered, done = threading.Event(), threading.Event(), threading.Event()
+    checks, wrong = [], []
+
+    def reader():
+        while not done.is_set():
+            if requested.wait(0.1):
+                requested.clear()
+                checks.append(1)
+                if not index.has_access(1, "X") or index.has_access(1, "Y") or index.competitions(1) != ["X"]:
+                    wrong.append(1)
+                answered.set()
+
+    def trace(frame, event, arg):
+        if frame.f_code is not CompetitionAccessIndex.load.__code__:
+            return None
+        frame.f_trace_opcodes = True
+        return check_before_store
+
+    def check_before_store(frame, event, arg):
+        if event == "opcode" and frame.f_code.co_code[frame.f_lasti] == dis.opmap["STORE_ATTR"]:
+            requested.set()
+            answered.wait()
+            answered.clear()
+        return check_before_store
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    sys.settrace(trace)
+    try:
+        for version in range(1, rounds):
+            index.load(sources[version % 2], version)
+    finally:
+        sys.settrace(None)
+        done.set()
+        thread.join()
+    check(f"{len(checks)} checks made mid-load all see one whole load ({len(wrong)} wrong answers)",
+          checks and not wrong)
+
+
+def main(check, tmp: str):
+    from access_index import access_index
+    from database import SessionLocal
+    from models import User
+    from table_versions import table_versions
+
+    checks_during_loads(check)
+
+    with app_client() as client:
+        add_rows(user(i, "index", is_superuser=i == 0) for i in range(2))
+        db = SessionLocal()
+        member = db.query(User.id).filter(User.email == "index1@example.com").scalar()
+        db.close()
+        admin = bearer("index0@example.com")
+
+        def allowed(competition: str) -> bool:
+            response = client.get("/permissions/check", headers=admin,
+                                  params={"competition_access": competition, "user_id": member})
+            assert response.status_code == 200, response.text
+            return response.json()["allowed"]
+
+        check("nothing is allowed before a grant", not allowed("Finals"))
+        client.post("/permissions/assign", headers=admin, json={"user_id": member, "competition_access": "Finals"})
+        client.post("/permissions/assign/batch", headers=admin,
+                    json={"items": [{"user_id": member, "competition_access": "Semis"}]})
+        check("grants are seen on the next check", allowed("Finals") and allowed("Semis"))
+
+        client.request("DELETE", "/permissions/revoke/batch", headers=admin,
+                       json={"items": [{"user_id": member, "competition_access": "Semis"}]})
+        check("a revoke is seen on the next check", not allowed("Semis") and allowed("Finals"))
+
+        subprocess.run([sys.executable, "-c", REVOKE, ROOT, "Finals"], check=True)
+        check("a revoke committed by another process is seen on the next check", not allowed("Finals"))
+
+        # Two loads overlap: the one that read the older version finishes last
+        db = SessionLocal()
+        stale = table_versions(db, ("permissions",))[0]
+        client.post("/permissions/assign", headers=admin, json={"user_id": member, "competition_access": "Late"})
+        check("the newer load answers", allowed("Late"))
+        access_index.load(db, stale)
+        db.close()
+        check("an older load finishing later does not replace it", access_index.has_access(member, "Late"))
+
+
+if __name__ == "__main__":
+    run(main, "access")
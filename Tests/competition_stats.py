@@ -0,0 +1,173 @@
+import json
+import os
+from datetime import date
+
+from support import add_rows, app_client, bearer, in_session, registration, run, user
+
+# Checks GET /stats/competitions and the triggers behind it: after every kind
+# of write (register, import, single and batch permission changes, repository
+# create/move/delete, user edits and deletes) the stored totals equal a full
+# recount, and rebuild-competition-stats finds and repairs drift. The
+# database starts with rows written before competition_stats existed, as
+# when create_all adds the table to an older schema.
+# Usage: python Tests/competition_stats.py  (DB_MODE=async to check that stack)
+
+
+LEGACY_USERS = 5
+
+
+def seed_baseline(url: str):
+    """users, permissions and repositories as the pre-stats code left them, without any triggers."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.schema import CreateTable
+    from base import Base
+    import models  # noqa: F401
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for name in ("users", "permissions", "repositories"):
+            # CreateTable on its own fires no after_create DDL
+            connection.execute(CreateTable(Base.metadata.tables[name]))
+        for i in range(LEGACY_USERS):
+            connection.exec_driver_sql(
+                "INSERT INTO users (first_name, last_name, birth_date, email, phone_number, hashed_password, "
+                "competition, agreed_to_rules, team_signup, team_members, is_active, is_superuser) "
+                "VALUES ('Legacy', ?, '2005-01-01', ?, ?, 'x', 'Legacy', 1, ?, ?, 1, 0)",
+                (str(i), f"legacy{i}@example.com", f"5{i:09d}", i == 0, '["Old", "Timer"]' if i == 0 else "null"),
+            )
+        connection.exec_driver_sql(
+            "INSERT INTO permissions (user_id, competition_access) VALUES (1, 'Legacy Finals')")
+    engine.dispose()
+
+
+def main(check, tmp: str):
+    seed_baseline(os.environ["DATABASE_URL"])
+    from database import SessionLocal
+    from models import CompetitionStat, Repository, User
+    import competition_stats
+
+    def person(i: int, competition, team=None) -> dict:
+        return registration(i, "stat", competition=competition, team_signup=bool(team), team_members=team)
+
+    with app_client() as client:
+        add_rows([user(0, "admin", birth_date=date(1990, 1, 1), phone_number="9999999999", is_superuser=True)])
+        admin = bearer("admin0@example.com")
+
+        def stats() -> dict:
+            response = client.get("/stats/competitions", headers=admin)
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        def consistent(label: str):
+            drift = in_session(competition_stats.check_competition_stats)
+            check(f"{label}: stored totals match a recount", drift == [])
+            if drift:
+                print(f"    {drift}")
+
+        def entry(scope: str, competition: str) -> dict:
+            return next((e for e in stats()[scope] if e["competition"] == competition), None)
+
+        def uid(email: str) -> int:
+            return in_session(lambda db: db.query(User.id).filter(User.email == email).scalar())
+
+        check("stats are kept by triggers here", in_session(competition_stats.stats_maintained))
+        consistent("table created on a populated database")
+        legacy = entry("competitions", "Legacy")
+        check("rows written before the table existed are counted", legacy is not None
+              and legacy["registrants"] == LEGACY_USERS and legacy["team_members"] == 2
+              and entry("access", "Legacy Finals")["registrants"] == 1)
+        client.post("/repositories/", headers=bearer("legacy0@example.com"), json={
+            "repository_name": "old", "repository_url": "https://github.com/s/old"})
+        check("a later write adds to them", entry("competitions", "Legacy")["repositories"] == 1
+              and entry("access", "Legacy Finals")["repositories"] == 1)
+
+        client.post("/users/register", json=person(1, "Robotics"))
+        client.post("/users/register", json=person(2, "Robotics", ["Ann", "Ben"]))
+        client.post("/users/register", json=person(3, "Chemistry", ["Cal"]))
+        client.post("/users/register", json=person(4, None))
+        client.post("/users/register", json=person(1, "Robotics"))  # duplicate, ignored
+        consistent("register")
+        robotics = entry("competitions", "Robotics")
+        check("registrants and signups are counted", robotics is not None and robotics["registrants"] == 2
+              and robotics["team_signups"] == 1 and robotics["solo_signups"] == 1
+              and robotics["team_members"] == 2 and robotics["average_team_size"] == 3)
+        check("users without a competition are left out",
+              [e["competition"] for e in stats()["competitions"]] == ["Chemistry", "Legacy", "Robotics"])
+
+        roster = "\n".join(json.dumps(person(i, "Chemistry", ["X"] if i % 2 else None)) for i in range(5, 9))
+        client.post("/users/import?format=ndjson", content=roster, headers=admin)
+        consistent("import")
+        check("imported registrants are counted", entry("competitions", "Chemistry")["registrants"] == 5)
+
+        repository = client.post("/repositories/", headers=bearer("stat2@example.com"), json={
+            "repository_name": "arm", "repository_url": "https://github.com/s/arm"}).json()
+        client.post("/repositories/", headers=bearer("stat2@example.com"), json={
+            "repository_name": "leg", "repository_url": "https://github.com/s/leg"})
+        solo = client.post("/repositories/", headers=bearer("stat4@example.com"), json={
+            "repository_name": "solo", "repository_url": "https://github.com/s/solo"}).json()
+        consistent("repository create")
+        check("repositories are counted", entry("competitions", "Robotics")["repositories"] == 2)
+
+        stat2, stat3, stat4 = uid("stat2@example.com"), uid("stat3@example.com"), uid("stat4@example.com")
+        client.post("/permissions/assign", headers=admin, json={"user_id": stat2, "competition_access": "Finals"})
+        client.post("/permissions/assign/batch", headers=admin, json={"items": [
+            {"user_id": stat3, "competition_access": "Finals"}, {"user_id": stat4, "competition_access": "Finals"},
+            {"user_id": stat2, "competition_access": "Finals"}, {"user_id": 999, "competition_access": "Finals"},
+        ]})
+        consistent("permission assign")
+        finals = entry("access", "Finals")
+        check("access holders are counted with their repositories", finals is not None
+              and finals["registrants"] == 3 and finals["repositories"] == 3 and finals["team_members"] == 3)
+
+        client.put(f"/repositories/{repository['id']}", headers=bearer("stat2@example.com"),
+                   json={"description": "A description that changes no total"})
+        client.delete(f"/repositories/{repository['id']}", headers=bearer("stat2@example.com"))
+        consistent("repository update and delete")
+        check("a deleted repository is subtracted everywhere", entry("access", "Finals")["repositories"] == 2)
+
+        client.request("DELETE", "/permissions/revoke", headers=admin,
+                       json={"user_id": stat3, "competition_access": "Finals"})
+        client.request("DELETE", "/permissions/revoke/batch", headers=admin,
+                       json={"items": [{"user_id": stat4, "competition_access": "Finals"}]})
+        consistent("permission revoke")
+        check("revoked holders are subtracted", entry("access", "Finals")["registrants"] == 1)
+
+        db = SessionLocal()
+        edited = db.get(User, stat3)
+        edited.competition, edited.team_members = "Robotics", ["Cal", "Dee", "Eve"]
+        db.commit()
+        db.get(Repository, solo["id"]).user_id = stat3
+        db.commit()
+        consistent("user and repository owner edits")
+        check("an edited user moves between competitions", entry("competitions", "Robotics")["registrants"] == 3
+              and entry("competitions", "Robotics")["team_members"] == 5)
+
+        db.delete(db.get(User, stat2))
+        db.commit()
+        db.close()
+        consistent("user delete")
+        check("a competition whose last registrant left is not listed", entry("access", "Finals") is None)
+
+        maintained = stats()
+        competition_stats._maintained_engines.update(dict.fromkeys(competition_stats._maintained_engines, False))
+        check("the recount fallback answers the same", stats() == maintained)
+        competition_stats._maintained_engines.clear()
+
+        db = SessionLocal()
+        db.query(CompetitionStat).filter(CompetitionStat.competition == "Chemistry").update(
+            {"registrants": 42})
+        db.commit()
+        drift = competition_stats.check_competition_stats(db)
+        check("drift is reported", [(d["competition"], d["column"], d["stored"]) for d in drift]
+              == [("Chemistry", "registrants", 42)])
+        competition_stats.rebuild_competition_stats(db)
+        check("a rebuild repairs it", competition_stats.check_competition_stats(db) == [])
+        db.close()
+
+        check("only superusers see stats",
+              client.get("/stats/competitions", headers=bearer("stat1@example.com")).status_code == 403)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    run(main, "stats")
@@ -0,0 +1,88 @@
+import json
+
+from support import add_rows, app_client, bearer, registration, run, user
+
+# Checks the ETag / If-None-Match handling of the listings: an unchanged
+# listing answers 304 with no body, and every kind of write (ORM flush, Core
+# insert, bulk delete) invalidates exactly the listings it should. A failed
+# write must not, and one user's repositories do not affect another's.
+# Usage: python Tests/conditional_get.py  (DB_MODE=async to check that stack)
+
+
+def main(check, tmp: str):
+    with app_client() as client:
+        add_rows(user(i, "seed", is_superuser=i == 0) for i in range(3))
+        admin, member, other = (bearer(f"seed{i}@example.com") for i in range(3))
+
+        listings = {
+            "users": ("/users/retrieve", admin),
+            "users_sparse": ("/users/retrieve?fields=id,email", admin),
+            "repositories": ("/repositories/", member),
+            "permissions": ("/permissions/", admin),
+        }
+        etags = {}
+
+        def refresh():
+            for name, (url, headers) in listings.items():
+                etags[name] = client.get(url, headers=headers).headers["etag"]
+
+        def changed():
+            result = set()
+            for name, (url, headers) in listings.items():
+                response = client.get(url, headers={**headers, "If-None-Match": etags[name]})
+                if response.status_code == 200:
+                    result.add(name)
+                elif response.status_code != 304 or response.content:
+                    check(f"{name}: unexpected {response.status_code} with {len(response.content)} bytes", False)
+            return result
+
+        refresh()
+        check("ETags are weak", all(etag.startswith('W/"') for etag in etags.values()))
+        check("unchanged listings answer 304", changed() == set())
+        url, headers = listings["users"]
+        check("If-None-Match lists and * match",
+              client.get(url, headers={**headers, "If-None-Match": f'W/"other", {etags["users"]}'}).status_code == 304
+              and client.get(url, headers={**headers, "If-None-Match": "*"}).status_code == 304)
+        check("different query strings get different ETags",
+              len({etags["users"], etags["users_sparse"]}) == 2)
+        empty = client.get("/users/retrieve?fields=&include=", headers=admin).json()["items"]
+        check("empty fields and include are the same as leaving them out",
+              empty == client.get("/users/retrieve", headers=admin).json()["items"] and "repositories" in empty[0])
+
+        writes = [
+            ("register", lambda: client.post("/users/register", json=registration(1, "etag", phone_number="7000000001", competition="Etag")),
+             {"users", "users_sparse"}),
+            ("duplicate register (rolled back)", lambda: client.post("/users/register", json=registration(1, "etag", phone_number="7000000001", competition="Etag")),
+             set()),
+            ("create repository", lambda: client.post(
+                "/repositories/", json={"repository_name": "a", "repository_url": "https://github.com/e/a"},
+                headers=member), {"users", "users_sparse", "repositories"}),
+            ("update repository", lambda: client.put("/repositories/1", json={"description": "new"}, headers=member),
+             {"users", "users_sparse", "repositories"}),
+            ("another user's repository", lambda: client.post(
+                "/repositories/", json={"repository_name": "b", "repository_url": "https://github.com/e/b"},
+                headers=other), {"users", "users_sparse"}),
+            ("assign permission", lambda: client.post(
+                "/permissions/assign", json={"user_id": 2, "competition_access": "Etag"}, headers=admin),
+             {"permissions"}),
+            ("batch revoke", lambda: client.request(
+                "DELETE", "/permissions/revoke/batch",
+                json={"items": [{"user_id": 2, "competition_access": "Etag"}]}, headers=admin),
+             {"permissions"}),
+            ("import", lambda: client.post(
+                "/users/import?format=ndjson", content=json.dumps(registration(2, "etag", phone_number="7000000002", competition="Etag")), headers=admin),
+             {"users", "users_sparse"}),
+            ("delete repository", lambda: client.delete("/repositories/1", headers=member),
+             {"users", "users_sparse", "repositories"}),
+        ]
+        for label, write, expected in writes:
+            response = write()
+            invalidated = changed()
+            check(f"{label} ({response.status_code}) invalidates {sorted(expected) or 'nothing'}"
+                  + ("" if invalidated == expected else f", got {sorted(invalidated)}"),
+                  invalidated == expected)
+            refresh()
+
+
+if __name__ == "__main__":
+    run(main, "etag")
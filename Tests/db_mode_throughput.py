@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Compares authenticated-read throughput between DB_MODE=sync and DB_MODE=async.
+# Each mode runs in its own process because the mode is fixed at import time.
+# The principal cache is disabled so every request makes two DB round trips.
+# Usage: python Tests/db_mode_throughput.py [concurrency] [requests]
+concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+total_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+
+async def measure():
+    import httpx
+    from datetime import date
+    from app import app
+    from auth import create_access_token
+    from database import Base, SessionLocal, engine
+    from models import User, Repository
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(first_name="Bench", last_name="User", birth_date=date(2000, 1, 1),
+                email="bench@example.com", phone_number="0000000000",
+                hashed_password="x", agreed_to_rules=True)
+    db.add(user)
+    db.commit()
+    for i in range(20):
+        db.add(Repository(user_id=user.id, repository_name=f"repo{i}",
+                          repository_url=f"https://github.com/bench/repo{i}"))
+    db.commit()
+    db.close()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench@example.com'})}"}
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/repositories/", headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total_requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "mode": os.environ["DB_MODE"],
+        "requests_per_second": round(total_requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+    }
+
+
+if __name__ == "__main__":
+    if os.environ.get("DB_MODE_CHILD"):
+        print(json.dumps(asyncio.run(measure())))
+        sys.exit(0)
+
+    for mode in ("sync", "async"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DB_MODE=mode, DB_MODE_CHILD="1", PRINCIPAL_CACHE_SIZE="0",
+                       DATABASE_URL=f"sqlite:///{tmp}/throughput.db")
+            output = subprocess.run(
+                [sys.executable, __file__, str(concurrency), str(total_requests)],
+                env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            print(output.strip().splitlines()[-1])
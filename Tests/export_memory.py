@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from base import Base
+from models import User, Repository
+from exports import CSVWriter, NDJSONWriter, aiter_export, iter_export
+
+# Checks that the registrant export streams in constant memory: the peak
+# traced allocation while exporting must not grow with the row count, on a
+# sync Session and on an AsyncSession (DB_MODE=async), which must also
+# produce the same bytes.
+# Usage: python Tests/export_memory.py [small_rows] [large_rows]
+small_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+large_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+allowed_growth = 2.0
+
+
+def seed(session, rows):
+    batch = 10_000
+    for start in range(0, rows, batch):
+        users = [
+            {
+                "id": i + 1,
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "birth_date": date(2005, 1, 1),
+                "email": f"user{i}@example.com",
+                "phone_number": f"{i:010d}",
+                "hashed_password": "x",
+                "competition": "ScienceFair2024",
+                "agreed_to_rules": True,
+                "team_signup": True,
+                "team_members": ["Alice Smith", "Bob Johnson"],
+                "team_member_emails": ["alice@example.com", "bob@example.com"],
+                "is_active": True,
+                "is_superuser": False,
+            }
+            for i in range(start, min(start + batch, rows))
+        ]
+        session.execute(insert(User), users)
+        session.execute(insert(Repository), [
+            {
+                "user_id": user["id"],
+                "repository_name": f"repo{user['id']}",
+                "repository_url": f"https://github.com/user/repo{user['id']}",
+                "description": "A description of the repository.",
+            }
+            for user in users
+        ])
+    session.commit()
+
+
+def export_peak(path, writer_class, asynchronous=False):
+    digest = hashlib.sha256()
+    tracemalloc.start()
+    if asynchronous:
+        asyncio.run(_export_async(f"sqlite+aiosqlite:///{path}", writer_class, digest))
+    else:
+        engine = create_engine(f"sqlite:///{path}")
+        session = sessionmaker(bind=engine)()
+        for chunk in iter_export(session, writer_class()):
+            digest.update(chunk.encode())
+        session.close()
+        engine.dispose()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, digest.hexdigest()
+
+
+async def _export_async(url, writer_class, digest):
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    engine = create_async_engine(url)
+    async with AsyncSession(engine) as session:
+        async for chunk in aiter_export(session, writer_class()):
+            digest.update(chunk.encode())
+    await engine.dispose()
+
+
+failed = False
+with tempfile.TemporaryDirectory() as tmp:
+    paths = {}
+    for rows in (small_rows, large_rows):
+        paths[rows] = os.path.join(tmp, f"export{rows}.db")
+        engine = create_engine(f"sqlite:///{paths[rows]}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        seed(session, rows)
+        session.close()
+        engine.dispose()
+
+    for name, writer_class in (("ndjson", NDJSONWriter), ("csv", CSVWriter)):
+        for asynchronous in (False, True):
+            small_peak, _ = export_peak(paths[small_rows], writer_class, asynchronous)
+            large_peak, digest = export_peak(paths[large_rows], writer_class, asynchronous)
+            growth = large_peak / small_peak
+            label = f"{name} ({'AsyncSession' if asynchronous else 'Session'})"
+            print(f"{label}: {small_rows} rows -> peak {small_peak / 1024:.0f} KiB, "
+                  f"{large_rows} rows -> peak {large_peak / 1024:.0f} KiB, growth x{growth:.2f}")
+            if growth > allowed_growth:
+                failed = True
+            if asynchronous and digest != sync_digest:
+                print(f"FAIL {name}: the AsyncSession export differs")
+                failed = True
+            sync_digest = digest
+
+if failed:
+    print(f"FAILED: export memory grew more than x{allowed_growth}, or the async export differed")
+    sys.exit(1)
+print("Export memory is flat.")
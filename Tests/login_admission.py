@@ -0,0 +1,134 @@
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+from support import add_rows, app_client, run, user
+
+# Checks login admission control: the per-email and per-IP token buckets and
+# the concurrent-verify cap answer 429 with Retry-After before any hashing,
+# the SQLite store shares buckets between instances (as between gunicorn
+# workers) and is checked in the threadpool, and unknown emails take as long
+# as wrong passwords.
+# Usage: python Tests/login_admission.py  (LOGIN_RATE_LIMIT=sqlite and/or
+# DB_MODE=async to check those)
+
+
+def check_stores(tmp: str, check):
+    from utils.rate_limit import ConcurrencyLimit, MemoryBucketStore, RateLimited, SQLiteBucketStore, TokenBucket
+
+    bucket = TokenBucket("test", burst=2, per_minute=600, store=MemoryBucketStore())
+    bucket.take("a")
+    bucket.take("a")
+    try:
+        bucket.take("a")
+        check("a bucket rejects past its burst", False)
+    except RateLimited as e:
+        check("a bucket rejects past its burst", 0 < e.retry_after <= 0.1 and e.retry_after_header == "1")
+    bucket.take("b")
+    time.sleep(0.11)
+    try:
+        bucket.take("a")
+        check("a bucket refills at its rate", True)
+    except RateLimited:
+        check("a bucket refills at its rate", False)
+
+    path = os.path.join(tmp, "rate_limit.db")
+    worker_a = TokenBucket("test", burst=2, per_minute=1, store=SQLiteBucketStore(path))
+    worker_b = TokenBucket("test", burst=2, per_minute=1, store=SQLiteBucketStore(path))
+    worker_a.take("shared")
+    worker_b.take("shared")
+    try:
+        worker_a.take("shared")
+        check("the sqlite store shares buckets between instances", False)
+    except RateLimited as e:
+        check("the sqlite store shares buckets between instances", 50 < e.retry_after <= 60)
+
+    async def take_on_loop():
+        loop_thread = threading.get_ident()
+        threads = []
+        store = SQLiteBucketStore(path)
+        take = store.take
+        store.take = lambda *args: threads.append(threading.get_ident()) or take(*args)
+        await TokenBucket("loop", burst=2, per_minute=60, store=store).take_async("a")
+        await TokenBucket("loop", burst=2, per_minute=60, store=MemoryBucketStore()).take_async("a")
+        return threads and loop_thread not in threads
+
+    check("the sqlite store is checked off the event loop", asyncio.run(take_on_loop()))
+
+    limit = ConcurrencyLimit(1)
+    with limit:
+        try:
+            with limit:
+                pass
+            check("the concurrency limit rejects past its cap", False)
+        except RateLimited:
+            check("the concurrency limit rejects past its cap", True)
+    check("the concurrency limit releases its slot", limit.active == 0)
+
+
+async def concurrent_logins(app, count: int):
+    import httpx
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        return await asyncio.gather(*(
+            client.post("/users/login", data={"username": f"burst{i}@example.com", "password": "wrongpassword"})
+            for i in range(count)
+        ))
+
+
+def main(check, tmp: str):
+    os.environ["LOGIN_RATE_LIMIT_PATH"] = os.path.join(tmp, "login_rate_limit.db")
+    from auth import get_password_hash
+    from utils.rate_limit import login_bucket_store, login_email_limit, login_ip_limit, login_verify_limit
+
+    check_stores(tmp, check)
+
+    def configure(ip_burst: float, email_burst: float):
+        login_bucket_store.clear()
+        login_ip_limit.burst, login_email_limit.burst = ip_burst, email_burst
+
+    with app_client() as client:
+        add_rows([user(0, "member", email="member@example.com",
+                       hashed_password=get_password_hash("strongpassword"))])
+
+        def login(email: str, password: str = "wrongpassword"):
+            start = time.perf_counter()
+            response = client.post("/users/login", data={"username": email, "password": password})
+            return response, (time.perf_counter() - start) * 1000
+
+        configure(ip_burst=100, email_burst=3)
+        statuses = [login("member@example.com")[0].status_code for _ in range(3)]
+        limited, elapsed = login("Member@Example.com", "strongpassword")
+        check("the email bucket admits its burst", statuses == [401, 401, 401])
+        check("then answers 429 with Retry-After, even with the right password and another case",
+              limited.status_code == 429 and int(limited.headers["retry-after"]) >= 1)
+        check(f"a 429 is fast ({elapsed:.1f} ms)", elapsed < 50)
+        check("other emails are not affected", login("other@example.com")[0].status_code == 401)
+
+        configure(ip_burst=3, email_burst=100)
+        statuses = [login(f"ip{i}@example.com")[0].status_code for i in range(4)]
+        check("the IP bucket limits attempts across emails", statuses == [401, 401, 401, 429])
+
+        configure(ip_burst=100, email_burst=100)
+        login_verify_limit.limit = 1
+        responses = asyncio.run(concurrent_logins(client.app, 4))
+        codes = sorted(response.status_code for response in responses)
+        check(f"the verify cap turns concurrent attempts past it into 429s ({codes})",
+              codes[0] == 401 and codes[-1] == 429
+              and all(r.headers["retry-after"] == "1" for r in responses if r.status_code == 429))
+        login_verify_limit.limit = 100
+
+        configure(ip_burst=100, email_burst=100)
+        login("warmup@unknown.example.com")  # the pool worker builds its dummy hash once
+        known = [login("member@example.com")[1] for _ in range(3)]
+        unknown = [login(f"nobody{i}@unknown.example.com")[1] for i in range(3)]
+        ratio = statistics.median(unknown) / statistics.median(known)
+        check(f"unknown emails cost a full verify ({statistics.median(unknown):.0f} ms vs "
+              f"{statistics.median(known):.0f} ms for a wrong password)", 0.6 < ratio < 1.6)
+        check("the right password still logs in", login("member@example.com", "strongpassword")[0].status_code == 200)
+
+
+if __name__ == "__main__":
+    run(main, "admission")
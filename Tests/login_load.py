@@ -0,0 +1,59 @@
+import requests
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Fires a burst of concurrent logins while timing an unrelated endpoint.
+# Run against a live server with a registered user (see register.py).
+base_url = "http://127.0.0.1:8000"
+login_url = f"{base_url}/users/login"
+probe_url = f"{base_url}/"
+
+payload = {
+    "username": "john.doe@example.com",
+    "password": "strongpassword123"
+}
+
+concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+total_logins = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    response = fn()
+    return (time.perf_counter() - start) * 1000, response.status_code
+
+
+def login():
+    return timed(lambda: requests.post(login_url, data=payload))
+
+
+def probe_while(futures):
+    samples = []
+    while not all(f.done() for f in futures):
+        samples.append(timed(lambda: requests.get(probe_url))[0])
+    return samples
+
+
+with ThreadPoolExecutor(max_workers=concurrency) as pool:
+    futures = [pool.submit(login) for _ in range(total_logins)]
+    probe_samples = probe_while(futures)
+    results = [f.result() for f in futures]
+
+login_samples = [ms for ms, _ in results]
+statuses = {}
+for _, code in results:
+    statuses[code] = statuses.get(code, 0) + 1
+
+print("Status codes:", statuses)
+print(f"Login p50: {statistics.median(login_samples):.1f} ms, p99: {percentile(login_samples, 99):.1f} ms")
+if probe_samples:
+    print(f"GET / p50: {statistics.median(probe_samples):.1f} ms, p99: {percentile(probe_samples, 99):.1f} ms "
+          f"({len(probe_samples)} samples)")
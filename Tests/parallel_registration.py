@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sys
+import tempfile
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Fires concurrent registrations that collide on email or phone number and
+# checks the database lets exactly one of each group through, with every
+# other request rejected by the matching 400 (never a 500).
+# Runs against a throwaway SQLite file; set DB_MODE=async to test that stack.
+# Usage: python Tests/parallel_registration.py [requests_per_group]
+per_group = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+
+
+def registration(email, phone):
+    return {
+        "first_name": "Race",
+        "last_name": "Condition",
+        "birth_date": "2005-01-01",
+        "email": email,
+        "password": "strongpassword",
+        "phone_number": phone,
+        "agreed_to_rules": True,
+        "team_signup": False,
+    }
+
+
+async def run():
+    import httpx
+    from app import app
+    from database import Base, engine, async_engine
+    from utils.hashing_pool import hashing_pool
+
+    Base.metadata.create_all(bind=engine)
+    groups = {
+        "Email already registered": [
+            registration("same@example.com", f"1{i:09d}") for i in range(per_group)
+        ],
+        "Phone number already registered": [
+            registration(f"user{i}@example.com", "5555555555") for i in range(per_group)
+        ],
+    }
+
+    failures = 0
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            for expected, bodies in groups.items():
+                responses = await asyncio.gather(
+                    *[client.post("/users/register", json=body) for body in bodies]
+                )
+                statuses = Counter(r.status_code for r in responses)
+                details = Counter(r.json().get("detail") for r in responses if r.status_code == 400)
+                print(f"{expected}: {dict(statuses)} {dict(details)}")
+                if statuses[201] != 1 or statuses[400] != len(bodies) - 1 or details[expected] != len(bodies) - 1:
+                    failures += 1
+    finally:
+        hashing_pool.shutdown()
+        if async_engine is not None:
+            await async_engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/parallel.db"
+        failures = asyncio.run(run())
+    print("FAIL" if failures else "OK")
+    sys.exit(1 if failures else 0)
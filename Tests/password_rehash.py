@@ -0,0 +1,58 @@
+import os
+
+from support import add_rows, app_client, in_session, run, user
+
+# Checks the password hashing settings and rehash-on-login: hashes below the
+# configured cost, or in the other scheme, are flagged by needs_update and
+# replaced after a successful login; current and costlier hashes are kept;
+# a failed login or a password changed meanwhile is never overwritten.
+# Runs with low costs (BCRYPT_ROUNDS=5) so it stays fast.
+# Usage: python Tests/password_rehash.py  (DB_MODE=async to check that stack)
+
+
+def main(check, tmp: str):
+    from passlib.hash import argon2
+    from auth import _replace_password_hash
+    from models import User
+    from utils import security
+
+    cheaper = security.make_context("bcrypt", bcrypt_rounds=4).hash("strongpassword")
+    costlier = security.make_context("bcrypt", bcrypt_rounds=6).hash("strongpassword")
+    check("a cheaper bcrypt hash needs an update", security.needs_update(cheaper))
+    check("a costlier bcrypt hash is kept", not security.needs_update(costlier))
+    check("new hashes use the configured rounds", security.get_password_hash("x").startswith("$2b$05$"))
+    if argon2.has_backend():
+        argon2_context = security.make_context("argon2", argon2_time_cost=2, argon2_memory_cost=1024)
+        hashed = argon2_context.hash("strongpassword")
+        check("an argon2 hash verifies under the bcrypt scheme", security.verify_password("strongpassword", hashed))
+        check("an argon2 hash needs an update under the bcrypt scheme", security.needs_update(hashed))
+        check("a bcrypt hash needs an update under the argon2 scheme", argon2_context.needs_update(costlier))
+    else:
+        print("skip argon2 checks: argon2-cffi is not installed")
+
+    with app_client() as client:
+        add_rows(user(i, "rehash", hashed_password=hashed) for i, hashed in enumerate((cheaper, costlier)))
+
+        def stored(user_id: int) -> str:
+            return in_session(lambda db: db.get(User, user_id).hashed_password)
+
+        def login(i: int, password: str = "strongpassword"):
+            return client.post("/users/login", data={"username": f"rehash{i}@example.com", "password": password})
+
+        check("a wrong password is rejected", login(0, "wrongpassword").status_code == 401)
+        check("a failed login does not rehash", stored(1) == cheaper)
+        check("login with an outdated hash succeeds", login(0).status_code == 200)
+        upgraded = stored(1)
+        check("the outdated hash was replaced with the configured cost",
+              upgraded != cheaper and upgraded.startswith("$2b$05$"))
+        check("the new hash verifies", login(0).status_code == 200 and stored(1) == upgraded)
+        login(1)
+        check("a costlier hash is left alone", stored(2) == costlier)
+
+        replaced = in_session(_replace_password_hash, 1, cheaper, security.get_password_hash("strongpassword"))
+        check("a rehash does not overwrite a password changed meanwhile", not replaced and stored(1) == upgraded)
+
+
+if __name__ == "__main__":
+    os.environ["BCRYPT_ROUNDS"] = "5"
+    run(main, "rehash")
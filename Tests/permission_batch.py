@@ -0,0 +1,78 @@
+import threading
+
+from support import add_rows, run, user
+
+# Checks the batch permission endpoints' per-item outcomes: when several
+# batches grant the same pairs at once, each pair is reported "assigned" by
+# exactly one of them, and revokes find exactly the pairs that exist.
+# Usage: python Tests/permission_batch.py
+
+USERS = 50
+COMPETITIONS = 4
+GRANTERS = 4
+
+
+def main(check, tmp: str):
+    from database import SessionLocal
+    from models import Permission, User
+    from routers.permissions import _assign_permissions, _revoke_permissions
+    from schema_check import prepare_schema
+    from schemas import PermissionCreate
+    import database
+
+    prepare_schema(database.engine)
+    add_rows(user(i, "batch") for i in range(USERS))
+    db = SessionLocal()
+    user_ids = sorted(row[0] for row in db.query(User.id))
+    db.add(Permission(user_id=user_ids[0], competition_access="Comp 0"))
+    db.commit()
+    db.close()
+
+    items = [PermissionCreate(user_id=user_id, competition_access=f"Comp {k}")
+             for user_id in user_ids for k in range(COMPETITIONS)]
+    items.append(PermissionCreate(user_id=999999, competition_access="Comp 0"))
+    items.append(items[1])
+
+    reports, errors = [], []
+    start = threading.Barrier(GRANTERS)
+
+    def grant():
+        db = SessionLocal()
+        try:
+            start.wait()
+            reports.append(_assign_permissions(db, items))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=grant) for _ in range(GRANTERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check(f"concurrent batches all complete ({errors[:1]})", not errors and len(reports) == GRANTERS)
+
+    assigned = {}
+    for report in reports:
+        for result in report["results"]:
+            if result["status"] == "assigned":
+                pair = (result["user_id"], result["competition_access"])
+                assigned[pair] = assigned.get(pair, 0) + 1
+    pairs = USERS * COMPETITIONS - 1
+    check(f"each new pair is reported assigned once ({sum(assigned.values())} reports for {pairs} pairs)",
+          len(assigned) == pairs and set(assigned.values()) == {1})
+    check("the rest are already_assigned, unknown users and repeats are reported",
+          all(r["counts"].get("user_not_found") == 1 and r["counts"].get("duplicate") == 1 for r in reports)
+          and sum(r["counts"].get("already_assigned", 0) for r in reports) == GRANTERS * (pairs + 1) - pairs)
+
+    db = SessionLocal()
+    report = _revoke_permissions(db, items[:COMPETITIONS] + [PermissionCreate(user_id=user_ids[1],
+                                                                              competition_access="Nowhere")])
+    check("revokes find exactly the existing pairs", report["counts"] == {"revoked": COMPETITIONS, "not_found": 1})
+    check("and delete them", db.query(Permission).filter(Permission.user_id == user_ids[0]).count() == 0)
+    db.close()
+
+
+if __name__ == "__main__":
+    run(main, "batch")
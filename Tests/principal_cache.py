@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from support import ROOT, app_client, registration, run
+
+# Checks the principal cache: a hit loads neither the user nor the users table
+# version, and changes made outside this process are followed. A user
+# deactivated by another process through a Session is refused once
+# PRINCIPAL_VERSION_INTERVAL has passed, one deactivated by raw SQL once
+# PRINCIPAL_CACHE_TTL ends.
+# Usage: python Tests/principal_cache.py  (DB_MODE=async to check that stack)
+
+TTL = 1.5
+INTERVAL = 0.3
+
+DEACTIVATE = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from database import SessionLocal
+from models import User
+import table_versions
+db = SessionLocal()
+db.query(User).filter(User.email == sys.argv[2]).one().is_active = False
+db.commit()
+db.close()
+"""
+
+
+def main(check, tmp: str):
+    from auth import create_access_token, principal_cache
+    from metrics import count_queries
+
+    with app_client() as client:
+        for i in (1, 2):
+            client.post("/users/register", json=registration(i, "cache", competition="Robotics"))
+
+        def status(i: int) -> int:
+            token = create_access_token({"sub": f"cache{i}@example.com"})
+            return client.get("/repositories/", headers={"Authorization": f"Bearer {token}"}).status_code
+
+        check("active users are let in", status(1) == 200 and status(2) == 200)
+        hits = principal_cache.hits
+        with count_queries() as counter:
+            ok = status(1) == 200
+        auth_queries = [sql for sql in counter.statements if "table_versions" in sql or "FROM users" in sql]
+        check("the next request is answered from the cache", ok and principal_cache.hits > hits)
+        check(f"without a query for the user or the users version ({len(auth_queries)})", not auth_queries)
+
+        subprocess.run([sys.executable, "-c", DEACTIVATE, ROOT, "cache1@example.com"], check=True)
+        time.sleep(INTERVAL + 0.1)
+        check("a deactivation committed by another process is seen within the interval", status(1) == 403)
+
+        connection = sqlite3.connect(os.path.join(tmp, "principal.db"))
+        connection.execute("UPDATE users SET is_active = 0 WHERE email = 'cache2@example.com'")
+        connection.commit()
+        connection.close()
+        time.sleep(TTL + 0.1)
+        check("a raw SQL deactivation is seen once the TTL ends", status(2) == 403)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ["PRINCIPAL_CACHE_TTL"] = str(TTL)
+    os.environ["PRINCIPAL_VERSION_INTERVAL"] = str(INTERVAL)
+    run(main, "principal")
@@ -0,0 +1,66 @@
+import os
+
+from support import add_rows, app_client, bearer, run, user
+
+# Holds each endpoint to a maximum number of SQL statements, so an N+1 load
+# (one lazy query per row) shows up as a failure rather than a slow page.
+# Budgets include the one query that loads the caller (the principal cache
+# is disabled so that query is always counted), the ETag version read on
+# listings and the table_versions bump on writes.
+# Usage: python Tests/query_counts.py  (DB_MODE=async to check that stack)
+# Repository 4 is the first repository of the member (user 2).
+USERS = 30
+
+# (method, url, superuser?, body, max queries)
+BUDGETS = [
+    ("GET", "/users/retrieve", True, None, 4),  # caller, table versions, page, repositories IN (...)
+    ("GET", "/users/retrieve?fields=id,email", True, None, 3),
+    ("GET", "/users/retrieve?include=repositories&fields=id", True, None, 4),
+    ("GET", "/users/export", True, None, 2),
+    ("GET", "/repositories/", False, None, 3),
+    ("GET", "/repositories/4", False, None, 2),
+    ("PUT", "/repositories/4", False, {"description": "updated"}, 5),  # caller, select, update, version bump, refresh
+    ("POST", "/repositories/", False, {"repository_name": "n", "repository_url": "https://github.com/q/n"}, 3),
+    ("GET", "/permissions/", True, None, 3),
+    ("GET", "/permissions/user/2", True, None, 3),
+    ("POST", "/permissions/assign", True, {"user_id": 2, "competition_access": "Budget"}, 3),
+    ("DELETE", "/permissions/revoke", True, {"user_id": 2, "competition_access": "Budget"}, 4),
+    ("POST", "/permissions/assign/batch", True,
+     {"items": [{"user_id": i, "competition_access": "Batch"} for i in range(1, USERS + 1)]}, 5),
+    ("DELETE", "/permissions/revoke/batch", True,
+     {"items": [{"user_id": i, "competition_access": "Batch"} for i in range(1, USERS + 1)]}, 4),
+    ("GET", "/stats/competitions", True, None, 3),  # caller, trigger lookup (first call), one row per competition
+]
+
+
+def main(check, tmp: str):
+    from metrics import count_queries
+    from models import Permission, Repository
+
+    def seeded(i: int):
+        row = user(i, "count", is_superuser=i == 0)
+        row.repositories = [Repository(repository_name=f"r{k}", repository_url=f"https://github.com/{i}/{k}")
+                            for k in range(3)]
+        row.permissions = [Permission(competition_access="Seeded")]
+        return row
+
+    with app_client() as client:
+        add_rows(seeded(i) for i in range(USERS))
+        admin, member = bearer("count0@example.com"), bearer("count1@example.com")
+        for method, url, superuser, body, budget in BUDGETS:
+            with count_queries() as counter:
+                response = client.request(method, url, json=body, headers=admin if superuser else member)
+            if not check(f"{method} {url}: {counter.count}/{budget} queries, status {response.status_code}",
+                         response.status_code < 400 and counter.count <= budget):
+                for statement in counter.statements:
+                    print(f"       {' '.join(statement.split())[:160]}")
+
+        exposition = client.get("/metrics").text
+        for family in ("http_request_duration_seconds", "http_request_db_queries", "http_request_db_seconds"):
+            check(f"/metrics has {family}",
+                  f'{family}_count{{method="GET",route="/users/retrieve"' in exposition)
+
+
+if __name__ == "__main__":
+    os.environ["PRINCIPAL_CACHE_SIZE"] = "0"
+    run(main, "counts")
@@ -0,0 +1,180 @@
+import os
+import re
+import sqlite3
+
+from support import ROOT, add_rows, app_client, bearer, run, user
+
+# Builds a database with the Alembic migrations, drives every router through
+# TestClient while recording the SQL it runs, then runs EXPLAIN QUERY PLAN on
+# each statement and fails if any of them scans a whole table.
+# A scan is accepted when it is an unfiltered first page (LIMIT, no WHERE, no
+# sort), or when the route reads the whole table by design (ALLOWED_SCANS).
+# Also fails if the migrated schema drifts from models.py (the FTS5 search
+# tables, created by raw DDL, are left out of that comparison).
+# Usage: python Tests/query_plans.py
+
+# Routes whose full-table read is the point of the endpoint
+ALLOWED_SCANS = {
+    "export all": "streams every registrant",
+    "permissions check": "loads the whole access index once",
+    "competition stats": "one row per competition, kept by triggers",
+}
+
+
+def migrate():
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+def schema_drift():
+    from alembic.autogenerate import compare_metadata
+    from alembic.migration import MigrationContext
+    from base import Base
+    from database import engine
+    from models import is_search_index_table
+
+    def include_name(name, type_, parent_names):
+        return not (type_ == "table" and is_search_index_table(name))
+
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_name": include_name})
+        return compare_metadata(context, Base.metadata)
+
+
+def record_statements():
+    """Exercise the routers and return ``[(label, sql, params)]``."""
+    from sqlalchemy import event
+    from database import engine
+    from models import Permission, Repository
+
+    add_rows(user(i, "seed", competition=f"Comp {i % 5}", is_superuser=i == 0) for i in range(50))
+    add_rows(row for i in range(1, 50) for row in (
+        Permission(user_id=i, competition_access=f"Comp {i % 5}"),
+        Repository(user_id=i, repository_name=f"repo{i}", repository_url=f"https://github.com/seed/repo{i}"),
+    ))
+
+    statements = []
+    label = {"current": "setup"}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        statements.append((label["current"], statement, parameters))
+
+    admin, member = bearer("seed0@example.com"), bearer("seed1@example.com")
+    registrant = {
+        "first_name": "Plan", "last_name": "Check", "birth_date": "2005-01-01",
+        "email": "plan@example.com", "password": "strongpassword", "phone_number": "5550000000",
+        "competition": "Comp 1", "agreed_to_rules": True, "team_signup": False,
+    }
+    roster = "\n".join(
+        '{"first_name": "Bulk", "last_name": "%d", "birth_date": "2005-01-01", '
+        '"email": "bulk%d@example.com", "password": "strongpassword", '
+        '"phone_number": "77700000%02d", "agreed_to_rules": true, "team_signup": false}' % (i, i, i)
+        for i in range(3)
+    )
+    pairs = {"items": [{"user_id": 2, "competition_access": "Comp 9"},
+                       {"user_id": 3, "competition_access": "Comp 3"}]}
+
+    steps = [
+        ("register", "POST", "/users/register", {"json": registrant}),
+        ("register duplicate", "POST", "/users/register", {"json": registrant}),
+        ("login", "POST", "/users/login", {"data": {"username": "plan@example.com", "password": "strongpassword"}}),
+        ("refresh", "POST", "/users/refresh", lambda: {"json": {"refresh_token": tokens["login"]}}),
+        ("refresh reuse", "POST", "/users/refresh", lambda: {"json": {"refresh_token": tokens["login"]}}),
+        ("logout", "POST", "/users/logout", lambda: {"json": {"refresh_token": tokens["refresh"]}}),
+        ("users retrieve", "GET", "/users/retrieve", {"headers": admin}),
+        ("users retrieve fields", "GET", "/users/retrieve?fields=id,email&limit=10", {"headers": admin}),
+        ("export competition", "GET", "/users/export?competition=Comp%201", {"headers": admin}),
+        ("export all", "GET", "/users/export", {"headers": admin}),
+        ("import", "POST", "/users/import?format=ndjson", {"headers": admin, "content": roster}),
+        ("repositories create", "POST", "/repositories/",
+         {"headers": member, "json": {"repository_name": "new", "repository_url": "https://github.com/seed/new"}}),
+        ("repositories create duplicate", "POST", "/repositories/",
+         {"headers": member, "json": {"repository_name": "new", "repository_url": "https://github.com/seed/new"}}),
+        ("repositories list", "GET", "/repositories/?limit=1", {"headers": member}),
+        ("repositories get", "GET", "/repositories/1", {"headers": member}),
+        ("repositories update", "PUT", "/repositories/1", {"headers": member, "json": {"description": "d"}}),
+        ("repositories delete", "DELETE", "/repositories/1", {"headers": member}),
+        ("permissions assign", "POST", "/permissions/assign",
+         {"headers": admin, "json": {"user_id": 2, "competition_access": "Comp 8"}}),
+        ("permissions assign duplicate", "POST", "/permissions/assign",
+         {"headers": admin, "json": {"user_id": 2, "competition_access": "Comp 8"}}),
+        ("permissions list", "GET", "/permissions/?limit=10", {"headers": admin}),
+        ("permissions user", "GET", "/permissions/user/2", {"headers": admin}),
+        ("permissions check", "GET", "/permissions/check?competition_access=Comp%208&user_id=2", {"headers": admin}),
+        ("permissions revoke", "DELETE", "/permissions/revoke",
+         {"headers": admin, "json": {"user_id": 2, "competition_access": "Comp 8"}}),
+        ("search", "GET", "/search/?q=seed%20comp", {"headers": admin}),
+        ("competition stats", "GET", "/stats/competitions", {"headers": admin}),
+        ("permissions assign batch", "POST", "/permissions/assign/batch", {"headers": admin, "json": pairs}),
+        ("permissions revoke batch", "DELETE", "/permissions/revoke/batch", {"headers": admin, "json": pairs}),
+    ]
+
+    # Refresh tokens returned by earlier steps, for the steps that need them
+    tokens = {}
+
+    try:
+        with app_client() as client:
+            for name, method, url, kwargs in steps:
+                label["current"] = name
+                response = client.request(method, url, **(kwargs() if callable(kwargs) else kwargs))
+                if name in ("login", "refresh"):
+                    tokens[name] = response.json()["refresh_token"]
+                if response.status_code >= 500:
+                    raise RuntimeError(f"{name}: {response.status_code} {response.text}")
+                # Follow the cursor so the keyset WHERE clause is planned too
+                body = response.json() if method == "GET" and "export" not in url else None
+                next_cursor = body.get("next_cursor") if isinstance(body, dict) else None
+                if next_cursor:
+                    label["current"] = name + " next page"
+                    separator = "&" if "?" in url else "?"
+                    client.request(method, f"{url}{separator}after={next_cursor}", **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def full_scans(connection, statement, parameters):
+    plan = [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+    scans = [detail for detail in plan if detail.startswith("SCAN ") and "CONSTANT ROW" not in detail
+             # An FTS5 MATCH ("INDEX 0:M...") reads the full-text index,
+             # sqlite_master is the schema catalog, and a subquery ("anon_1")
+             # holds only the rows it selected (its own plan lines are checked)
+             and not re.search(r"VIRTUAL TABLE INDEX \d+:M", detail) and detail != "SCAN sqlite_master"
+             and not re.match(r"SCAN anon_\d+", detail)]
+    upper = statement.upper()
+    unfiltered_page = "LIMIT" in upper and " WHERE " not in upper and not any("TEMP B-TREE" in d for d in plan)
+    return [] if unfiltered_page else scans
+
+
+def main(check, tmp: str):
+    migrate()
+    drift = schema_drift()
+    statements = record_statements()
+
+    connection = sqlite3.connect(os.path.join(tmp, "plans.db"))
+    checked = set()
+    for label, statement, parameters in statements:
+        first_word = statement.lstrip().split(None, 1)[0].upper()
+        if first_word not in ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH") or (label, statement) in checked:
+            continue
+        checked.add((label, statement))
+        scans = full_scans(connection, statement, parameters)
+        if scans and label not in ALLOWED_SCANS:
+            check(f"FULL SCAN in {label}: {'; '.join(scans)}\n    {' '.join(statement.split())}", False)
+    connection.close()
+
+    check(f"no full table scans in {len(checked)} distinct statements", not check)
+    for diff in drift:
+        check(f"Migrations differ from models.py: {diff}", False)
+
+
+if __name__ == "__main__":
+    os.environ["DB_MODE"] = "sync"
+    run(main, "plans")
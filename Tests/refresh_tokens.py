@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from support import add_rows, app_client, in_session, run, user
+
+# Checks the refresh-token flow: login issues a refresh token, a refresh
+# rotates it without verifying the password, replaying a used token revokes
+# its whole family, and logout, expiry and deactivation end a session.
+# Usage: python Tests/refresh_tokens.py  (DB_MODE=async to check that stack)
+
+
+def main(check, tmp: str):
+    from auth import get_password_hash
+    from database import SessionLocal
+    from models import RefreshToken, User
+    from refresh_tokens import prune_refresh_tokens
+
+    with app_client() as client:
+        add_rows(user(i, "refresh", hashed_password=get_password_hash("strongpassword")) for i in range(2))
+
+        def login(i: int = 0) -> dict:
+            return client.post("/users/login", data={"username": f"refresh{i}@example.com",
+                                                     "password": "strongpassword"}).json()
+
+        def refresh(token: str):
+            return client.post("/users/refresh", json={"refresh_token": token})
+
+        def stored_tokens():
+            return in_session(lambda db: db.query(RefreshToken).all())
+
+        session = login()
+        check("login returns a refresh token", bool(session.get("refresh_token")))
+        check("only its HMAC is stored",
+              all(token.token_hash != session["refresh_token"] for token in stored_tokens()))
+
+        first = refresh(session["refresh_token"])
+        check("a refresh returns new tokens", first.status_code == 200
+              and first.json()["refresh_token"] != session["refresh_token"]
+              and first.json()["email"] == "refresh0@example.com")
+        me = client.get("/repositories/", headers={"Authorization": "Bearer " + first.json()["access_token"]})
+        check("the refreshed access token authenticates", me.status_code == 200)
+        second = refresh(first.json()["refresh_token"])
+        check("the successor can be refreshed in turn", second.status_code == 200)
+
+        other = login()
+        replay = refresh(session["refresh_token"])
+        check("replaying a used token is rejected", replay.status_code == 401)
+        check("reuse revokes the newest token of the family",
+              refresh(second.json()["refresh_token"]).status_code == 401)
+        check("other sessions of the same user survive", refresh(other["refresh_token"]).status_code == 200)
+
+        check("an unknown token is rejected", refresh("not-a-token").status_code == 401)
+
+        session = login()
+        logout = client.post("/users/logout", json={"refresh_token": session["refresh_token"]})
+        check("logout answers 204", logout.status_code == 204)
+        check("logout revokes the family", refresh(session["refresh_token"]).status_code == 401)
+        check("logout is idempotent",
+              client.post("/users/logout", json={"refresh_token": session["refresh_token"]}).status_code == 204)
+
+        session = login(1)
+        db = SessionLocal()
+        db.query(RefreshToken).filter(RefreshToken.user_id == 2).update(
+            {"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        db.close()
+        check("an expired token is rejected", refresh(session["refresh_token"]).status_code == 401)
+
+        session = login(1)
+        db = SessionLocal()
+        db.query(User).filter(User.id == 2).update({"is_active": False})
+        db.commit()
+        db.close()
+        check("an inactive user cannot refresh", refresh(session["refresh_token"]).status_code == 403)
+
+        pruned = in_session(prune_refresh_tokens)
+        check("expired tokens are pruned",
+              pruned == 1 and all(t.expires_at > datetime.utcnow() for t in stored_tokens()))
+
+
+if __name__ == "__main__":
+    run(main, "refresh")
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import threading
+
+from support import add_rows, app_client, bearer, run, user
+
+# Checks the response cache: repeated reads are served from it, writes make
+# the next read return fresh data, per-user listings are never shared between
+# users, and both backends stay under their byte cap. The SQLite backend is
+# also checked across two instances, as two gunicorn workers would use it.
+# Usage: python Tests/response_cache.py  (RESPONSE_CACHE=sqlite and/or
+# DB_MODE=async to check those)
+
+
+def check_backends(tmp: str, check):
+    from utils.response_cache import MemoryResponseCache, SQLiteResponseCache
+
+    memory = MemoryResponseCache(max_bytes=1000, ttl=60)
+    for i in range(10):
+        memory.set(f"k{i}", b"x" * 200)
+        memory.get("k0")  # keep k0 recently used
+    stats = memory.stats()
+    check("memory backend stays under its byte cap", stats["bytes"] <= 1000)
+    check("memory backend evicts least recently used first", memory.get("k0") and memory.get("k1") is None)
+    memory.set("huge", b"x" * 600)
+    check("memory backend skips bodies over a quarter of the cap", memory.get("huge") is None)
+
+    path = os.path.join(tmp, "shared_cache.db")
+    worker_a = SQLiteResponseCache(path, max_bytes=1000, ttl=60)
+    worker_b = SQLiteResponseCache(path, max_bytes=1000, ttl=60)
+    worker_a.set("shared", b"body")
+    check("sqlite backend is shared between instances", worker_b.get("shared") == b"body")
+    for i in range(10):
+        worker_b.set(f"k{i}", b"x" * 200)
+    check("sqlite backend stays under its byte cap", worker_a.stats()["bytes"] <= 1000)
+    check("sqlite backend evicts least recently used first",
+          worker_a.get("shared") is None and worker_a.get("k9") == b"x" * 200)
+    expired = SQLiteResponseCache(path, max_bytes=1000, ttl=-1)
+    expired.set("old", b"body")
+    check("sqlite backend drops expired entries", worker_a.get("old") is None)
+
+    async def serve_on_loop():
+        from starlette.requests import Request
+        from database import SessionLocal
+        import utils.etag as etag
+
+        loop_thread = threading.get_ident()
+        threads = []
+        cache = SQLiteResponseCache(path, max_bytes=1000, ttl=60)
+        get, set_ = cache.get, cache.set
+        cache.get = lambda *args: threads.append(threading.get_ident()) or get(*args)
+        cache.set = lambda *args: threads.append(threading.get_ident()) or set_(*args)
+        request = Request({"type": "http", "method": "GET", "path": "/loop", "query_string": b"", "headers": []})
+        shared, etag.response_cache = etag.response_cache, cache
+        try:
+            for _ in range(2):
+                await etag.conditional_json(SessionLocal(), request, lambda db: (1,), lambda db: {"a": 1})
+        finally:
+            etag.response_cache = shared
+        return len(threads) == 3 and loop_thread not in threads
+
+    check("sqlite backend is used off the event loop", asyncio.run(serve_on_loop()))
+
+
+def main(check, tmp: str):
+    os.environ["RESPONSE_CACHE_PATH"] = os.path.join(tmp, "response_cache.db")
+    from utils.response_cache import response_cache
+
+    check_backends(tmp, check)
+    with app_client() as client:
+        add_rows(user(i, "cache", is_superuser=i == 0) for i in range(3))
+        admin, member, other = (bearer(f"cache{i}@example.com") for i in range(3))
+        response_cache.clear()
+
+        def cached_get(url, headers):
+            before = response_cache.stats()["hits"]
+            response = client.get(url, headers=headers)
+            return response, response_cache.stats()["hits"] > before
+
+        first, hit = cached_get("/users/retrieve", admin)
+        check("first read is a miss", not hit)
+        second, hit = cached_get("/users/retrieve", admin)
+        check("repeated read is served from the cache", hit and second.content == first.content
+              and second.headers["etag"] == first.headers["etag"]
+              and second.headers["content-type"] == "application/json")
+
+        client.post("/repositories/", json={"repository_name": "a", "repository_url": "https://github.com/c/a"},
+                    headers=member)
+        mine, hit = cached_get("/repositories/", member)
+        check("a write invalidates: the listing shows the new repository",
+              not hit and [r["repository_name"] for r in mine.json()["items"]] == ["a"])
+        theirs, _ = cached_get("/repositories/", other)
+        check("per-user listings are not shared", theirs.json()["items"] == [])
+        users, hit = cached_get("/users/retrieve", admin)
+        check("a repository write invalidates the user listing",
+              not hit and users.json()["items"][1]["repositories"][0]["repository_name"] == "a")
+
+        client.post("/permissions/assign", json={"user_id": 2, "competition_access": "Cache"}, headers=admin)
+        own, hit = cached_get("/permissions/user/2", member)
+        check("member reads their permissions", own.status_code == 200 and len(own.json()) == 1)
+        _, hit = cached_get("/permissions/user/2", member)
+        check("repeated permission read is served from the cache", hit)
+        forbidden, _ = cached_get("/permissions/user/2", other)
+        check("a cached entry is not served to a caller without access", forbidden.status_code == 403)
+        client.request("DELETE", "/permissions/revoke", json={"user_id": 2, "competition_access": "Cache"},
+                       headers=admin)
+        revoked, hit = cached_get("/permissions/user/2", member)
+        check("a revoke invalidates the permission listing", not hit and revoked.json() == [])
+
+
+if __name__ == "__main__":
+    run(main, "cache")
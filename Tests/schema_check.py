@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from support import ROOT, app_client, run
+
+# Checks the SCHEMA_MODE=check startup path: the migration head read from the
+# scripts agrees with Alembic's, a database at head passes, an empty or
+# outdated one fails with SchemaMismatch, and the health endpoints report
+# readiness. Also that migration 0002 refuses to delete duplicate
+# repositories unless run with -x dedupe=1.
+# Usage: python Tests/schema_check.py
+
+
+def alembic(env: dict, *args: str):
+    subprocess.run([sys.executable, "-m", "alembic", *args], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def main(check, tmp: str):
+    outdated = f"sqlite:///{tmp}/outdated.db"
+    # The app's engine is built from DATABASE_URL when database is first imported
+    os.environ["DATABASE_URL"] = outdated
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    from database import make_engine
+    import schema_check
+
+    expected = ScriptDirectory.from_config(Config(os.path.join(ROOT, "alembic.ini"))).get_current_head()
+    check(f"head read from the scripts matches Alembic ({expected})", schema_check.head_revision() == expected)
+
+    def outcome(url: str) -> str:
+        try:
+            return schema_check.check_schema(make_engine(url))
+        except schema_check.SchemaMismatch as e:
+            return f"mismatch: {e}"
+
+    empty = f"sqlite:///{tmp}/empty.db"
+    check("an empty database fails", outcome(empty).startswith("mismatch: Database schema is at revision none"))
+
+    duplicated = f"sqlite:///{tmp}/duplicated.db"
+    duplicated_env = {**os.environ, "DATABASE_URL": duplicated}
+    alembic(duplicated_env, "upgrade", "0001")
+    connection = sqlite3.connect(f"{tmp}/duplicated.db")
+    connection.execute("INSERT INTO users (id, first_name, last_name, birth_date, email, phone_number, "
+                       "hashed_password, agreed_to_rules, is_active, is_superuser) "
+                       "VALUES (1, 'a', 'b', '2005-01-01', 'dup@example.com', '1', 'x', 1, 1, 0)")
+    connection.executemany("INSERT INTO repositories (user_id, repository_name, repository_url) VALUES (1, ?, ?)",
+                           [("first", "https://github.com/d/r"), ("again", "https://github.com/d/r")])
+    connection.commit()
+
+    def repositories() -> int:
+        return connection.execute("SELECT COUNT(*) FROM repositories").fetchone()[0]
+
+    refused = subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=duplicated_env,
+                             capture_output=True, text=True)
+    check("duplicate repositories stop the upgrade and are listed", refused.returncode != 0
+          and "user_id=1 repository_url=https://github.com/d/r (2 rows)" in refused.stderr)
+    check("nothing is deleted without dedupe=1", repositories() == 2)
+    alembic(duplicated_env, "-x", "dedupe=1", "upgrade", "head")
+    check("dedupe=1 keeps the oldest of each", connection.execute(
+        "SELECT repository_name FROM repositories").fetchall() == [("first",)])
+    connection.close()
+
+    alembic({**os.environ, "DATABASE_URL": outdated}, "upgrade", "0002")
+    check("an outdated database fails", outcome(outdated).startswith("mismatch: Database schema is at revision 0002"))
+
+    alembic({**os.environ, "DATABASE_URL": outdated}, "upgrade", "head")
+    check("a database at head passes", outcome(outdated) == expected)
+
+    schema_check.schema_state.ready = False
+    with app_client() as client:
+        check("liveness answers", client.get("/health/live").json() == {"status": "alive"})
+        ready = client.get("/health/ready")
+        check("readiness reports the schema revision",
+              ready.status_code == 200 and ready.json() == {"status": "ready", "schema_revision": expected})
+        schema_check.schema_state.ready = False
+        check("readiness is 503 until startup has prepared the schema",
+              client.get("/health/ready").status_code == 503)
+
+
+if __name__ == "__main__":
+    os.environ["SCHEMA_MODE"] = "check"
+    run(main, "outdated")
@@ -0,0 +1,77 @@
+from support import add_rows, app_client, bearer, run, user
+
+# Checks GET /search/: prefix matches on names, email fragments, team members
+# and repository descriptions, bm25 ranking, the triggers that keep the FTS5
+# index in sync with inserts, updates and deletes, that FTS5 query syntax in
+# the input is treated as plain words, and that the LIKE fallback used on
+# other databases finds the same rows.
+# Usage: python Tests/search.py  (DB_MODE=async to check that stack)
+
+
+def main(check, tmp: str):
+    from database import SessionLocal
+    from models import Repository, User
+    import search
+
+    people = [
+        ("Admin", "User", "admin@example.com", None),
+        ("Alice", "Zeta", "alice.zeta@school.example.com", ["Bob Marley"]),
+        ("Bob", "Smith", "bsmith@example.com", None),
+        ("Carol", "Jones", "carol@example.com", ["Alice Cooper", "Dan Brown"]),
+        ("Élodie", "Durand", "elodie@example.fr", None),
+    ]
+    with app_client() as client:
+        add_rows(user(i, "search", first_name=first, last_name=last, email=email, team_signup=bool(team),
+                      team_members=team, is_superuser=i == 0)
+                 for i, (first, last, email, team) in enumerate(people))
+        add_rows([
+            Repository(user_id=3, repository_name="robot-arm", repository_url="https://github.com/b/arm",
+                       description="Inverse kinematics for a six-axis robot"),
+            Repository(user_id=4, repository_name="weather", repository_url="https://github.com/c/weather",
+                       description="Rainfall prediction"),
+        ])
+        admin, member = bearer("admin@example.com"), bearer("bsmith@example.com")
+
+        def find(q: str, **params):
+            response = client.get("/search/", params={"q": q, **params}, headers=admin)
+            assert response.status_code == 200, response.text
+            body = response.json()
+            return [user["email"] for user in body["users"]], [r["repository_name"] for r in body["repositories"]]
+
+        check("a name prefix matches", find("ali")[0][0] == "alice.zeta@school.example.com")
+        check("a name match ranks above a team-member match",
+              find("alice")[0] == ["alice.zeta@school.example.com", "carol@example.com"])
+        check("team member names match", find("marley")[0] == ["alice.zeta@school.example.com"])
+        check("email fragments match", find("school.example")[0] == ["alice.zeta@school.example.com"])
+        check("every term has to match", find("alice cooper")[0] == ["carol@example.com"])
+        check("accents are ignored", find("elodie")[0] == ["elodie@example.fr"])
+        check("repository descriptions match", find("kinematic")[1] == ["robot-arm"])
+        check("limit caps each list", len(find("example", limit=2)[0]) == 2)
+        check("FTS5 syntax in the query is plain text",
+              find('bob" OR NEAR(x AND')[0] == [] and find("*")[0] == [])
+        check("members are refused", client.get("/search/?q=alice", headers=member).status_code == 403)
+
+        db = SessionLocal()
+        db.query(User).filter(User.id == 3).update({"first_name": "Robert"})
+        db.query(User).filter(User.id == 5).delete()
+        db.query(Repository).filter(Repository.id == 2).update({"description": "Snowfall prediction"})
+        db.commit()
+        db.close()
+        check("updates are indexed", find("robert")[0] == ["bsmith@example.com"] and find("bob")[0] == [
+            "alice.zeta@school.example.com"])
+        check("deletes leave the index", find("elodie")[0] == [])
+        check("repository updates are indexed", find("snowfall")[1] == ["weather"] and find("rainfall")[1] == [])
+
+        fts = {q: find(q) for q in ("alice", "robot", "smith example", "marley")}
+        # As on a database without the FTS5 tables
+        for bind in list(search._fts_engines):
+            search._fts_engines[bind] = False
+        like = {q: find(q) for q in fts}
+        check("the LIKE fallback finds the same rows",
+              all(sorted(fts[q][0]) == sorted(like[q][0]) and sorted(fts[q][1]) == sorted(like[q][1])
+                  for q in fts))
+        check("the LIKE fallback escapes wildcards", find("100%")[0] == [])
+
+
+if __name__ == "__main__":
+    run(main, "search")
@@ -0,0 +1,116 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from multiprocessing import Event, Pool, Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from base import Base
+from database import make_engine
+from exports import EXPORT_BATCH_SIZE, CSVWriter, iter_export
+from models import User
+
+# Parallel writer processes (like gunicorn workers) registering users against
+# one SQLite file while a slow client streams the registrant export. Without
+# the performance profile (rollback journal) the open export blocks every
+# commit past the busy timeout, so lock errors (SQLITE_BUSY) must occur;
+# with it (WAL) readers never block writers and there must be none. Both runs
+# wait the same 5 s on a lock (busy_timeout, pysqlite's default timeout).
+# Usage: python Tests/sqlite_concurrency.py [processes] [writes_per_process]
+processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+writes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+# Rows the export walks, and how long it keeps its read open
+seeded = 5000
+export_seconds = 8.0
+
+
+def writer(args):
+    url, worker, profile = args
+    engine = make_engine(url, sqlite_profile=profile)
+    session = sessionmaker(bind=engine)()
+    locked = 0
+    for i in range(writes):
+        email = f"user{worker}-{i}@example.com"
+        try:
+            # Same shape as /users/register: duplicate check, then insert
+            session.query(User).filter(User.email == email).first()
+            session.add(User(
+                first_name="First",
+                last_name="Last",
+                birth_date=date(2005, 1, 1),
+                email=email,
+                phone_number=f"{worker:03d}{i:07d}",
+                hashed_password="x",
+                agreed_to_rules=True,
+            ))
+            session.commit()
+        except OperationalError as e:
+            session.rollback()
+            # SQLITE_BUSY; FTS5 reports it as a failed vtable constructor
+            if "locked" in str(e) or "vtable constructor failed" in str(e):
+                locked += 1
+            else:
+                raise
+    session.close()
+    engine.dispose()
+    return locked
+
+
+def slow_export(url, profile, started):
+    engine = make_engine(url, sqlite_profile=profile)
+    session = sessionmaker(bind=engine)()
+    # A client reading the export slowly: the cursor stays open throughout
+    pause = export_seconds / (seeded / EXPORT_BATCH_SIZE)
+    for _ in iter_export(session, CSVWriter()):
+        started.set()
+        time.sleep(pause)
+    session.close()
+    engine.dispose()
+
+
+def run(profile):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/concurrency.db"
+        engine = make_engine(url, sqlite_profile=profile)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(insert(User), [
+                {"first_name": "Seed", "last_name": str(i), "birth_date": date(2005, 1, 1),
+                 "email": f"seed{i}@example.com", "phone_number": f"9{i:09d}", "hashed_password": "x",
+                 "agreed_to_rules": True}
+                for i in range(seeded)
+            ])
+        engine.dispose()
+
+        started = Event()
+        export = Process(target=slow_export, args=(url, profile, started))
+        export.start()
+        started.wait()
+        start = time.perf_counter()
+        with Pool(processes) as pool:
+            locked = sum(pool.map(writer, [(url, worker, profile) for worker in range(processes)]))
+        elapsed = time.perf_counter() - start
+        export.join()
+    total = processes * writes
+    print(f"profile={'on' if profile else 'off'}: {total} writes in {elapsed:.2f}s "
+          f"({total / elapsed:.0f}/s), {locked} lock errors (SQLITE_BUSY)")
+    return locked
+
+
+if __name__ == "__main__":
+    failed = False
+    if not run(profile=False):
+        print("FAILED: no lock errors without the profile; the test no longer exercises the contention")
+        failed = True
+    if run(profile=True):
+        print("FAILED: lock errors with the SQLite performance profile")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("Lock errors only without the profile.")
@@ -0,0 +1,107 @@
+# Tests/support.py
+"""Scaffold shared by the check scripts in this directory.
+
+A script imports this module before anything from the app (it puts the
+project root on ``sys.path``) and hands its ``main(check, tmp)`` to ``run``,
+which points DATABASE_URL at a new SQLite file and prints the verdict. App
+modules are imported lazily, after ``run`` has set DATABASE_URL, because the
+engine is built when ``database`` is first imported.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class Checks(list):
+    """Labels of the failed checks. ``check(label, ok)`` prints one result and records a failure."""
+
+    def __call__(self, label: str, ok) -> bool:
+        print(f"{'ok  ' if ok else 'FAIL'} {label}")
+        if not ok:
+            self.append(label)
+        return bool(ok)
+
+
+def run(main, name: str):
+    """Run ``main(check, tmp)`` against ``{tmp}/{name}.db``, print OK or FAIL and exit with it."""
+    check = Checks()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/{name}.db"
+        try:
+            main(check, tmp)
+        finally:
+            # Only if the script started the app; its workers would keep the process alive
+            if "utils.hashing_pool" in sys.modules:
+                sys.modules["utils.hashing_pool"].hashing_pool.shutdown()
+    print("FAIL" if check else "OK")
+    sys.exit(1 if check else 0)
+
+
+@contextmanager
+def app_client():
+    """A TestClient on the app, with startup and shutdown run around it."""
+    from fastapi.testclient import TestClient
+    from app import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def user(i: int, prefix: str, **columns):
+    """A ``User`` ``{prefix}{i}@example.com`` with phone number ``{i:010d}`` and filler for the other columns."""
+    from models import User
+
+    values = {
+        "first_name": prefix.title(), "last_name": str(i), "birth_date": date(2005, 1, 1),
+        "email": f"{prefix}{i}@example.com", "phone_number": f"{i:010d}", "hashed_password": "x",
+        "agreed_to_rules": True,
+    }
+    values.update(columns)
+    return User(**values)
+
+
+def add_rows(rows):
+    """Commit ``rows`` in one session."""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db.add_all(list(rows))
+        db.commit()
+    finally:
+        db.close()
+
+
+def in_session(fn, *args):
+    """``fn(db, *args)`` in a new session, closed afterwards."""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def registration(i: int, prefix: str, **fields) -> dict:
+    """A POST /users/register body for ``{prefix}{i}@example.com``, matching ``user(i, prefix)``."""
+    body = {
+        "first_name": prefix.title(), "last_name": str(i), "birth_date": "2005-01-01",
+        "email": f"{prefix}{i}@example.com", "phone_number": f"{i:010d}", "password": "strongpassword",
+        "agreed_to_rules": True, "team_signup": False,
+    }
+    body.update(fields)
+    return body
+
+
+def bearer(email: str) -> dict:
+    """An Authorization header with an access token for ``email``."""
+    from auth import create_access_token
+
+    return {"Authorization": "Bearer " + create_access_token({"sub": email})}
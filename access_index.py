@@ -0,0 +1,108 @@
+# access_index.py
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from auth import get_current_user, Principal
+from database import get_db, run_db
+from models import Permission
+from table_versions import table_versions
+
+# The index is stamped with the permissions table version it was loaded at
+# and reloaded once that version moves, so grants and revokes committed
+# through a Session by any process are seen on the next check. Writes that
+# bypass the Session do not bump the version; they are picked up when the
+# index is this many seconds old.
+ACCESS_INDEX_TTL = float(os.environ.get("ACCESS_INDEX_TTL", 60))
+
+
+class CompetitionAccessIndex:
+    """In-process index of which users can access which competitions.
+
+    Competition names are interned to small integers and each user's access
+    is a bitmask of those integers, so a check is two dict lookups and a bit
+    test. ``refresh`` reads the permissions table version before each use
+    and reloads the index when it changed.
+    """
+
+    def __init__(self, ttl: float = ACCESS_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (competition_ids, masks), replaced in one assignment so readers on
+        # other threads never pair the ids of one load with the masks of another
+        self._snapshot: Tuple[Dict[str, int], Dict[int, int]] = ({}, {})
+        self._version: Optional[int] = None
+        self._loaded_at: Optional[float] = None
+
+    def _current(self, version: int) -> bool:
+        return (self._version == version and self._loaded_at is not None
+                and time.monotonic() - self._loaded_at < self.ttl)
+
+    def load(self, db: Session, version: int):
+        # The version is read before the rows, so the rows are at least that
+        # new; a write landing in between only causes one more reload
+        rows = db.execute(select(Permission.user_id, Permission.competition_access)).all()
+
+        competition_ids: Dict[str, int] = {}
+        masks: Dict[int, int] = {}
+        for user_id, competition in rows:
+            bit = competition_ids.setdefault(competition, len(competition_ids))
+            masks[user_id] = masks.get(user_id, 0) | (1 << bit)
+
+        with self._lock:
+            # Loads may overlap (no lock is held across the query, which under
+            # DB_MODE=async runs on the event loop); an older one never
+            # replaces the result of a newer one
+            if self._version is not None and version < self._version:
+                return
+            self._snapshot = (competition_ids, masks)
+            self._version = version
+            self._loaded_at = time.monotonic()
+
+    def refresh(self, db: Session):
+        version = table_versions(db, (Permission.__tablename__,))[0]
+        if not self._current(version):
+            self.load(db, version)
+
+    async def ensure_loaded(self, db):
+        await run_db(db, self.refresh)
+
+    def has_access(self, user_id: int, competition: str) -> bool:
+        competition_ids, masks = self._snapshot
+        bit = competition_ids.get(competition)
+        if bit is None:
+            return False
+        return bool(masks.get(user_id, 0) >> bit & 1)
+
+    def competitions(self, user_id: int) -> List[str]:
+        competition_ids, masks = self._snapshot
+        mask = masks.get(user_id, 0)
+        return [name for name, bit in competition_ids.items() if mask >> bit & 1]
+
+
+access_index = CompetitionAccessIndex()
+
+
+def require_competition_access(competition: str):
+    """Dependency factory: allow superusers and users holding ``competition``."""
+
+    async def dependency(
+        current_user: Principal = Depends(get_current_user),
+        db: Session = Depends(get_db),
+    ) -> Principal:
+        if current_user.is_superuser:
+            return current_user
+        await access_index.ensure_loaded(db)
+        if not access_index.has_access(current_user.id, competition):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No access to this competition"
+            )
+        return current_user
+
+    return dependency
@@ -1,7 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import users, permissions, repositories
-from database import engine, Base
+from fastapi.responses import PlainTextResponse
+from routers import users, permissions, repositories, search, stats, health
+import database
+import metrics
+from database import engine
+from schema_check import prepare_schema
+from slow_queries import slow_query_log
+from utils.compression import CompressionMiddleware
+from utils.hashing_pool import hashing_pool
 import logging
 
 # Initialize FastAPI app
@@ -15,6 +22,9 @@ logger = logging.getLogger(__name__)
 app.include_router(users.router)
 app.include_router(permissions.router)
 app.include_router(repositories.router)
+app.include_router(search.router)
+app.include_router(stats.router)
+app.include_router(health.router)
 
 # Configure CORS middleware
 app.add_middleware(
@@ -25,13 +35,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresses large bodies for clients sending Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+# Outermost, so the latency it records covers every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+instrumented_engines = [engine]
+if database.async_engine is not None:
+    instrumented_engines.append(database.async_engine.sync_engine)
+for instrumented in instrumented_engines:
+    metrics.instrument_engine(instrumented)
+    slow_query_log.install(instrumented)
+
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the user management system"}
 
-# Ensure all tables are created at startup
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    # Prometheus text exposition format; each worker process reports its own series
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Create or verify the schema (SCHEMA_MODE); a no-op in workers forked from a
+# gunicorn master that already did it
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Creating all tables...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Tables created!")
+    prepare_schema(engine)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    hashing_pool.shutdown()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
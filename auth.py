@@ -1,32 +1,123 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from typing import Optional
+from typing import List, Optional, Tuple
+import hashlib
+import logging
 import os
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from models import User
-from database import get_db
+from database import get_db, run_db, SessionLocal
+from table_versions import table_versions
+from utils.hashing_pool import hashing_pool, HashingPoolFull
+from utils.cache import TTLCache
+# Password hashing lives in utils.security (scheme and cost settings)
+from utils.security import get_password_hash, verify_password
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 # Secret key and other JWT settings (for token creation)
 SECRET_KEY = os.environ.get("SECRET_KEY", "godhasasenseofhumour")  # Use environment variable for security
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Verified-token cache: skips signature checks for repeated bearer tokens
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", 300))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# Principal cache: avoids loading the users row on every authenticated call.
+# Entries are keyed on the users table version, which every commit through a
+# Session bumps in the database. The version is read at most once every
+# PRINCIPAL_VERSION_INTERVAL seconds, shared by all entries, so a hit costs no
+# query and a change made by any worker or by create_superuser.py is seen
+# within that interval. Writes that bypass the Session (raw SQL) are seen once
+# the entry expires, after PRINCIPAL_CACHE_TTL.
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", 5))
+PRINCIPAL_VERSION_INTERVAL = float(os.environ.get("PRINCIPAL_VERSION_INTERVAL", 1))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+# (users table version, time.monotonic() when it was read)
+_users_version: Tuple[Optional[int], float] = (None, 0.0)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
-def get_password_hash(password: str) -> str:
-    """Hash a plaintext password."""
-    return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plaintext password against the hashed version."""
-    return pwd_context.verify(plain_password, hashed_password)
+class Principal:
+    """Compact snapshot of the authenticated user, as used by the routers."""
+
+    __slots__ = ("id", "email", "is_active", "is_superuser")
+
+    def __init__(self, id: int, email: str, is_active: bool, is_superuser: bool):
+        self.id = id
+        self.email = email
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+
+    def __repr__(self) -> str:
+        return f"Principal(id={self.id!r}, email={self.email!r})"
+
+
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a plaintext password in the dedicated hashing pool."""
+    try:
+        return await hashing_pool.hash(password)
+    except HashingPoolFull:
+        raise _hashing_busy()
+
+async def get_password_hashes_async(passwords: List[str]) -> List[str]:
+    """Hash a batch of passwords across the hashing pool's workers."""
+    try:
+        return await hashing_pool.hash_many(passwords)
+    except HashingPoolFull:
+        raise _hashing_busy()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a plaintext password in the dedicated hashing pool."""
+    try:
+        return await hashing_pool.verify(plain_password, hashed_password)
+    except HashingPoolFull:
+        raise _hashing_busy()
+
+async def verify_and_needs_update_async(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, bool]:
+    """Verify a password and report whether its hash is outdated, in one pool job."""
+    try:
+        return await hashing_pool.verify_and_needs_update(plain_password, hashed_password)
+    except HashingPoolFull:
+        raise _hashing_busy()
+
+def _replace_password_hash(db: Session, user_id: int, old_hash: str, new_hash: str) -> bool:
+    # Only if the stored hash is still the one that was verified, so a
+    # password changed in the meantime is not overwritten
+    replaced = db.execute(
+        update(User)
+        .where(User.id == user_id, User.hashed_password == old_hash)
+        .values(hashed_password=new_hash)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(replaced)
+
+async def rehash_password(user_id: int, old_hash: str, password: str):
+    """Replace an outdated hash after a successful login; run as a background task."""
+    try:
+        new_hash = await hashing_pool.hash(password)
+        await run_db(SessionLocal(), _replace_password_hash, user_id, old_hash, new_hash)
+    except HashingPoolFull:
+        pass  # The next login tries again
+    except Exception:
+        logger.exception("Could not upgrade the password hash of user %s", user_id)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
@@ -37,17 +128,57 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def decode_access_token(token: str) -> dict:
-    """Decode a JWT access token."""
+    """Decode a JWT access token, reusing previously verified claims."""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return dict(payload)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError as e:
         raise JWTError("Invalid or expired token") from e
+    # Never serve cached claims past the token's own expiry
+    exp = payload.get("exp")
+    if exp is not None:
+        token_cache.set(key, payload, expires_at=float(exp))
+    return dict(payload)
+
+def _load_principal(db: Session, email: str) -> Optional[Principal]:
+    row = db.query(
+        User.id, User.email, User.is_active, User.is_superuser
+    ).filter(User.email == email).first()
+    return Principal(*row) if row is not None else None
+
+def _fresh_users_version() -> Optional[int]:
+    version, read_at = _users_version
+    if version is None or time.monotonic() - read_at >= PRINCIPAL_VERSION_INTERVAL:
+        return None
+    return version
 
-def get_current_user(
+def _cached_principal(email: str) -> Optional[Principal]:
+    version = _fresh_users_version()
+    return principal_cache.get((email, version)) if version is not None else None
+
+def _current_principal(db: Session, email: str) -> Optional[Principal]:
+    global _users_version
+    if principal_cache.maxsize <= 0:
+        return _load_principal(db, email)
+    version = _fresh_users_version()
+    if version is None:
+        version = table_versions(db, (User.__tablename__,))[0]
+        _users_version = (version, time.monotonic())
+    key = (email, version)
+    principal = principal_cache.get(key)
+    if principal is None:
+        principal = _load_principal(db, email)
+        if principal is not None:
+            principal_cache.set(key, principal)
+    return principal
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
+) -> Principal:
     """Get the current user from the JWT token."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -62,7 +193,16 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    # A hit under a recently read version needs no session at all
+    principal = _cached_principal(email)
+    if principal is None:
+        principal = await run_db(db, _current_principal, email)
+    if principal is None:
         raise credentials_exception
-    return user
+
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive user"
+        )
+    return principal
@@ -0,0 +1,122 @@
+# benchmarks/cold_start.py
+# Measures how long the app takes to come up, on a migrated temporary SQLite
+# database:
+#   - in a fresh interpreter: importing app, then running the startup handlers,
+#     for each SCHEMA_MODE
+#   - under gunicorn: from spawning the master until every worker has logged
+#     "Application startup complete", with and without --preload
+# Usage: python -m benchmarks.cold_start --runs 5 --workers 4 --output cold_start.json
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.run import _git_revision
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_AND_STARTUP = """
+import asyncio, json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+asyncio.run(app.app.router.startup())
+started = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "startup_ms": (started - imported) * 1000}))
+app.hashing_pool.shutdown()
+"""
+
+
+def _summary(samples) -> dict:
+    return {"median": round(statistics.median(samples), 1), "min": round(min(samples), 1),
+            "max": round(max(samples), 1)}
+
+
+def measure_process(env: dict, runs: int) -> dict:
+    """Fresh interpreter per run: total wall time, app import and startup handlers."""
+    totals, imports, startups = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", IMPORT_AND_STARTUP], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+        totals.append((time.perf_counter() - start) * 1000)
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        imports.append(timings["import_ms"])
+        startups.append(timings["startup_ms"])
+    return {"wall_ms": _summary(totals), "import_app_ms": _summary(imports), "startup_ms": _summary(startups)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_gunicorn(env: dict, workers: int, preload: bool, runs: int, timeout: float = 120) -> dict:
+    """Time from spawning gunicorn until all workers finished startup."""
+    samples = []
+    for _ in range(runs):
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app",
+                   "--workers", str(workers), "--bind", f"127.0.0.1:{_free_port()}"]
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=ROOT, env={**env, "GUNICORN_PRELOAD": "1" if preload else "0"},
+                                   stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
+        ready = 0
+        try:
+            for line in process.stderr:
+                if "Application startup complete" in line:
+                    ready += 1
+                    if ready == workers:
+                        samples.append((time.perf_counter() - start) * 1000)
+                        break
+                if time.perf_counter() - start > timeout:
+                    break
+        finally:
+            process.terminate()
+            process.wait()
+        if ready < workers:
+            raise RuntimeError(f"gunicorn started {ready}/{workers} workers (exit code {process.returncode})")
+    return {"all_workers_ready_ms": _summary(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app import, startup and gunicorn boot times.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp}/cold.db"}
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env,
+                       check=True, capture_output=True)
+        results = {}
+        for mode in ("create", "check"):
+            mode_env = {**env, "SCHEMA_MODE": mode}
+            results[f"process_{mode}"] = measure_process(mode_env, args.runs)
+            print(f"process_{mode}: {json.dumps(results[f'process_{mode}'])}", file=sys.stderr)
+        for mode, preload in (("create", False), ("check", False), ("check", True)):
+            name = f"gunicorn_{mode}_{'preload' if preload else 'no_preload'}"
+            results[name] = measure_gunicorn({**env, "SCHEMA_MODE": mode}, args.workers, preload, args.runs)
+            print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+
+    report = {
+        "meta": {"revision": _git_revision(), "python": platform.python_version(), "cpus": os.cpu_count(),
+                 "workers": args.workers, "runs": args.runs},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/compare.py
+# Prints throughput and latency changes between two benchmarks/run.py reports.
+# Usage: python -m benchmarks.compare before.json after.json
+import argparse
+import json
+
+COLUMNS = [("throughput_rps", "rps"), ("p50", "p50 ms"), ("p99", "p99 ms")]
+
+
+def _metric(result: dict, key: str) -> float:
+    return result[key] if key in result else result["latency_ms"][key]
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def compare(before: dict, after: dict) -> str:
+    lines = [
+        f"before: {before['meta']['revision']} ({before['meta']['db_mode']})   "
+        f"after: {after['meta']['revision']} ({after['meta']['db_mode']})",
+        f"{'scenario':<20}" + "".join(f"{label:>28}" for _, label in COLUMNS),
+    ]
+    for name, result in after["scenarios"].items():
+        if name not in before["scenarios"]:
+            continue
+        cells = []
+        for key, _ in COLUMNS:
+            old, new = _metric(before["scenarios"][name], key), _metric(result, key)
+            cells.append(f"{f'{old:g} -> {new:g} ({_change(old, new)})':>28}")
+        lines.append(f"{name:<20}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(compare(before, after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# benchmarks/run.py
+# Drives the ASGI app in-process through httpx against a freshly seeded
+# database and reports throughput and latency percentiles per scenario as
+# JSON, so runs before and after a change can be compared with
+# benchmarks/compare.py.
+# Usage: python -m benchmarks.run --users 10000 --requests 500 --concurrency 32 --output after.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.seed import SEED_PASSWORD, competition_name, seed, seed_email
+
+# Items per request in the bulk-write scenarios
+BATCH_ITEMS = 100
+IMPORT_ROWS = 20
+# Refresh tokens minted up front; each refresh hands its successor back to the pool
+REFRESH_POOL = 256
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+class Context:
+    """Seed layout and tokens shared by the scenarios."""
+
+    def __init__(self, users: int, competitions: int):
+        from auth import create_access_token
+
+        self.users = users
+        self.competitions = competitions
+        self.random = random.Random(1234)
+        self.admin = {"Authorization": "Bearer " + create_access_token({"sub": seed_email(0)})}
+        # Tokens are minted directly; the login scenario is where bcrypt is measured
+        self.tokens = {}
+        # ETags remembered by the revalidation scenarios, keyed by URL
+        self.etags = {}
+        self.create_access_token = create_access_token
+        self.refresh_tokens = self.mint_refresh_tokens(min(REFRESH_POOL, users - 1))
+
+    def user(self) -> int:
+        return self.random.randrange(1, self.users)
+
+    def mint_refresh_tokens(self, count: int) -> List[str]:
+        from database import SessionLocal
+        from refresh_tokens import issue_refresh_token
+
+        db = SessionLocal()
+        try:
+            tokens = [issue_refresh_token(db, self.user()) for _ in range(count)]
+            db.commit()
+        finally:
+            db.close()
+        return tokens
+
+    def headers(self, i: int) -> dict:
+        if i not in self.tokens:
+            self.tokens[i] = {"Authorization": "Bearer " + self.create_access_token({"sub": seed_email(i)})}
+        return self.tokens[i]
+
+
+# Phone number prefixes keep each scenario's registrations distinct
+PHONE_PREFIXES = {"reg": "81", "imp": "82"}
+
+
+def registration(tag: str, i: int) -> dict:
+    return {
+        "first_name": "Bench",
+        "last_name": f"Register{i}",
+        "birth_date": "2005-01-01",
+        "email": f"{tag}{i}@register.example.com",
+        "password": "strongpassword",
+        "phone_number": f"{PHONE_PREFIXES[tag]}{i:08d}",
+        "competition": competition_name(0),
+        "agreed_to_rules": True,
+        "team_signup": False,
+    }
+
+
+async def scenario_register(client, ctx: Context, i: int):
+    return await client.post("/users/register", json=registration("reg", i))
+
+
+async def scenario_login(client, ctx: Context, i: int):
+    return await client.post("/users/login", data={"username": seed_email(ctx.user()), "password": SEED_PASSWORD})
+
+
+async def scenario_login_unknown(client, ctx: Context, i: int):
+    # Unknown emails cost a dummy verify, so they take as long as scenario_login (and answer 401)
+    return await client.post("/users/login", data={"username": f"nobody{i}@unknown.example.com",
+                                                   "password": SEED_PASSWORD})
+
+
+async def scenario_refresh(client, ctx: Context, i: int):
+    # What a client does instead of logging in again when its access token expires
+    token = ctx.refresh_tokens.pop() if ctx.refresh_tokens else ctx.mint_refresh_tokens(1)[0]
+    response = await client.post("/users/refresh", json={"refresh_token": token})
+    if response.status_code == 200:
+        ctx.refresh_tokens.insert(0, response.json()["refresh_token"])
+    return response
+
+
+async def scenario_auth_get(client, ctx: Context, i: int):
+    competition = competition_name(ctx.random.randrange(ctx.competitions))
+    return await client.get(f"/permissions/check?competition_access={competition}", headers=ctx.headers(ctx.user()))
+
+
+async def scenario_list_users(client, ctx: Context, i: int):
+    return await client.get("/users/retrieve?limit=100", headers=ctx.admin)
+
+
+async def scenario_list_users_1000(client, ctx: Context, i: int):
+    return await client.get("/users/retrieve?limit=1000", headers=ctx.admin)
+
+
+async def scenario_list_users_1000_gzip(client, ctx: Context, i: int):
+    return await client.get("/users/retrieve?limit=1000", headers={**ctx.admin, "Accept-Encoding": "gzip"})
+
+
+async def scenario_list_users_1000_br(client, ctx: Context, i: int):
+    return await client.get("/users/retrieve?limit=1000", headers={**ctx.admin, "Accept-Encoding": "br"})
+
+
+async def scenario_list_users_1000_revalidate(client, ctx: Context, i: int):
+    # A dashboard polling an unchanged listing: every request after the first is a 304
+    url = "/users/retrieve?limit=1000"
+    headers = {**ctx.admin, "If-None-Match": ctx.etags[url]} if url in ctx.etags else ctx.admin
+    response = await client.get(url, headers=headers)
+    ctx.etags.setdefault(url, response.headers.get("etag"))
+    return response
+
+
+async def scenario_list_users_sparse(client, ctx: Context, i: int):
+    return await client.get("/users/retrieve?limit=100&fields=id,email,competition", headers=ctx.admin)
+
+
+async def scenario_list_repositories(client, ctx: Context, i: int):
+    return await client.get("/repositories/", headers=ctx.headers(ctx.user()))
+
+
+async def scenario_list_permissions(client, ctx: Context, i: int):
+    return await client.get("/permissions/?limit=100", headers=ctx.admin)
+
+
+async def scenario_search(client, ctx: Context, i: int):
+    # A last-name prefix: "user1234" matches user1234 and user12340..user12349
+    return await client.get(f"/search/?q=user{ctx.user()}", headers=ctx.admin)
+
+
+async def scenario_search_broad(client, ctx: Context, i: int):
+    # A word in every seeded row's first name and email
+    return await client.get("/search/?q=seed", headers=ctx.admin)
+
+
+async def scenario_competition_stats(client, ctx: Context, i: int):
+    return await client.get("/stats/competitions", headers=ctx.admin)
+
+
+async def scenario_assign_batch(client, ctx: Context, i: int):
+    # A competition no seed user holds, so every item is a real insert
+    items = [{"user_id": ctx.user(), "competition_access": f"Batch {i}"} for _ in range(BATCH_ITEMS)]
+    return await client.post("/permissions/assign/batch", json={"items": items}, headers=ctx.admin)
+
+
+async def scenario_import(client, ctx: Context, i: int):
+    rows = "\n".join(json.dumps(registration("imp", i * IMPORT_ROWS + k)) for k in range(IMPORT_ROWS))
+    return await client.post("/users/import?format=ndjson", content=rows, headers=ctx.admin)
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "register": scenario_register,
+    "login": scenario_login,
+    "login_unknown": scenario_login_unknown,
+    "refresh": scenario_refresh,
+    "auth_get": scenario_auth_get,
+    "list_users": scenario_list_users,
+    "list_users_1000": scenario_list_users_1000,
+    "list_users_1000_gzip": scenario_list_users_1000_gzip,
+    "list_users_1000_br": scenario_list_users_1000_br,
+    "list_users_1000_revalidate": scenario_list_users_1000_revalidate,
+    "list_users_sparse": scenario_list_users_sparse,
+    "list_repositories": scenario_list_repositories,
+    "list_permissions": scenario_list_permissions,
+    "search": scenario_search,
+    "search_broad": scenario_search_broad,
+    "competition_stats": scenario_competition_stats,
+    "assign_batch": scenario_assign_batch,
+    "import": scenario_import,
+}
+
+
+async def run_scenario(client, ctx: Context, scenario: Callable, requests: int, concurrency: int, warmup: int) -> dict:
+    for i in range(min(warmup, requests)):
+        await scenario(client, ctx, requests + i)
+
+    latencies: List[float] = []
+    sizes: List[int] = []
+    statuses: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await scenario(client, ctx, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(response.num_bytes_downloaded)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "status_codes": statuses,
+        "errors": sum(count for code, count in statuses.items() if not code.startswith(("2", "3"))),
+        # Bytes on the wire, i.e. after any compression
+        "response_bytes_mean": round(sum(sizes) / len(sizes)),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "p50": round(percentile(latencies, 50), 2),
+            "p90": round(percentile(latencies, 90), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2),
+        },
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    import httpx
+    from app import app
+    from database import DB_MODE, async_engine, engine
+    from utils.hashing_pool import hashing_pool
+
+    start = time.perf_counter()
+    counts = seed(engine, args.users, args.permissions_per_user, args.repositories_per_user, args.competitions)
+    seed_seconds = time.perf_counter() - start
+
+    ctx = Context(args.users, args.competitions)
+    results = {}
+    try:
+        # Uncompressed unless a scenario asks for an encoding
+        async with httpx.AsyncClient(
+            app=app, base_url="http://bench", timeout=None, headers={"Accept-Encoding": "identity"}
+        ) as client:
+            for name in args.scenarios:
+                # bcrypt-bound scenarios get fewer requests; each import row is one hash
+                requests = args.requests
+                if name in ("register", "login", "login_unknown"):
+                    requests = args.hash_requests
+                elif name == "import":
+                    requests = max(1, args.hash_requests // IMPORT_ROWS)
+                results[name] = await run_scenario(
+                    client, ctx, SCENARIOS[name], requests, args.concurrency, args.warmup
+                )
+                print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+    finally:
+        hashing_pool.shutdown()
+        if async_engine is not None:
+            await async_engine.dispose()
+
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "db_mode": DB_MODE,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "seed": counts,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the in-process benchmark scenarios.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--permissions-per-user", type=int, default=2)
+    parser.add_argument("--repositories-per-user", type=int, default=3)
+    parser.add_argument("--competitions", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--hash-requests", type=int, default=100,
+                        help="Password hashes per bcrypt-bound scenario (register, login, login_unknown, import)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--database-url", help="Benchmark against this database instead of a temporary SQLite file")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app reads DATABASE_URL at import time, so it is set before run() imports it
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp}/bench.db"
+        # Every request comes from one client address; the login scenarios measure
+        # hashing, not admission control (Tests/login_admission.py covers that)
+        os.environ.setdefault("LOGIN_RATE_LIMIT", "off")
+        os.environ.setdefault("LOGIN_MAX_CONCURRENT_VERIFIES", "1000000")
+        report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
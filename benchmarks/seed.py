@@ -0,0 +1,128 @@
+# benchmarks/seed.py
+# Fills a database with N users, their permissions and repositories. Every
+# seeded user shares one precomputed bcrypt hash of SEED_PASSWORD, so seeding
+# costs a single hash, and rows go in through batched executemany inserts.
+# Usage: python -m benchmarks.seed --users 100000 --database-url sqlite:///./bench.db
+import argparse
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Engine
+
+from base import Base
+from models import Permission, Repository, User
+
+SEED_PASSWORD = "benchpassword"
+# Rows per executemany, and emails per IN (...) id lookup
+SEED_BATCH_SIZE = 5000
+SEED_LOOKUP_SIZE = 500
+
+
+def seed_email(i: int) -> str:
+    return f"seed{i}@bench.example.com"
+
+
+def competition_name(i: int) -> str:
+    return f"Competition {i}"
+
+
+def _user_row(i: int, hashed_password: str, competitions: int) -> dict:
+    return {
+        "first_name": "Seed",
+        "last_name": f"User{i}",
+        "birth_date": date(2000, 1, 1) + timedelta(days=i % 3650),
+        "email": seed_email(i),
+        "hashed_password": hashed_password,
+        "phone_number": f"9{i:09d}",
+        "competition": competition_name(i % competitions),
+        "agreed_to_rules": True,
+        "team_signup": False,
+        "team_members": None,
+        "team_member_emails": None,
+        "is_active": True,
+        # The first seeded user administers the rest
+        "is_superuser": i == 0,
+    }
+
+
+def seed(
+    engine: Engine,
+    users: int,
+    permissions_per_user: int = 2,
+    repositories_per_user: int = 3,
+    competitions: int = 10,
+    hashed_password: str = None,
+) -> Dict[str, int]:
+    """Insert the seed data and return ``{"users": ..., "permissions": ..., "repositories": ...}``.
+
+    Seeded users are numbered from 0; ``seed_email(i)`` and ``SEED_PASSWORD``
+    log in as user ``i``. The database must not already hold seed users.
+    """
+    if hashed_password is None:
+        from utils.security import get_password_hash
+        hashed_password = get_password_hash(SEED_PASSWORD)
+    Base.metadata.create_all(bind=engine)
+
+    counts = {"users": 0, "permissions": 0, "repositories": 0}
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        for start in range(0, users, SEED_BATCH_SIZE):
+            numbers = range(start, min(start + SEED_BATCH_SIZE, users))
+            connection.execute(insert(User), [_user_row(i, hashed_password, competitions) for i in numbers])
+            emails = [seed_email(i) for i in numbers]
+            ids = {}
+            for offset in range(0, len(emails), SEED_LOOKUP_SIZE):
+                chunk = emails[offset:offset + SEED_LOOKUP_SIZE]
+                ids.update(connection.execute(select(User.email, User.id).where(User.email.in_(chunk))).all())
+
+            permissions: List[dict] = []
+            repositories: List[dict] = []
+            for i in numbers:
+                user_id = ids[seed_email(i)]
+                for k in range(min(permissions_per_user, competitions)):
+                    permissions.append({
+                        "user_id": user_id,
+                        "competition_access": competition_name((i + k) % competitions),
+                    })
+                for k in range(repositories_per_user):
+                    repositories.append({
+                        "user_id": user_id,
+                        "repository_name": f"project{k}",
+                        "repository_url": f"https://github.com/seed{i}/project{k}",
+                        "description": None,
+                        "created_at": now,
+                        "updated_at": now,
+                    })
+            if permissions:
+                connection.execute(insert(Permission), permissions)
+            if repositories:
+                connection.execute(insert(Repository), repositories)
+            counts["users"] += len(numbers)
+            counts["permissions"] += len(permissions)
+            counts["repositories"] += len(repositories)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database with benchmark users.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--permissions-per-user", type=int, default=2)
+    parser.add_argument("--repositories-per-user", type=int, default=3)
+    parser.add_argument("--competitions", type=int, default=10)
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL")
+    args = parser.parse_args()
+
+    from database import DATABASE_URL, make_engine
+    engine = make_engine(args.database_url or DATABASE_URL)
+    start = time.perf_counter()
+    counts = seed(engine, args.users, args.permissions_per_user, args.repositories_per_user, args.competitions)
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    rows = sum(counts.values())
+    print(f"Seeded {counts} in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s); password: {SEED_PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# competition_stats.py
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
+
+from models import COMPETITION_STAT_COLUMNS, CompetitionStat, competition_stats_recount_sql
+
+# Registrant, team and repository counts per competition, by User.competition
+# ("competition" scope) and by Permission.competition_access ("access" scope).
+# On SQLite the triggers defined in models.py keep competition_stats current
+# on every write, so reading the stats costs one row per competition.
+# Limitation: only SQLite has the triggers. On other databases the stats are
+# counted from the tables on each request, a full scan of users, permissions
+# and repositories, so the per-competition cost holds on SQLite alone.
+
+SCOPES = ("competition", "access")
+
+# Triggers found on the engine, or not; checked once per process
+_maintained_engines: Dict[object, bool] = {}
+
+StatKey = Tuple[str, str]
+
+
+def stats_maintained(db: Session) -> bool:
+    bind = db.get_bind()
+    if bind not in _maintained_engines:
+        _maintained_engines[bind] = bind.dialect.name == "sqlite" and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'competition_stats_user_insert'")
+        ).first() is not None
+    return _maintained_engines[bind]
+
+
+def recount(db: Session) -> Dict[StatKey, Tuple[int, ...]]:
+    """Full scan of users, permissions and repositories."""
+    rows = db.execute(text(competition_stats_recount_sql(db.get_bind().dialect.name))).all()
+    return {(row[0], row[1]): tuple(int(value) for value in row[2:]) for row in rows}
+
+
+def stored(db: Session) -> Dict[StatKey, Tuple[int, ...]]:
+    columns = [getattr(CompetitionStat, name) for name in COMPETITION_STAT_COLUMNS]
+    rows = db.execute(select(CompetitionStat.scope, CompetitionStat.competition, *columns)).all()
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+
+def _entry(competition: str, registrants: int, team_signups: int, team_members: int, repositories: int) -> dict:
+    return {
+        "competition": competition,
+        "registrants": registrants,
+        "team_signups": team_signups,
+        "solo_signups": registrants - team_signups,
+        "team_members": team_members,
+        # The registrant plus the members they listed
+        "average_team_size": round(1 + team_members / team_signups, 2) if team_signups else None,
+        "repositories": repositories,
+    }
+
+
+def competition_stats(db: Session) -> dict:
+    """Stats for every competition with registrants, in each scope."""
+    totals = stored(db) if stats_maintained(db) else recount(db)
+    result = {scope: [] for scope in SCOPES}
+    for (scope, competition), values in sorted(totals.items()):
+        # Rows stay behind, at zero, once a competition's last registrant goes
+        if values[0] > 0:
+            result[scope].append(_entry(competition, *values))
+    return {"competitions": result["competition"], "access": result["access"]}
+
+
+def check_competition_stats(db: Session) -> List[dict]:
+    """Where the stored totals differ from a recount; empty when they agree."""
+    # One statement reads both sides, so a write landing in between cannot
+    # show up as drift
+    columns = ", ".join(COMPETITION_STAT_COLUMNS)
+    recount_sql = competition_stats_recount_sql(db.get_bind().dialect.name)
+    rows = db.execute(text(
+        f"SELECT 'actual', scope, competition, {columns} FROM ({recount_sql}) AS recount "
+        f"UNION ALL SELECT 'stored', scope, competition, {columns} FROM competition_stats"
+    )).all()
+    actual = {(row[1], row[2]): tuple(int(value) for value in row[3:]) for row in rows if row[0] == "actual"}
+    kept = {(row[1], row[2]): tuple(row[3:]) for row in rows if row[0] == "stored"}
+    drift = []
+    zeros = (0,) * len(COMPETITION_STAT_COLUMNS)
+    for key in sorted(set(actual) | set(kept)):
+        expected, found = actual.get(key, zeros), kept.get(key, zeros)
+        for name, want, have in zip(COMPETITION_STAT_COLUMNS, expected, found):
+            if want != have:
+                drift.append({"scope": key[0], "competition": key[1], "column": name,
+                              "stored": have, "actual": want})
+    return drift
+
+
+def rebuild_competition_stats(db: Session) -> int:
+    """Replace the stored totals with a recount; returns the number of rows written."""
+    # The delete takes SQLite's write lock first, so no write can land
+    # between the recount and the insert
+    db.execute(delete(CompetitionStat))
+    totals = recount(db)
+    if totals:
+        db.execute(CompetitionStat.__table__.insert(), [
+            dict(scope=scope, competition=competition, **dict(zip(COMPETITION_STAT_COLUMNS, values)))
+            for (scope, competition), values in totals.items()
+        ])
+    db.commit()
+    return len(totals)
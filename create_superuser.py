@@ -1,16 +1,27 @@
 # create_superuser.py
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import User
-from auth import get_password_hash
+import table_versions  # noqa: F401  registers the change-marker session events
 from datetime import date
+from competition_stats import check_competition_stats, rebuild_competition_stats, stats_maintained
+from refresh_tokens import prune_refresh_tokens
+from user_import import prepare_import, mark_existing, insert_pending
+from utils import security
+from utils.hashing_pool import PASSWORD_HASH_BATCH_SIZE
 
 def create_superuser():
     db: Session = SessionLocal()
     try:
         email = input("Enter email for superuser: ")
         password = input("Enter password for superuser: ")
-        hashed_password = get_password_hash(password)
+        hashed_password = security.get_password_hash(password)
 
         superuser = User(
             first_name="Admin",
@@ -35,8 +46,112 @@ def create_superuser():
     finally:
         db.close()
 
+def import_users(path: str, fmt: str = None, report_path: str = None):
+    """Bulk-register users from an NDJSON or CSV roster file."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    with open(path, encoding="utf-8-sig") as f:
+        plan = prepare_import(f.read(), fmt)
+
+    db: Session = SessionLocal()
+    try:
+        mark_existing(db, plan)
+        passwords = [user.password for _, user in plan.pending]
+        # Hash on every core; this dominates the import time
+        with ProcessPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            hashes = list(pool.map(security.get_password_hash, passwords, chunksize=PASSWORD_HASH_BATCH_SIZE))
+        insert_pending(db, plan, hashes)
+    finally:
+        db.close()
+
+    report = plan.report()
+    print(f"Created: {report['created']}, duplicates: {report['duplicate']}, invalid: {report['invalid']}")
+    for result in report["results"]:
+        if result["status"] != "created":
+            print(f"  row {result['row']} ({result['email']}): {result['status']} - {result['detail']}")
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Full report written to {report_path}")
+
+def prune_tokens():
+    """Delete expired refresh tokens; run periodically, e.g. from cron."""
+    db: Session = SessionLocal()
+    try:
+        print(f"Deleted {prune_refresh_tokens(db)} expired refresh tokens")
+    finally:
+        db.close()
+
+def rebuild_stats(check_only: bool = False):
+    """Recount the competition stats, report drift from the stored totals and replace them."""
+    db: Session = SessionLocal()
+    try:
+        if not stats_maintained(db):
+            print("Competition stats are counted on each request on this database; nothing to rebuild")
+            return
+        drift = check_competition_stats(db)
+        for entry in drift:
+            print(f"  {entry['scope']} {entry['competition']!r} {entry['column']}: "
+                  f"stored {entry['stored']}, actual {entry['actual']}")
+        print(f"Drifted values: {len(drift)}")
+        if check_only:
+            if drift:
+                sys.exit(1)
+            return
+        print(f"Rebuilt {rebuild_competition_stats(db)} competition stats rows")
+    finally:
+        db.close()
+
+def calibrate_hashing(scheme: str, target_ms: float, samples: int, memory_kib: int):
+    """Print the hash cost settings that meet ``target_ms`` per verify on this host."""
+    result = security.calibrate(scheme, target_ms, samples, argon2_memory_cost=memory_kib)
+    if result["verify_ms"] > target_ms:
+        print(f"# Even the minimum cost takes {result['verify_ms']} ms here, over the {target_ms:g} ms target")
+    else:
+        print(f"# Median verify: {result['verify_ms']} ms (target {target_ms:g} ms)")
+    for name, value in result["settings"].items():
+        print(f"{name}={value}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Admin tools for the user management backend.")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("create-superuser", help="Interactively create a superuser (default)")
+    import_parser = commands.add_parser("import-users", help="Bulk-register users from NDJSON or CSV")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["ndjson", "csv"], help="Defaults to the file extension")
+    import_parser.add_argument("--report", help="Write the per-row JSON report to this file")
+    commands.add_parser("prune-refresh-tokens", help="Delete expired refresh tokens")
+    stats_parser = commands.add_parser(
+        "rebuild-competition-stats", help="Recount the per-competition stats and report drift"
+    )
+    stats_parser.add_argument("--check", action="store_true",
+                              help="Only report drift (exit status 1 if any); change nothing")
+    calibrate_parser = commands.add_parser(
+        "calibrate-hashing", help="Pick the password hash cost that meets a verify latency target on this host"
+    )
+    calibrate_parser.add_argument("--scheme", choices=security.SCHEMES, default=security.PASSWORD_HASH_SCHEME)
+    calibrate_parser.add_argument("--target-ms", type=float, default=250, help="Verify latency to aim for")
+    calibrate_parser.add_argument("--samples", type=int, default=3, help="Verifications timed per candidate")
+    calibrate_parser.add_argument("--memory-kib", type=int, default=security.ARGON2_MEMORY_COST,
+                                  help="argon2 memory cost")
+    args = parser.parse_args()
+
+    if args.command == "import-users":
+        import_users(args.path, args.format, args.report)
+    elif args.command == "calibrate-hashing":
+        calibrate_hashing(args.scheme, args.target_ms, args.samples, args.memory_kib)
+    elif args.command == "prune-refresh-tokens":
+        prune_tokens()
+    elif args.command == "rebuild-competition-stats":
+        rebuild_stats(args.check)
+    else:
+        create_superuser()
+
 if __name__ == "__main__":
-    create_superuser()
+    main()
 
 # Enter email for superuser: admin@keen360.com
-# Enter password for superuser: admin123
\ No newline at end of file
+# Enter password for superuser: admin123
+# python create_superuser.py import-users roster.csv --report report.json
+# python create_superuser.py prune-refresh-tokens
+# python create_superuser.py calibrate-hashing --target-ms 250
+# python create_superuser.py rebuild-competition-stats --check
@@ -1,21 +1,166 @@
 # database.py
+import os
+
 from base import Base
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+
+# Define the database URL (override with the DATABASE_URL environment variable)
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./users.db")
+
+# "sync" runs DB work on the threadpool; "async" uses an AsyncSession stack
+DB_MODE = os.environ.get("DB_MODE", "sync")
+
+
+def _async_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", -1))
+
+# SQLite performance profile, applied to every new connection
+SQLITE_PERFORMANCE_PROFILE = os.environ.get("SQLITE_PERFORMANCE_PROFILE", "1") == "1"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    # Negative values are KiB rather than pages
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -64000)),
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return ":memory:" in url or url.split("://", 1)[-1].strip("/") == ""
+
+
+def _pool_options(url: str) -> dict:
+    if _is_sqlite(url):
+        if _is_sqlite_memory(url):
+            return {}
+        # Keep connections open so the pragmas are paid once per connection
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def make_engine(url: str = DATABASE_URL, sqlite_profile: bool = SQLITE_PERFORMANCE_PROFILE) -> Engine:
+    """Build an engine for ``url`` using the pool and SQLite settings above."""
+    kwargs = _pool_options(url)
+    if _is_sqlite(url):
+        # Sessions may cross threadpool threads (async routes offload DB work)
+        kwargs["connect_args"] = {"check_same_thread": False}
+        if not _is_sqlite_memory(url):
+            kwargs["poolclass"] = QueuePool
+    engine = create_engine(url, **kwargs)
+    if _is_sqlite(url) and sqlite_profile:
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
 
-# Define the database URL 
-DATABASE_URL = "sqlite:///./users.db"
-engine = create_engine(DATABASE_URL)
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL, sqlite_profile: bool = SQLITE_PERFORMANCE_PROFILE):
+    """Async counterpart of ``make_engine`` (aiosqlite locally, asyncpg for Postgres)."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    kwargs = _pool_options(url)
+    if _is_sqlite(url) and not _is_sqlite_memory(url):
+        kwargs["poolclass"] = AsyncAdaptedQueuePool
+    async_engine = create_async_engine(url, **kwargs)
+    if _is_sqlite(url) and sqlite_profile:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return async_engine
+
+
+engine = make_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async_engine = make_async_engine()
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine, class_=AsyncSession, autocommit=False, autoflush=False, future=True
+    )
+
 
-# Dependency function to get database session
-def get_db():
+# Dependency functions to get a database session
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+get_db = get_async_db if DB_MODE == "async" else get_sync_db
+
+
+def _run_unit_of_work(db: Session, fn, *args):
+    try:
+        return fn(db, *args)
+    finally:
+        # Hand the connection back to the pool; loaded objects stay readable
+        db.close()
+
+
+async def run_db(db, fn, *args):
+    """Run ``fn(session, *args)`` as one unit of work without blocking the event loop.
+
+    Route handlers keep their queries in plain functions taking a sync
+    ``Session``. With an ``AsyncSession`` they run through ``run_sync`` on the
+    async driver; with a sync ``Session`` they run on the threadpool. The
+    session is closed afterwards so a request awaiting something else (bcrypt,
+    the client) never pins a pooled connection.
+    """
+    if isinstance(db, Session):
+        return await run_in_threadpool(_run_unit_of_work, db, fn, *args)
+    try:
+        return await db.run_sync(fn, *args)
+    finally:
+        await db.close()
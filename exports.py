@@ -0,0 +1,166 @@
+# exports.py
+import csv
+import io
+import json
+from typing import AsyncIterator, Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import User, Repository
+
+# Rows fetched from the database cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+USER_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.birth_date,
+    User.email,
+    User.phone_number,
+    User.competition,
+    User.agreed_to_rules,
+    User.team_signup,
+    User.team_members,
+    User.team_member_emails,
+    User.is_active,
+    User.is_superuser,
+)
+REPOSITORY_COLUMNS = (
+    Repository.id.label("repository_id"),
+    Repository.repository_name,
+    Repository.repository_url,
+    Repository.description,
+    Repository.created_at,
+    Repository.updated_at,
+)
+USER_FIELDS = [column.key for column in USER_COLUMNS]
+REPOSITORY_FIELDS = ["id", "repository_name", "repository_url", "description", "created_at", "updated_at"]
+CSV_HEADER = USER_FIELDS + [
+    "repository_id",
+    "repository_name",
+    "repository_url",
+    "repository_description",
+    "repository_created_at",
+    "repository_updated_at",
+]
+
+
+def _export_statement(competition: Optional[str]):
+    stmt = (
+        select(*USER_COLUMNS, *REPOSITORY_COLUMNS)
+        .outerjoin(Repository, Repository.user_id == User.id)
+        .order_by(User.id, Repository.id)
+    )
+    if competition is not None:
+        stmt = stmt.where(User.competition == competition)
+    return stmt
+
+
+def iter_export_batches(db: Session, competition: Optional[str] = None) -> Iterator[list]:
+    """Stream joined (user, repository) column tuples from a server-side cursor, a batch at a time.
+
+    Plain tuples are used instead of ORM objects so nothing accumulates in the
+    session's identity map while the export runs.
+    """
+    stmt = _export_statement(competition).execution_options(stream_results=True)
+    result = db.execute(stmt).yield_per(EXPORT_BATCH_SIZE)
+    try:
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        result.close()
+
+
+async def aiter_export_batches(db, competition: Optional[str] = None) -> AsyncIterator[list]:
+    """``iter_export_batches`` on an ``AsyncSession``."""
+    result = (await db.stream(_export_statement(competition))).yield_per(EXPORT_BATCH_SIZE)
+    try:
+        async for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        await result.close()
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ";".join(str(item) for item in value)
+    return value
+
+
+class NDJSONWriter:
+    """One JSON document per registrant, with their repositories nested.
+
+    Rows arrive ordered by user, so a registrant is written once a row of
+    the next one shows up, or at ``finish``.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def __init__(self):
+        self._current = None
+
+    def _line(self) -> str:
+        return json.dumps(self._current, default=str) + "\n"
+
+    def feed(self, rows: list) -> str:
+        user_width = len(USER_COLUMNS)
+        lines = []
+        for row in rows:
+            if self._current is None or self._current["id"] != row[0]:
+                if self._current is not None:
+                    lines.append(self._line())
+                self._current = dict(zip(USER_FIELDS, row[:user_width]))
+                self._current["repositories"] = []
+            if row[user_width] is not None:
+                self._current["repositories"].append(dict(zip(REPOSITORY_FIELDS, row[user_width:])))
+        return "".join(lines)
+
+    def finish(self) -> str:
+        return self._line() if self._current is not None else ""
+
+
+class CSVWriter:
+    """One CSV row per (registrant, repository) pair."""
+
+    media_type = "text/csv"
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(CSV_HEADER)
+
+    def feed(self, rows: list) -> str:
+        self._writer.writerows([_csv_value(value) for value in row] for row in rows)
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return chunk
+
+    def finish(self) -> str:
+        return self.feed([])
+
+
+def iter_export(db: Session, writer, competition: Optional[str] = None) -> Iterator[str]:
+    """The export as text chunks, one per batch of rows."""
+    for rows in iter_export_batches(db, competition):
+        chunk = writer.feed(rows)
+        if chunk:
+            yield chunk
+    yield writer.finish()
+
+
+async def aiter_export(db, writer, competition: Optional[str] = None) -> AsyncIterator[str]:
+    """``iter_export`` on an ``AsyncSession``."""
+    async for rows in aiter_export_batches(db, competition):
+        chunk = writer.feed(rows)
+        if chunk:
+            yield chunk
+    yield writer.finish()
+
+
+EXPORT_FORMATS = {
+    "ndjson": NDJSONWriter,
+    "csv": CSVWriter,
+}
@@ -0,0 +1,37 @@
+# gunicorn.conf.py
+# Usage: gunicorn -c gunicorn.conf.py app:app  (workers from WEB_CONCURRENCY or -w)
+import os
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.environ.get("BIND", "0.0.0.0:80")
+
+# Addresses of the reverse proxies whose X-Forwarded-For / X-Forwarded-Proto
+# are trusted (comma-separated, "*" for any). Behind a proxy, set this to its
+# address so request.client is the real client; otherwise every request
+# appears to come from the proxy and the per-IP login limit becomes a
+# site-wide one. Never "*" when clients can reach the workers directly.
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Import the app once in the master; workers fork from the warmed process
+# instead of each importing FastAPI, SQLAlchemy and the routers again
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+
+def on_starting(server):
+    # Create or verify the schema once, before any worker exists. A mismatch
+    # under SCHEMA_MODE=check stops the master here instead of every worker
+    # failing its own startup.
+    import database
+    from schema_check import prepare_schema
+
+    prepare_schema(database.engine)
+
+
+def post_fork(server, worker):
+    # Connections the master pooled (e.g. for the schema check) must not be
+    # shared with the children; drop them without closing the parent's sockets
+    import database
+
+    database.engine.dispose(close=False)
+    if database.async_engine is not None:
+        database.async_engine.sync_engine.dispose(close=False)
@@ -0,0 +1,226 @@
+# metrics.py
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by label values."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Iterable[float]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts, then the +Inf count and the sum
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            for label_values, counts in series:
+                labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+                prefix = labels + "," if labels else ""
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {counts[-2]}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{self.name}_sum{suffix} {counts[-1]:.6f}")
+                lines.append(f"{self.name}_count{suffix} {counts[-2]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route template.",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+request_db_queries = Histogram(
+    "http_request_db_queries", "SQL statements executed per request.",
+    ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+request_db_seconds = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+request_hash_seconds = Histogram(
+    "http_request_password_hash_seconds", "Password hashing time per request, for routes that hash or verify.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+password_hash_seconds = Histogram(
+    "password_hash_seconds", "Wall time of password hashing jobs, including time queued for a worker.",
+    ("operation",), LATENCY_BUCKETS,
+)
+HISTOGRAMS = [
+    request_duration, request_db_queries, request_db_seconds, request_hash_seconds, password_hash_seconds,
+]
+
+
+class RequestStats:
+    """Counters for the request being served, shared through a contextvar."""
+
+    __slots__ = ("method", "scope", "queries", "db_seconds", "hash_seconds")
+
+    def __init__(self, scope: dict):
+        self.method = scope.get("method")
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        # FastAPI stores the matched route in the scope while routing
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+# Threadpool calls and AsyncSession.run_sync both run in a copy of the
+# request's context, so they update the same RequestStats object
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the per-statement context, so a failed statement leaves nothing behind
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every statement run through ``engine`` (a sync Engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def observe_hash(operation: str, seconds: float):
+    password_hash_seconds.observe(seconds, operation)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.hash_seconds += seconds
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and DB work per route template.
+
+    Routes are labelled by their template (``/repositories/{repository_id}``),
+    never the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_stats.reset(token)
+            method, route = stats.method, stats.route
+            request_duration.observe(elapsed, method, route, str(status_code))
+            request_db_queries.observe(stats.queries, method, route)
+            request_db_seconds.observe(stats.db_seconds, method, route)
+            if stats.hash_seconds:
+                request_hash_seconds.observe(stats.hash_seconds, method, route)
+
+
+def render() -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+class QueryCounter:
+    """Statements seen while a ``count_queries`` block is open."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(*engines: Engine):
+    """Record every statement executed on ``engines`` inside the block.
+
+    Defaults to the application's engines. Meant for tests that issue one
+    request at a time, e.g. through TestClient.
+    """
+    if not engines:
+        import database
+        engines = [database.engine]
+        if database.async_engine is not None:
+            engines.append(database.async_engine.sync_engine)
+
+    counter = QueryCounter()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, *engines: Engine):
+    """Fail when the block runs more than ``max_queries`` statements (catches N+1 loads)."""
+    with count_queries(*engines) as counter:
+        yield counter
+    if counter.count > max_queries:
+        listing = "\n".join(f"  {i}. {' '.join(sql.split())}" for i, sql in enumerate(counter.statements, 1))
+        raise AssertionError(f"Expected at most {max_queries} queries, got {counter.count}:\n{listing}")
@@ -0,0 +1,61 @@
+# migrations/env.py
+from logging.config import fileConfig
+
+from alembic import context
+
+import models  # noqa: F401  registers every table on Base.metadata
+from models import is_search_index_table
+from base import Base
+from database import DATABASE_URL, make_engine
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    # The FTS5 search tables are created by raw DDL, not from the metadata
+    return not (type_ == "table" and is_search_index_table(name))
+
+
+def _url() -> str:
+    return config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def run_migrations_offline():
+    context.configure(
+        url=_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_name=include_name,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=_url().startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = make_engine(_url())
+    try:
+        with engine.connect() as connection:
+            # SQLite cannot ALTER constraints in place; batch mode rebuilds the table
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                include_name=include_name,
+                render_as_batch=connection.dialect.name == "sqlite",
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+    finally:
+        engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,77 @@
+"""initial schema
+
+The tables as Base.metadata.create_all built them before migrations were
+introduced. A database created that way should be stamped with this
+revision (``alembic stamp 0001``) and then upgraded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(length=50), nullable=False),
+        sa.Column("last_name", sa.String(length=50), nullable=False),
+        sa.Column("birth_date", sa.Date(), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("phone_number", sa.String(length=20), nullable=False),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("competition", sa.String(length=255), nullable=True),
+        sa.Column("agreed_to_rules", sa.Boolean(), nullable=False),
+        sa.Column("team_signup", sa.Boolean(), nullable=True),
+        sa.Column("team_members", sa.JSON(), nullable=True),
+        sa.Column("team_member_emails", sa.JSON(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("is_superuser", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("phone_number"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "permissions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("competition_access", sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "competition_access", name="uq_user_competition_access"),
+    )
+    op.create_index("ix_permissions_id", "permissions", ["id"])
+
+    op.create_table(
+        "repositories",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("repository_name", sa.String(length=255), nullable=False),
+        sa.Column("repository_url", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_repositories_id", "repositories", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_repositories_id", table_name="repositories")
+    op.drop_table("repositories")
+    op.drop_index("ix_permissions_id", table_name="permissions")
+    op.drop_table("permissions")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,79 @@
+"""indexes for the router query shapes
+
+- uq_user_repository_url: the duplicate check in create_repository
+- ix_repositories_user_id_created_at_id: repository listings and per-user lookups
+- ix_permissions_competition_access: per-competition permission lookups
+- ix_users_competition: filtering registrants by competition
+
+Repositories registered twice by one user (same user_id and
+repository_url) stop the unique constraint from being created. By default
+the upgrade aborts and lists them. To keep the oldest of each and delete
+the rest, run: alembic -x dedupe=1 upgrade head
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+import logging
+
+from alembic import context, op
+import sqlalchemy as sa
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+# Conflicting pairs listed in the abort message
+SHOWN_DUPLICATES = 20
+
+
+def _resolve_duplicate_repositories():
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT user_id, repository_url, COUNT(*) FROM repositories "
+        "GROUP BY user_id, repository_url HAVING COUNT(*) > 1 ORDER BY user_id, repository_url"
+    )).all()
+    if not duplicates:
+        return
+    if context.get_x_argument(as_dictionary=True).get("dedupe") != "1":
+        listing = "\n".join(
+            f"  user_id={user_id} repository_url={url} ({count} rows)"
+            for user_id, url, count in duplicates[:SHOWN_DUPLICATES]
+        )
+        more = len(duplicates) - SHOWN_DUPLICATES
+        raise RuntimeError(
+            f"{len(duplicates)} (user_id, repository_url) pairs are registered more than once, so "
+            f"uq_user_repository_url cannot be created:\n{listing}"
+            + (f"\n  ... and {more} more" if more > 0 else "")
+            + "\nResolve them, or rerun with 'alembic -x dedupe=1 upgrade head' to keep the oldest of each."
+        )
+    deleted = op.get_bind().execute(sa.text(
+        "DELETE FROM repositories WHERE id NOT IN "
+        "(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM repositories "
+        "GROUP BY user_id, repository_url) AS keep)"
+    )).rowcount
+    logger.warning("dedupe=1: deleted %d duplicate repositories across %d (user_id, repository_url) pairs",
+                   deleted, len(duplicates))
+
+
+def upgrade():
+    _resolve_duplicate_repositories()
+    with op.batch_alter_table("repositories") as batch_op:
+        batch_op.create_unique_constraint("uq_user_repository_url", ["user_id", "repository_url"])
+    op.create_index(
+        "ix_repositories_user_id_created_at_id", "repositories", ["user_id", "created_at", "id"]
+    )
+    op.create_index("ix_permissions_competition_access", "permissions", ["competition_access"])
+    op.create_index("ix_users_competition", "users", ["competition"])
+
+
+def downgrade():
+    op.drop_index("ix_users_competition", table_name="users")
+    op.drop_index("ix_permissions_competition_access", table_name="permissions")
+    op.drop_index("ix_repositories_user_id_created_at_id", table_name="repositories")
+    with op.batch_alter_table("repositories") as batch_op:
+        batch_op.drop_constraint("uq_user_repository_url", type_="unique")
@@ -0,0 +1,33 @@
+"""table_versions change markers
+
+One row per tracked table, bumped by every commit that writes to it, so
+listings can compute an ETag without reading the rows they return.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+TRACKED_TABLES = ("users", "permissions", "repositories")
+
+
+def upgrade():
+    table_versions = op.create_table(
+        "table_versions",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.bulk_insert(table_versions, [{"name": name, "version": 0} for name in TRACKED_TABLES])
+
+
+def downgrade():
+    op.drop_table("table_versions")
@@ -0,0 +1,134 @@
+"""competition_stats
+
+Registrant, team and repository totals per competition and per competition
+access, filled from the existing rows. On SQLite, triggers keep them
+current; other databases count from the tables on each request.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("registrants", "team_signups", "team_members", "repositories")
+TRIGGERS = (
+    "user_insert", "user_delete", "user_update",
+    "permission_insert", "permission_delete", "permission_update",
+    "repository_insert", "repository_delete", "repository_update",
+)
+
+
+def _user_values(row):
+    members = f"{row}.team_members"
+    return (
+        "1",
+        f"CASE WHEN {row}.team_signup THEN 1 ELSE 0 END",
+        f"CASE WHEN {row}.team_signup THEN "
+        f"coalesce(json_array_length(CASE WHEN json_valid({members}) THEN {members} END), 0) ELSE 0 END",
+        f"(SELECT count(*) FROM repositories WHERE repositories.user_id = {row}.id)",
+    )
+
+
+def _statements():
+    columns = ", ".join(COLUMNS)
+
+    def ensure(scope, competition):
+        return (f"INSERT OR IGNORE INTO competition_stats (scope, competition, {columns}) "
+                f"SELECT '{scope}', {competition}, 0, 0, 0, 0 WHERE {competition} IS NOT NULL;")
+
+    def competition_row(row):
+        return f"scope = 'competition' AND competition = {row}.competition"
+
+    def access_rows(row):
+        return (f"scope = 'access' AND competition IN "
+                f"(SELECT competition_access FROM permissions WHERE permissions.user_id = {row}.id)")
+
+    def add_user(sign, where, row):
+        changes = ", ".join(f"{name} = {name} {sign} {value}" for name, value in zip(COLUMNS, _user_values(row)))
+        return f"UPDATE competition_stats SET {changes} WHERE {where};"
+
+    def add_permission(sign, row):
+        values = ", ".join(f"competition_stats.{name} {sign} {value}"
+                           for name, value in zip(COLUMNS, _user_values("u")))
+        return (f"UPDATE competition_stats SET ({columns}) = "
+                f"(SELECT {values} FROM users AS u WHERE u.id = {row}.user_id) "
+                f"WHERE scope = 'access' AND competition = {row}.competition_access "
+                f"AND EXISTS (SELECT 1 FROM users WHERE users.id = {row}.user_id);")
+
+    def add_repository(sign, row):
+        owner = f"{row}.user_id"
+        return (f"UPDATE competition_stats SET repositories = repositories {sign} 1 WHERE scope = 'competition' "
+                f"AND competition = (SELECT competition FROM users WHERE users.id = {owner}); "
+                f"UPDATE competition_stats SET repositories = repositories {sign} 1 WHERE scope = 'access' "
+                f"AND competition IN (SELECT competition_access FROM permissions WHERE permissions.user_id = {owner} "
+                f"AND EXISTS (SELECT 1 FROM users WHERE users.id = {owner}));")
+
+    def trigger(name, event, *statements):
+        return f"CREATE TRIGGER competition_stats_{name} {event} BEGIN {' '.join(statements)} END"
+
+    values = ", ".join(f"{value} AS {name}" for name, value in zip(COLUMNS[:3], _user_values("u")[:3]))
+    repositories = (
+        "LEFT JOIN (SELECT user_id, count(*) AS repositories FROM repositories GROUP BY user_id) AS r "
+        "ON r.user_id = u.id"
+    )
+    totals = ", ".join(f"sum({name})" for name in COLUMNS)
+    return [
+        trigger("user_insert", "AFTER INSERT ON users", ensure("competition", "new.competition"),
+                add_user("+", competition_row("new"), "new"), add_user("+", access_rows("new"), "new")),
+        trigger("user_delete", "BEFORE DELETE ON users",
+                add_user("-", competition_row("old"), "old"), add_user("-", access_rows("old"), "old")),
+        trigger("user_update", "AFTER UPDATE OF competition, team_signup, team_members ON users",
+                add_user("-", competition_row("old"), "old"), add_user("-", access_rows("old"), "old"),
+                ensure("competition", "new.competition"),
+                add_user("+", competition_row("new"), "new"), add_user("+", access_rows("new"), "new")),
+        trigger("permission_insert", "AFTER INSERT ON permissions",
+                ensure("access", "new.competition_access"), add_permission("+", "new")),
+        trigger("permission_delete", "AFTER DELETE ON permissions", add_permission("-", "old")),
+        trigger("permission_update", "AFTER UPDATE OF user_id, competition_access ON permissions",
+                add_permission("-", "old"), ensure("access", "new.competition_access"), add_permission("+", "new")),
+        trigger("repository_insert", "AFTER INSERT ON repositories", add_repository("+", "new")),
+        trigger("repository_delete", "AFTER DELETE ON repositories", add_repository("-", "old")),
+        trigger("repository_update", "AFTER UPDATE OF user_id ON repositories",
+                add_repository("-", "old"), add_repository("+", "new")),
+        # Count the rows that already exist
+        f"INSERT INTO competition_stats (scope, competition, {columns}) "
+        f"SELECT scope, competition, {totals} FROM ("
+        f"SELECT 'competition' AS scope, u.competition AS competition, {values}, "
+        f"coalesce(r.repositories, 0) AS repositories FROM users AS u {repositories} "
+        "WHERE u.competition IS NOT NULL "
+        "UNION ALL "
+        f"SELECT 'access', p.competition_access, {values}, coalesce(r.repositories, 0) "
+        f"FROM permissions AS p JOIN users AS u ON u.id = p.user_id {repositories}"
+        ") AS contributions GROUP BY scope, competition",
+    ]
+
+
+def upgrade():
+    op.create_table(
+        "competition_stats",
+        sa.Column("scope", sa.String(length=16), nullable=False),
+        sa.Column("competition", sa.String(length=255), nullable=False),
+        sa.Column("registrants", sa.Integer(), nullable=False),
+        sa.Column("team_signups", sa.Integer(), nullable=False),
+        sa.Column("team_members", sa.Integer(), nullable=False),
+        sa.Column("repositories", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("scope", "competition"),
+    )
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for statement in _statements():
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        for name in TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS competition_stats_{name}")
+    op.drop_table("competition_stats")
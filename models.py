@@ -5,11 +5,14 @@ from sqlalchemy import (
     Boolean,
     Date,
     ForeignKey,
+    Index,
     UniqueConstraint,
     JSON,
     Text,
     DateTime,
     TypeDecorator,
+    DDL,
+    event,
 )
 from sqlalchemy.orm import relationship
 from base import Base
@@ -24,7 +27,7 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=False)
     phone_number = Column(String(20), unique=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
-    competition = Column(String(255), nullable=True)  # Assuming this can be optional
+    competition = Column(String(255), nullable=True, index=True)  # Assuming this can be optional
     agreed_to_rules = Column(Boolean, default=False, nullable=False)
     team_signup = Column(Boolean, default=False)
     team_members = Column(JSON, nullable=True)
@@ -49,7 +52,7 @@ class Permission(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    competition_access = Column(String(255), nullable=False)
+    competition_access = Column(String(255), nullable=False, index=True)
 
     user = relationship("User", back_populates="permissions")
 
@@ -74,6 +77,215 @@ class Repository(Base):
     # Relationship to the User model
     user = relationship('User', back_populates='repositories')
 
+    __table_args__ = (
+        UniqueConstraint('user_id', 'repository_url', name='uq_user_repository_url'),
+        # Serves the keyset-paginated listing; its user_id prefix serves every per-user lookup
+        Index('ix_repositories_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
+
+class RefreshToken(Base):
+    """One issued refresh token; only its HMAC is stored (see refresh_tokens.py).
+
+    Every login starts a family; each refresh marks the presented token used
+    and issues its successor in the same family.
+    """
+    __tablename__ = 'refresh_tokens'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+# Tables with a change marker in table_versions
+TRACKED_TABLES = ('users', 'permissions', 'repositories')
+
+class TableVersion(Base):
+    """Change marker per table, bumped by every commit that writes to it (see table_versions.py)."""
+    __tablename__ = 'table_versions'
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# Bumps only update existing rows, so every tracked table starts with one
+event.listen(
+    TableVersion.__table__,
+    'after_create',
+    DDL(
+        "INSERT INTO table_versions (name, version) VALUES "
+        + ", ".join(f"('{name}', 0)" for name in TRACKED_TABLES)
+    ),
+)
+
+# Full-text search on SQLite (see search.py): an external-content FTS5 table
+# per searchable table, kept in sync by triggers. Other databases have none
+# and search with LIKE instead.
+SEARCH_INDEXES = {
+    'users': ('first_name', 'last_name', 'email', 'team_members'),
+    'repositories': ('repository_name', 'description'),
+}
+
+def search_index_ddl(table: str, columns) -> list:
+    fts = f"{table}_fts"
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{name}" for name in columns)
+    old = ", ".join(f"old.{name}" for name in columns)
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    insert_new = f"INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new});"
+    return [
+        # prefix='2 3' indexes short prefixes, so "jo*" does not walk every term
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN {delete_old} {insert_new} END",
+    ]
+
+def is_search_index_table(name: str) -> bool:
+    """FTS5 tables and their shadow tables, which live outside the metadata."""
+    return any(name == f"{table}_fts" or name.startswith(f"{table}_fts_") for table in SEARCH_INDEXES)
+
+for _table, _columns in SEARCH_INDEXES.items():
+    for _statement in search_index_ddl(_table, _columns):
+        event.listen(Base.metadata.tables[_table], 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+class CompetitionStat(Base):
+    """Running totals per competition (see competition_stats.py).
+
+    scope 'competition' groups registrants by User.competition, scope 'access'
+    groups access holders by Permission.competition_access. On SQLite,
+    triggers on users, permissions and repositories keep the rows current.
+    """
+    __tablename__ = 'competition_stats'
+
+    scope = Column(String(16), primary_key=True)
+    competition = Column(String(255), primary_key=True)
+    registrants = Column(Integer, nullable=False, default=0)
+    team_signups = Column(Integer, nullable=False, default=0)
+    # Members listed by team signups; a team is its registrant plus these
+    team_members = Column(Integer, nullable=False, default=0)
+    repositories = Column(Integer, nullable=False, default=0)
+
+COMPETITION_STAT_COLUMNS = ('registrants', 'team_signups', 'team_members', 'repositories')
+
+def team_member_count_sql(row: str, dialect: str = 'sqlite') -> str:
+    """Length of ``row``.team_members as SQL; 0 unless it is a JSON array."""
+    members = f"{row}.team_members"
+    if dialect == 'postgresql':
+        return f"CASE WHEN json_typeof({members}) = 'array' THEN json_array_length({members}) ELSE 0 END"
+    if dialect == 'mysql':
+        return f"CASE WHEN JSON_TYPE({members}) = 'ARRAY' THEN JSON_LENGTH({members}) ELSE 0 END"
+    return f"coalesce(json_array_length(CASE WHEN json_valid({members}) THEN {members} END), 0)"
+
+def user_stat_values(row: str, dialect: str = 'sqlite') -> tuple:
+    """What one user adds to each COMPETITION_STAT_COLUMNS total, as SQL."""
+    return (
+        "1",
+        f"CASE WHEN {row}.team_signup THEN 1 ELSE 0 END",
+        f"CASE WHEN {row}.team_signup THEN {team_member_count_sql(row, dialect)} ELSE 0 END",
+        f"(SELECT count(*) FROM repositories WHERE repositories.user_id = {row}.id)",
+    )
+
+def competition_stats_recount_sql(dialect: str = 'sqlite') -> str:
+    """The stats counted from scratch: scope, competition, then COMPETITION_STAT_COLUMNS."""
+    values = ", ".join(f"{value} AS {name}" for name, value in zip(
+        COMPETITION_STAT_COLUMNS[:3], user_stat_values("u", dialect)[:3]
+    ))
+    # One pass over repositories instead of a count per user
+    repositories = (
+        "LEFT JOIN (SELECT user_id, count(*) AS repositories FROM repositories GROUP BY user_id) AS r "
+        "ON r.user_id = u.id"
+    )
+    contributions = (
+        f"SELECT 'competition' AS scope, u.competition AS competition, {values}, "
+        f"coalesce(r.repositories, 0) AS repositories FROM users AS u {repositories} "
+        "WHERE u.competition IS NOT NULL "
+        "UNION ALL "
+        f"SELECT 'access', p.competition_access, {values}, coalesce(r.repositories, 0) "
+        f"FROM permissions AS p JOIN users AS u ON u.id = p.user_id {repositories}"
+    )
+    totals = ", ".join(f"sum({name}) AS {name}" for name in COMPETITION_STAT_COLUMNS)
+    return f"SELECT scope, competition, {totals} FROM ({contributions}) AS contributions GROUP BY scope, competition"
+
+def competition_stats_ddl() -> list:
+    # Every trigger applies the difference its row makes given the rows around
+    # it at that moment, so the totals stay equal to a full recount whatever
+    # order a cascade deletes in. Access totals only count permissions whose
+    # user exists, and repositories only count while their user exists.
+    columns = ", ".join(COMPETITION_STAT_COLUMNS)
+
+    def ensure(scope, competition):
+        return (f"INSERT OR IGNORE INTO competition_stats (scope, competition, {columns}) "
+                f"SELECT '{scope}', {competition}, 0, 0, 0, 0 WHERE {competition} IS NOT NULL;")
+
+    def competition_row(row):
+        return f"scope = 'competition' AND competition = {row}.competition"
+
+    def access_rows(row):
+        return (f"scope = 'access' AND competition IN "
+                f"(SELECT competition_access FROM permissions WHERE permissions.user_id = {row}.id)")
+
+    def add_user(sign, where, row):
+        # ``row`` is the trigger's own users row (new or old)
+        values = user_stat_values(row)
+        changes = ", ".join(f"{name} = {name} {sign} {value}" for name, value in zip(COMPETITION_STAT_COLUMNS, values))
+        return f"UPDATE competition_stats SET {changes} WHERE {where};"
+
+    def add_permission(sign, row):
+        # The permission's user is looked up; without one it adds nothing
+        values = ", ".join(f"competition_stats.{name} {sign} {value}"
+                           for name, value in zip(COMPETITION_STAT_COLUMNS, user_stat_values("u")))
+        return (f"UPDATE competition_stats SET ({columns}) = "
+                f"(SELECT {values} FROM users AS u WHERE u.id = {row}.user_id) "
+                f"WHERE scope = 'access' AND competition = {row}.competition_access "
+                f"AND EXISTS (SELECT 1 FROM users WHERE users.id = {row}.user_id);")
+
+    def add_repository(sign, row):
+        owner = f"{row}.user_id"
+        return (f"UPDATE competition_stats SET repositories = repositories {sign} 1 WHERE scope = 'competition' "
+                f"AND competition = (SELECT competition FROM users WHERE users.id = {owner}); "
+                f"UPDATE competition_stats SET repositories = repositories {sign} 1 WHERE scope = 'access' "
+                f"AND competition IN (SELECT competition_access FROM permissions WHERE permissions.user_id = {owner} "
+                f"AND EXISTS (SELECT 1 FROM users WHERE users.id = {owner}));")
+
+    def trigger(name, event, *statements):
+        return f"CREATE TRIGGER competition_stats_{name} {event} BEGIN {' '.join(statements)} END"
+
+    return [
+        trigger("user_insert", "AFTER INSERT ON users", ensure('competition', 'new.competition'),
+                add_user('+', competition_row('new'), 'new'), add_user('+', access_rows('new'), 'new')),
+        # Before, so the user's repositories are still there to be counted
+        trigger("user_delete", "BEFORE DELETE ON users",
+                add_user('-', competition_row('old'), 'old'), add_user('-', access_rows('old'), 'old')),
+        trigger("user_update", "AFTER UPDATE OF competition, team_signup, team_members ON users",
+                add_user('-', competition_row('old'), 'old'), add_user('-', access_rows('old'), 'old'),
+                ensure('competition', 'new.competition'),
+                add_user('+', competition_row('new'), 'new'), add_user('+', access_rows('new'), 'new')),
+        trigger("permission_insert", "AFTER INSERT ON permissions",
+                ensure('access', 'new.competition_access'), add_permission('+', 'new')),
+        trigger("permission_delete", "AFTER DELETE ON permissions", add_permission('-', 'old')),
+        trigger("permission_update", "AFTER UPDATE OF user_id, competition_access ON permissions",
+                add_permission('-', 'old'), ensure('access', 'new.competition_access'), add_permission('+', 'new')),
+        trigger("repository_insert", "AFTER INSERT ON repositories", add_repository('+', 'new')),
+        trigger("repository_delete", "AFTER DELETE ON repositories", add_repository('-', 'old')),
+        trigger("repository_update", "AFTER UPDATE OF user_id ON repositories",
+                add_repository('-', 'old'), add_repository('+', 'new')),
+        # The triggers only apply differences, so start from the rows already there
+        f"INSERT INTO competition_stats (scope, competition, {columns}) {competition_stats_recount_sql()}",
+    ]
+
+# Only together with the table, and in the same transaction as the fill: on
+# a database that already has users (create_all adding the table to an
+# older schema) the stats start from a full count. create_all creates the
+# table after the three the triggers sit on.
+for _table in ('users', 'permissions', 'repositories'):
+    CompetitionStat.__table__.add_is_dependent_on(Base.metadata.tables[_table])
+for _statement in competition_stats_ddl():
+    event.listen(CompetitionStat.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
 class JSONEncodedList(TypeDecorator):
     impl = Text
 
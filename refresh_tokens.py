@@ -0,0 +1,132 @@
+# refresh_tokens.py
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from auth import SECRET_KEY
+from models import RefreshToken, User
+
+logger = logging.getLogger(__name__)
+
+# Refresh tokens are opaque random strings. The database only keeps their
+# HMAC-SHA256 under SECRET_KEY, so a leaked table cannot be replayed and a
+# refresh costs one keyed hash and an indexed lookup instead of bcrypt.
+#
+# Each login starts a family. A refresh marks the presented token used and
+# issues its successor in the same family; presenting a used token again
+# means it was copied, so the whole family is revoked and both the thief and
+# the legitimate client have to log in again. Logout revokes the family too.
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", 14))
+
+
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def issue_refresh_token(db: Session, user_id: int, family_id: Optional[str] = None,
+                        now: Optional[datetime] = None) -> str:
+    """Add a new token to ``family_id`` (a new family by default); the caller commits."""
+    token = secrets.token_urlsafe(32)
+    now = now or datetime.utcnow()
+    db.execute(
+        insert(RefreshToken.__table__).values(
+            user_id=user_id,
+            family_id=family_id or secrets.token_hex(16),
+            token_hash=hash_refresh_token(token),
+            created_at=now,
+            expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+    )
+    return token
+
+
+def start_refresh_family(db: Session, user_id: int) -> str:
+    """Issue the first token of a new family, as login does, and commit."""
+    token = issue_refresh_token(db, user_id)
+    db.commit()
+    return token
+
+
+def _revoke_family(db: Session, family_id: str, now: datetime) -> int:
+    return db.execute(
+        update(RefreshToken.__table__)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    ).rowcount
+
+
+def _reject_reuse(db: Session, family_id: str, user_id: int, now: datetime) -> HTTPException:
+    db.rollback()
+    revoked = _revoke_family(db, family_id, now)
+    db.commit()
+    logger.warning("Refresh token reuse for user %s: revoked %d token(s) of family %s", user_id, revoked, family_id)
+    return _invalid_refresh_token()
+
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[str, int, str]:
+    """Exchange ``token`` for its successor; returns ``(new token, user id, email)``."""
+    now = datetime.utcnow()
+    row = db.execute(
+        select(
+            RefreshToken.id, RefreshToken.user_id, RefreshToken.family_id, RefreshToken.expires_at,
+            RefreshToken.used_at, RefreshToken.revoked_at, User.email, User.is_active,
+        )
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(token))
+    ).first()
+    if row is None or row.revoked_at is not None or row.expires_at <= now:
+        raise _invalid_refresh_token()
+    if row.used_at is not None:
+        raise _reject_reuse(db, row.family_id, row.user_id, now)
+    if not row.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+
+    # Claim the token in the same statement that checks it is unused, so two
+    # concurrent refreshes with one token cannot both succeed
+    claimed = db.execute(
+        update(RefreshToken.__table__)
+        .where(RefreshToken.id == row.id, RefreshToken.used_at.is_(None), RefreshToken.revoked_at.is_(None))
+        .values(used_at=now)
+    ).rowcount
+    if not claimed:
+        raise _reject_reuse(db, row.family_id, row.user_id, now)
+    successor = issue_refresh_token(db, row.user_id, row.family_id, now)
+    db.commit()
+    return successor, row.user_id, row.email
+
+
+def revoke_refresh_token(db: Session, token: str) -> int:
+    """Revoke the family ``token`` belongs to; unknown tokens revoke nothing."""
+    family = select(RefreshToken.family_id).where(RefreshToken.token_hash == hash_refresh_token(token))
+    revoked = db.execute(
+        update(RefreshToken.__table__)
+        .where(RefreshToken.family_id == family.scalar_subquery(), RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    ).rowcount
+    db.commit()
+    return revoked
+
+
+def prune_refresh_tokens(db: Session) -> int:
+    """Delete expired tokens; a token past its expiry is rejected whatever its state."""
+    pruned = db.execute(
+        delete(RefreshToken.__table__).where(RefreshToken.expires_at <= datetime.utcnow())
+    ).rowcount
+    db.commit()
+    return pruned
@@ -0,0 +1,40 @@
+# routers/health.py
+import logging
+
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import get_db, run_db
+from schema_check import schema_state
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"]
+)
+
+logger = logging.getLogger(__name__)
+
+
+@router.get("/live")
+async def liveness():
+    """The process is up and its event loop is serving requests."""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness(db: Session = Depends(get_db)):
+    """Startup finished, the schema matched and the database answers."""
+    if not schema_state.ready:
+        return JSONResponse({"status": "starting"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        await run_db(db, _ping)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e}")
+        return JSONResponse({"status": "database unavailable"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ready", "schema_revision": schema_state.revision}
+
+
+def _ping(db: Session):
+    db.execute(text("SELECT 1"))
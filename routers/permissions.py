@@ -1,11 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import and_, delete, literal, select, union_all
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from database import get_db
+from database import get_db, run_db
 from models import Permission, User
-from auth import get_current_user
-from schemas import PermissionCreate, PermissionResponse
-from typing import List
+from auth import get_current_user, Principal
+from access_index import access_index
+from schemas import (
+    PermissionCreate,
+    PermissionResponse,
+    PermissionCheck,
+    PermissionBatch,
+    PermissionBatchReport,
+    Page,
+)
+from utils.pagination import paginate, page_size
+from utils.upsert import insert_ignore, insert_ignore_rows, execute_insert_ignore
+from utils.etag import conditional_json
+from table_versions import table_versions
+from serializers import PERMISSION_COLUMNS, permission_row
+from functools import partial
+from typing import List, Optional
 
 # Ensure that get_current_user is imported from auth.py and uses the updated oauth2_scheme
 
@@ -16,10 +30,10 @@ router = APIRouter(
 )
 
 @router.post("/assign", response_model=PermissionResponse, status_code=status.HTTP_201_CREATED)
-def assign_permission(
+async def assign_permission(
     permission_data: PermissionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Check if current user is a superuser
     if not current_user.is_superuser:
@@ -27,50 +41,43 @@ def assign_permission(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
+    return await run_db(db, _assign_permission, permission_data)
 
-    # Check if the user exists
-    user = db.query(User).filter(User.id == permission_data.user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
 
-    # Check if the permission already exists
-    existing_permission = db.query(Permission).filter(
-        Permission.user_id == permission_data.user_id,
-        Permission.competition_access == permission_data.competition_access
-    ).first()
-    if existing_permission:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Permission already assigned"
-        )
-
-    # Create new permission
-    permission = Permission(
-        user_id=permission_data.user_id,
-        competition_access=permission_data.competition_access
+def _assign_permission(db: Session, permission_data: PermissionCreate) -> dict:
+    # One statement: the SELECT only yields a row when the user exists, and
+    # uq_user_competition_access drops a permission that is already assigned
+    stmt = insert_ignore(db, Permission).from_select(
+        ["user_id", "competition_access"],
+        select(User.id, literal(permission_data.competition_access)).where(User.id == permission_data.user_id),
     )
-    db.add(permission)
-    try:
-        db.commit()
-        db.refresh(permission)
-    except IntegrityError as e:
+    permission_id = execute_insert_ignore(db, stmt)
+    if permission_id is None:
         db.rollback()
+        user_exists = db.execute(select(User.id).where(User.id == permission_data.user_id)).first()
+        if not user_exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Could not assign permission due to database error"
+            detail="Permission already assigned"
         )
+    db.commit()
+    return {
+        "id": permission_id,
+        "user_id": permission_data.user_id,
+        "competition_access": permission_data.competition_access,
+    }
 
-    return permission
-
-@router.get("/", response_model=List[PermissionResponse])
-def get_permissions(
-    skip: int = 0,
-    limit: int = 100,
+@router.get("/", response_model=Page[PermissionResponse])
+async def get_permissions(
+    request: Request,
+    after: Optional[str] = None,
+    limit: int = Depends(page_size),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Only superusers can view all permissions
     if not current_user.is_superuser:
@@ -78,14 +85,25 @@ def get_permissions(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    permissions = db.query(Permission).offset(skip).limit(limit).all()
-    return permissions
+    return await conditional_json(
+        db,
+        request,
+        partial(table_versions, tables=(Permission.__tablename__,)),
+        partial(_list_permissions, after=after, limit=limit),
+    )
+
+
+def _list_permissions(db: Session, after: Optional[str], limit: int) -> dict:
+    query = db.query(*PERMISSION_COLUMNS)
+    permissions, next_cursor = paginate(query, (Permission.id,), after, limit)
+    return {"items": [permission_row(row) for row in permissions], "next_cursor": next_cursor}
 
 @router.get("/user/{user_id}", response_model=List[PermissionResponse])
-def get_user_permissions(
+async def get_user_permissions(
+    request: Request,
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # A user can view their own permissions, or superuser can view any
     if not current_user.is_superuser and current_user.id != user_id:
@@ -94,14 +112,46 @@ def get_user_permissions(
             detail="Not enough permissions"
         )
 
-    permissions = db.query(Permission).filter(Permission.user_id == user_id).all()
-    return permissions
+    return await conditional_json(
+        db,
+        request,
+        partial(table_versions, tables=(Permission.__tablename__,)),
+        partial(_list_user_permissions, user_id=user_id),
+    )
+
+
+@router.get("/check", response_model=PermissionCheck)
+async def check_permission(
+    competition_access: str,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Answer from the in-memory access index whether a user can access a competition."""
+    user_id = current_user.id if user_id is None else user_id
+    if not current_user.is_superuser and current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+
+    await access_index.ensure_loaded(db)
+    return {
+        "user_id": user_id,
+        "competition_access": competition_access,
+        "allowed": access_index.has_access(user_id, competition_access),
+    }
+
+
+def _list_user_permissions(db: Session, user_id: int) -> List[dict]:
+    query = db.query(*PERMISSION_COLUMNS).filter(Permission.user_id == user_id)
+    return [permission_row(row) for row in query]
 
 @router.delete("/revoke", response_model=PermissionResponse)
-def revoke_permission(
+async def revoke_permission(
     permission_data: PermissionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Only superusers can revoke permissions
     if not current_user.is_superuser:
@@ -109,7 +159,10 @@ def revoke_permission(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
+    return await run_db(db, _revoke_permission, permission_data)
 
+
+def _revoke_permission(db: Session, permission_data: PermissionCreate) -> Permission:
     permission = db.query(Permission).filter(
         Permission.user_id == permission_data.user_id,
         Permission.competition_access == permission_data.competition_access
@@ -123,3 +176,132 @@ def revoke_permission(
     db.delete(permission)
     db.commit()
     return permission
+
+
+# Pairs per statement in the batch endpoints; stays under SQLite's limits of
+# 999 bound parameters and 500 UNION ALL terms
+BATCH_LOOKUP_SIZE = 400
+
+
+def _chunks(items: list, size: int = BATCH_LOOKUP_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _unique_pairs(items: List[PermissionCreate]):
+    """Split a batch into distinct (user_id, competition_access) pairs and repeats."""
+    pairs, seen, repeats = [], set(), []
+    for item in items:
+        pair = (item.user_id, item.competition_access)
+        if pair in seen:
+            repeats.append(pair)
+        else:
+            seen.add(pair)
+            pairs.append(pair)
+    return pairs, repeats
+
+
+def _wanted_pairs(pairs: list):
+    # A derived table of the pairs, joined on uq_user_competition_access: one
+    # index lookup per pair (SQLite scans the table for a row-value IN)
+    return union_all(*(
+        select(literal(user_id).label("user_id"), literal(competition).label("competition_access"))
+        for user_id, competition in pairs
+    )).subquery()
+
+
+def _existing_pairs(db: Session, pairs: list) -> dict:
+    found = {}
+    for chunk in _chunks(pairs):
+        wanted = _wanted_pairs(chunk)
+        rows = db.execute(
+            select(Permission.id, Permission.user_id, Permission.competition_access).join_from(
+                wanted, Permission, and_(Permission.user_id == wanted.c.user_id,
+                                         Permission.competition_access == wanted.c.competition_access),
+            )
+        )
+        for permission_id, user_id, competition_access in rows:
+            found[(user_id, competition_access)] = permission_id
+    return found
+
+
+def _batch_report(outcomes: list) -> dict:
+    counts = {}
+    results = []
+    for (user_id, competition_access), outcome in outcomes:
+        counts[outcome] = counts.get(outcome, 0) + 1
+        results.append({"user_id": user_id, "competition_access": competition_access, "status": outcome})
+    return {"counts": counts, "results": results}
+
+
+def _assign_permissions(db: Session, items: List[PermissionCreate]) -> dict:
+    pairs, repeats = _unique_pairs(items)
+
+    user_ids = sorted({user_id for user_id, _ in pairs})
+    known_users = set()
+    for chunk in _chunks(user_ids):
+        known_users.update(db.execute(select(User.id).where(User.id.in_(chunk))).scalars())
+    candidates = [pair for pair in pairs if pair[0] in known_users]
+
+    # Outcomes come from the insert itself: uq_user_competition_access skips
+    # pairs that exist, including ones a concurrent grant just committed
+    assigned = set()
+    for chunk in _chunks(candidates):
+        assigned |= insert_ignore_rows(
+            db, Permission, [{"user_id": user_id, "competition_access": competition} for user_id, competition in chunk],
+            ("user_id", "competition_access"),
+        )
+    db.commit()
+
+    outcomes = []
+    for pair in pairs:
+        if pair[0] not in known_users:
+            outcomes.append((pair, "user_not_found"))
+        else:
+            outcomes.append((pair, "assigned" if pair in assigned else "already_assigned"))
+    outcomes.extend((pair, "duplicate") for pair in repeats)
+    return _batch_report(outcomes)
+
+
+def _revoke_permissions(db: Session, items: List[PermissionCreate]) -> dict:
+    pairs, repeats = _unique_pairs(items)
+    existing = _existing_pairs(db, pairs)
+
+    ids = list(existing.values())
+    for chunk in _chunks(ids):
+        db.execute(delete(Permission).where(Permission.id.in_(chunk)))
+    db.commit()
+
+    outcomes = [(pair, "revoked" if pair in existing else "not_found") for pair in pairs]
+    outcomes.extend((pair, "duplicate") for pair in repeats)
+    return _batch_report(outcomes)
+
+
+@router.post("/assign/batch", response_model=PermissionBatchReport)
+async def assign_permissions_batch(
+    batch: PermissionBatch,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Grant many (user_id, competition_access) pairs in one transaction."""
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return await run_db(db, _assign_permissions, batch.items)
+
+
+@router.delete("/revoke/batch", response_model=PermissionBatchReport)
+async def revoke_permissions_batch(
+    batch: PermissionBatch,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Revoke many (user_id, competition_access) pairs in one transaction."""
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return await run_db(db, _revoke_permissions, batch.items)
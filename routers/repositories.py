@@ -1,14 +1,21 @@
 # routers/repositories.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Optional
+from datetime import datetime
+from functools import partial
 
 from models import Repository
-from models import User
-from schemas import RepositoryCreate, RepositoryUpdate, RepositoryResponse
-from database import get_db
-from auth import get_current_user
+from schemas import RepositoryCreate, RepositoryUpdate, RepositoryResponse, Page
+from utils.pagination import paginate, page_size
+from utils.upsert import insert_ignore, execute_insert_ignore
+from utils.etag import conditional_json
+from serializers import REPOSITORY_COLUMNS, repository_row
+from database import get_db, run_db
+from auth import get_current_user, Principal
 
 router = APIRouter(
     prefix="/repositories",
@@ -17,49 +24,84 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=RepositoryResponse, status_code=status.HTTP_201_CREATED)
-def create_repository(
+async def create_repository(
     repository: RepositoryCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    # Check if the repository URL already exists for the user
-    existing_repo = db.query(Repository).filter(
-        Repository.user_id == current_user.id,
-        Repository.repository_url == repository.repository_url
-    ).first()
-    if existing_repo:
+    return await run_db(db, _create_repository, repository, current_user.id)
+
+
+def _create_repository(db: Session, repository: RepositoryCreate, user_id: int) -> dict:
+    # uq_user_repository_url rejects a URL the user already registered
+    now = datetime.utcnow()
+    values = {
+        "user_id": user_id,
+        "repository_name": repository.repository_name,
+        "repository_url": repository.repository_url,
+        "description": repository.description,
+        "created_at": now,
+        "updated_at": now,
+    }
+    repository_id = execute_insert_ignore(db, insert_ignore(db, Repository).values(**values))
+    if repository_id is None:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Repository already exists."
         )
-    db_repository = Repository(
-        user_id=current_user.id,
-        repository_name=repository.repository_name,
-        repository_url=repository.repository_url,
-        description=repository.description,
-    )
-    db.add(db_repository)
     db.commit()
-    db.refresh(db_repository)
-    return db_repository
+    return {**values, "id": repository_id}
 
-@router.get("/", response_model=List[RepositoryResponse])
-def get_user_repositories(
+@router.get("/", response_model=Page[RepositoryResponse])
+async def get_user_repositories(
+    request: Request,
+    after: Optional[str] = None,
+    limit: int = Depends(page_size),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    repositories = db.query(Repository).filter(Repository.user_id == current_user.id).all()
-    return repositories
+    return await conditional_json(
+        db,
+        request,
+        partial(_repositories_version, user_id=current_user.id),
+        partial(_list_repositories, user_id=current_user.id, after=after, limit=limit),
+    )
+
+
+def _repositories_version(db: Session, user_id: int) -> tuple:
+    """Change marker for one user's repositories.
+
+    Inserts and deletes move the count or max(id), and every update moves
+    max(updated_at) since the column is set on each write.
+    """
+    count, last_updated, last_id = db.execute(
+        select(func.count(Repository.id), func.max(Repository.updated_at), func.max(Repository.id))
+        .where(Repository.user_id == user_id)
+    ).one()
+    return user_id, count, last_updated, last_id
+
+
+def _list_repositories(db: Session, user_id: int, after: Optional[str], limit: int) -> dict:
+    query = db.query(*REPOSITORY_COLUMNS).filter(Repository.user_id == user_id)
+    repositories, next_cursor = paginate(
+        query, (Repository.created_at, Repository.id), after, limit
+    )
+    return {"items": [repository_row(row) for row in repositories], "next_cursor": next_cursor}
 
 @router.get("/{repository_id}", response_model=RepositoryResponse)
-def get_repository(
+async def get_repository(
     repository_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
+    return await run_db(db, _get_repository, repository_id, current_user.id)
+
+
+def _get_repository(db: Session, repository_id: int, user_id: int) -> Repository:
     repository = db.query(Repository).filter(
         Repository.id == repository_id,
-        Repository.user_id == current_user.id
+        Repository.user_id == user_id
     ).first()
     if repository is None:
         raise HTTPException(
@@ -69,15 +111,24 @@ def get_repository(
     return repository
 
 @router.put("/{repository_id}", response_model=RepositoryResponse)
-def update_repository(
+async def update_repository(
     repository_id: int,
     repository_update: RepositoryUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
+    return await run_db(db, _update_repository, repository_id, repository_update, current_user.id)
+
+
+def _update_repository(
+    db: Session,
+    repository_id: int,
+    repository_update: RepositoryUpdate,
+    user_id: int,
+) -> Repository:
     repository = db.query(Repository).filter(
         Repository.id == repository_id,
-        Repository.user_id == current_user.id
+        Repository.user_id == user_id
     ).first()
     if repository is None:
         raise HTTPException(
@@ -86,19 +137,31 @@ def update_repository(
         )
     for key, value in repository_update.dict(exclude_unset=True).items():
         setattr(repository, key, value)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Repository already exists."
+        )
     db.refresh(repository)
     return repository
 
 @router.delete("/{repository_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_repository(
+async def delete_repository(
     repository_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
+    await run_db(db, _delete_repository, repository_id, current_user.id)
+    return None
+
+
+def _delete_repository(db: Session, repository_id: int, user_id: int):
     repository = db.query(Repository).filter(
         Repository.id == repository_id,
-        Repository.user_id == current_user.id
+        Repository.user_id == user_id
     ).first()
     if repository is None:
         raise HTTPException(
@@ -107,4 +170,3 @@ def delete_repository(
         )
     db.delete(repository)
     db.commit()
-    return None
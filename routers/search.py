@@ -0,0 +1,40 @@
+# routers/search.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from auth import get_current_user, Principal
+from database import get_db, run_db
+from schemas import SearchResults
+from search import search, search_terms
+from utils.responses import FastJSONResponse
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"],
+)
+
+
+@router.get("/", response_model=SearchResults)
+async def search_registrants(
+    q: str = Query(
+        ...,
+        min_length=1,
+        max_length=200,
+        description="Words to find, all of which must match. They are matched as whole words, and as "
+                    "prefixes only when whole words find fewer than `limit` results",
+    ),
+    limit: int = Query(20, ge=1, le=100, description="Maximum users and maximum repositories returned"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Find registrants by name, email or team member, and repositories by name or description."""
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    terms = search_terms(q)
+    if not terms:
+        return FastJSONResponse({"users": [], "repositories": []})
+    return FastJSONResponse(await run_db(db, search, terms, limit))
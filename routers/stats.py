@@ -0,0 +1,29 @@
+# routers/stats.py
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from auth import get_current_user, Principal
+from competition_stats import competition_stats
+from database import get_db, run_db
+from schemas import CompetitionStatsResponse
+from utils.responses import FastJSONResponse
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+)
+
+
+@router.get("/competitions", response_model=CompetitionStatsResponse)
+async def get_competition_stats(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Registrant, team and repository counts per competition and per competition access."""
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return FastJSONResponse(await run_db(db, competition_stats))
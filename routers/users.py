@@ -1,23 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 from auth import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    get_password_hashes_async,
+    verify_and_needs_update_async,
+    rehash_password,
     create_access_token,
-    decode_access_token,
-    get_current_user
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    get_current_user,
+    Principal
 )
-from models import User
-from database import get_db
-from schemas import UserCreate, UserResponse, UserLogin, Token
+from models import Repository, User
+from database import get_db, run_db, AsyncSessionLocal, SessionLocal
+from exports import EXPORT_FORMATS, aiter_export, iter_export
+from serializers import repositories_by_user
+from refresh_tokens import start_refresh_family, rotate_refresh_token, revoke_refresh_token
+from table_versions import table_versions
+from user_import import prepare_import, mark_existing, insert_pending
+from schemas import (
+    UserCreate,
+    UserResponse,
+    UserSparseResponse,
+    Token,
+    RefreshRequest,
+    Page,
+    ImportReport,
+)
+from utils.pagination import paginate, page_size
+from utils.upsert import insert_ignore, execute_insert_ignore
+from utils.rate_limit import RateLimited, login_ip_limit, login_email_limit, login_verify_limit
+from utils.responses import FastJSONResponse
+from utils.etag import conditional_json
 from datetime import timedelta
+from functools import partial
 from typing import List, Optional
-from fastapi.security import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordRequestForm
 import logging
-from jose import JWTError
-from pydantic import EmailStr
 
 
 router = APIRouter(
@@ -28,42 +50,57 @@ router = APIRouter(
 # Set up logging
 logger = logging.getLogger(__name__)
 
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-# Dependency for OAuth2 authentication
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
+# Columns that may be requested through ?fields= on the listing endpoints
+USER_FIELDS = [name for name in UserResponse.__fields__ if name != "repositories"]
+USER_INCLUDES = {"repositories"}
+# Change markers behind the /retrieve ETag; sparse pages share them for simplicity
+USER_LIST_TABLES = (User.__tablename__, Repository.__tablename__)
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    hashed_password = await get_password_hash_async(user.password)
+    values = {
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "birth_date": user.birth_date,
+        "email": user.email,
+        "hashed_password": hashed_password,
+        "phone_number": user.phone_number,
+        "competition": user.competition,
+        "agreed_to_rules": user.agreed_to_rules,
+        "team_signup": user.team_signup,
+        "team_members": user.team_members,
+        "team_member_emails": user.team_member_emails,
+        "is_active": True,
+        "is_superuser": False,
+    }
+    return await run_db(db, _insert_user, values)
+
+
+def _get_user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
 
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        first_name=user.first_name,
-        last_name=user.last_name,
-        birth_date=user.birth_date,
-        email=user.email,
-        hashed_password=hashed_password,
-        phone_number=user.phone_number,
-        competition=user.competition,
-        agreed_to_rules=user.agreed_to_rules,
-        team_signup=user.team_signup,
-        team_members=user.team_members,
-        team_member_emails=user.team_member_emails,
-        is_active=True,
-        is_superuser=False
-    )
-    db.add(db_user)
 
+def _insert_user(db: Session, values: dict) -> dict:
+    """Insert a user in one statement; a unique conflict becomes a 400.
+
+    Duplicates are detected by the database, so two concurrent registrations
+    of the same email cannot both succeed. Only the rejected path pays an
+    extra query, to tell which column conflicted.
+    """
     try:
+        user_id = execute_insert_ignore(db, insert_ignore(db, User).values(**values))
+        if user_id is None:
+            db.rollback()
+            email_taken = db.execute(select(User.id).where(User.email == values["email"])).first()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered" if email_taken else "Phone number already registered"
+            )
         db.commit()
-        db.refresh(db_user)
+    except HTTPException:
+        raise
     except IntegrityError as e:
         db.rollback()
         logger.error(f"IntegrityError during user registration: {e}")
@@ -79,59 +116,224 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
             detail="Internal server error"
         )
 
-    return db_user
+    # A new user has no repositories yet, so the response needs no re-read
+    return {**values, "id": user_id, "repositories": []}
+
+
+def _too_many_attempts(e: RateLimited) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts, please retry later",
+        headers={"Retry-After": e.retry_after_header},
+    )
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
+    request: Request,
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    db_user = db.query(User).filter(User.email == form_data.username).first()
-    if not db_user or not verify_password(form_data.password, db_user.hashed_password):
+    # Admission control comes first, so a rejected attempt costs no hash and no query
+    try:
+        await login_ip_limit.take_async(request.client.host if request.client else "unknown")
+        await login_email_limit.take_async(form_data.username.strip().lower())
+        # Only the lookup touches the session; the verify runs in the hashing pool
+        db_user = await run_db(db, _get_user_by_email, form_data.username)
+        with login_verify_limit:
+            # Unknown emails verify against a dummy hash: same cost, same timing
+            valid, outdated = await verify_and_needs_update_async(
+                form_data.password, db_user.hashed_password if db_user else None
+            )
+    except RateLimited as e:
+        raise _too_many_attempts(e)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if outdated:
+        # Upgrade to the configured scheme and cost after the response is sent
+        background_tasks.add_task(rehash_password, db_user.id, db_user.hashed_password, form_data.password)
+
+    refresh_token = await run_db(db, start_refresh_family, db_user.id)
+    return _token_response(db_user.id, db_user.email, refresh_token)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: RefreshRequest, db: Session = Depends(get_db)):
+    # An HMAC and an indexed lookup; the password is not involved
+    refresh_token, user_id, email = await run_db(db, rotate_refresh_token, body.refresh_token)
+    return _token_response(user_id, email, refresh_token)
+
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: RefreshRequest, db: Session = Depends(get_db)):
+    # Idempotent: an unknown or already revoked token is not an error
+    await run_db(db, revoke_refresh_token, body.refresh_token)
+
+
+def _token_response(user_id: int, email: str, refresh_token: str) -> dict:
     access_token = create_access_token(
-        data={"sub": db_user.email},
-        expires_delta=access_token_expires
+        data={"sub": email},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user_id": db_user.id,
-        "email": db_user.email
+        "refresh_token": refresh_token,
+        "user_id": user_id,
+        "email": email
     }
 
 
-@router.get("/retrieve", response_model=List[UserResponse])
-def get_all_users(
-    current_user: User = Depends(get_current_user),
+def _parse_list(value: Optional[str], allowed, name: str) -> Optional[List[str]]:
+    if value is None:
+        return None
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in items if item not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {name}: {', '.join(unknown)}"
+        )
+    # An empty value (?fields=) is the same as leaving the parameter out
+    return items or None
+
+
+def _list_users(
+    db: Session,
+    fields: Optional[str],
+    include: Optional[str],
+    after: Optional[str],
+    limit: int,
+) -> dict:
+    """Load one page of users with only the requested columns and relationships.
+
+    Without ``fields`` or ``include`` every column and the repositories are
+    returned, as before. Rows are built from column tuples rather than ORM
+    objects, and repositories come from one extra SELECT ... IN query.
+    """
+    selected = _parse_list(fields, USER_FIELDS, "fields")
+    included = _parse_list(include, USER_INCLUDES, "include")
+    if selected is None and included is None:
+        included = ["repositories"]
+    selected = selected or USER_FIELDS
+    included = included or []
+
+    # id is the page key and the repositories join key, so it is always read
+    columns = selected if "id" in selected else selected + ["id"]
+    query = db.query(*[getattr(User, name) for name in columns])
+    users, next_cursor = paginate(query, (User.id,), after, limit)
+
+    rows = [{name: user[i] for i, name in enumerate(selected)} for user in users]
+    if "repositories" in included:
+        repositories = repositories_by_user(db, [user.id for user in users])
+        for row, user in zip(rows, users):
+            row["repositories"] = repositories[user.id]
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+@router.get(
+    "/retrieve",
+    response_model=Page[UserSparseResponse],
+    response_model_exclude_unset=True,
+)
+async def get_all_users(
+    request: Request,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Depends(page_size),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    users = db.query(User).all()
-    logger.debug(f"Retrieved users: {users}")
-    return users
+    # Answers If-None-Match with 304 while neither users nor repositories changed
+    return await conditional_json(
+        db,
+        request,
+        partial(table_versions, tables=USER_LIST_TABLES),
+        partial(_list_users, fields=fields, include=include, after=after, limit=limit),
+    )
 
 
-@router.get("/retrieve_debug", response_model=List[UserResponse])
-def get_all_users_debug(
-    current_user: User = Depends(get_current_user),
+@router.get(
+    "/retrieve_debug",
+    response_model=Page[UserSparseResponse],
+    response_model_exclude_unset=True,
+)
+async def get_all_users_debug(
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Depends(page_size),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    users = db.query(User).all()
+    page = await run_db(db, _list_users, fields, include, after, limit)
+    logger.debug(f"Retrieved {len(page['items'])} users: {[user.get('id') for user in page['items']]}")
+    return FastJSONResponse(page)
 
-    # Convert each user object to a dictionary for readable output
-    users_dicts = [user.__dict__.copy() for user in users]
-    for user_dict in users_dicts:
-        user_dict.pop('_sa_instance_state', None)
 
-    logger.debug(f"Retrieved users: {users_dicts}")
-    return users
+@router.get("/export")
+async def export_registrants(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    competition: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    """Stream every registrant with their repositories as NDJSON or CSV."""
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    writer = EXPORT_FORMATS[export_format]()
 
-from fastapi.security import OAuth2PasswordRequestForm
+    # The stream outlives the request dependencies, so it owns its session,
+    # from the same stack as get_db
+    if AsyncSessionLocal is not None:
+        async def stream():
+            async with AsyncSessionLocal() as db:
+                async for chunk in aiter_export(db, writer, competition):
+                    yield chunk
+    else:
+        def stream():
+            # Iterated on the threadpool by StreamingResponse
+            db = SessionLocal()
+            try:
+                yield from iter_export(db, writer, competition)
+            finally:
+                db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f'attachment; filename="registrants.{export_format}"'},
+    )
+
+
+@router.post("/import", response_model=ImportReport)
+async def import_users(
+    request: Request,
+    import_format: Optional[str] = Query(None, alias="format", regex="^(ndjson|csv)$"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Register a roster of users from an NDJSON or CSV body of UserCreate records."""
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    if import_format is None:
+        content_type = request.headers.get("content-type", "")
+        import_format = "csv" if "csv" in content_type else "ndjson"
+
+    data = (await request.body()).decode("utf-8-sig")
+    plan = await run_in_threadpool(prepare_import, data, import_format)
+    await run_db(db, mark_existing, plan)
+    hashes = await get_password_hashes_async([user.password for _, user in plan.pending])
+    await run_db(db, insert_pending, plan, hashes)
+    return plan.report()
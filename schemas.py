@@ -1,6 +1,14 @@
 from pydantic import BaseModel, EmailStr, Field, HttpUrl
+from pydantic.generics import GenericModel
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Dict, Generic, Optional, List, TypeVar
+
+T = TypeVar("T")
+
+# Pagination envelope
+class Page(GenericModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = Field(None, description="Pass as ?after= to fetch the next page")
 
 # User Schemas
 class UserBase(BaseModel):
@@ -67,13 +75,82 @@ class UserResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class UserSparseResponse(BaseModel):
+    """User row restricted to the columns requested with ``fields=``."""
+    id: Optional[int]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    email: Optional[EmailStr]
+    phone_number: Optional[str]
+    competition: Optional[str]
+    agreed_to_rules: Optional[bool]
+    team_signup: Optional[bool]
+    team_members: Optional[List[str]]
+    team_member_emails: Optional[List[EmailStr]]
+    is_active: Optional[bool]
+    is_superuser: Optional[bool]
+    repositories: Optional[List[RepositoryResponse]]
+
+# Search Schemas
+class SearchUserHit(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: EmailStr
+    competition: Optional[str]
+    team_members: Optional[List[str]]
+
+class SearchRepositoryHit(BaseModel):
+    id: int
+    user_id: int
+    repository_name: str
+    repository_url: str
+    description: Optional[str]
+
+class SearchResults(BaseModel):
+    """Best matches first (on SQLite; by id with the LIKE fallback)."""
+    users: List[SearchUserHit]
+    repositories: List[SearchRepositoryHit]
+
+# Stats Schemas
+class CompetitionStats(BaseModel):
+    competition: str
+    registrants: int
+    team_signups: int
+    solo_signups: int
+    team_members: int = Field(..., description="Members listed by the team signups")
+    average_team_size: Optional[float] = Field(None, description="Registrant plus listed members, per team signup")
+    repositories: int
+
+class CompetitionStatsResponse(BaseModel):
+    competitions: List[CompetitionStats] = Field(..., description="Registrants by their competition")
+    access: List[CompetitionStats] = Field(..., description="Users by the competitions they have access to")
+
+# Bulk import Schemas
+class ImportRowResult(BaseModel):
+    row: int
+    email: Optional[str]
+    status: str = Field(..., example="created")  # created, duplicate or invalid
+    detail: Optional[str]
+    user_id: Optional[int]
+
+class ImportReport(BaseModel):
+    created: int
+    duplicate: int
+    invalid: int
+    results: List[ImportRowResult]
+
 # Token Schemas
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str
     user_id: int
     email: EmailStr
 
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=1, max_length=256)
+
 class TokenData(BaseModel):
     email: Optional[EmailStr] = None
 
@@ -90,3 +167,17 @@ class PermissionResponse(PermissionBase):
 
     class Config:
         orm_mode = True
+
+class PermissionCheck(PermissionBase):
+    allowed: bool
+
+class PermissionBatch(BaseModel):
+    items: List[PermissionCreate] = Field(..., min_items=1, max_items=10000)
+
+class PermissionBatchResult(PermissionBase):
+    # assigned, already_assigned, revoked, not_found, user_not_found or duplicate
+    status: str = Field(..., example="assigned")
+
+class PermissionBatchReport(BaseModel):
+    counts: Dict[str, int] = Field(..., example={"assigned": 2, "already_assigned": 1})
+    results: List[PermissionBatchResult]
@@ -0,0 +1,120 @@
+# search.py
+import os
+import re
+from typing import Dict, List
+
+from sqlalchemy import String, and_, cast, column, func, literal_column, or_, select, table, text
+from sqlalchemy.orm import Session
+
+from models import Repository, User
+
+# Full-text search over registrants and repositories. On SQLite the queries go
+# to the FTS5 tables defined in models.py, ranked with bm25. Terms are first
+# matched as whole words, and as prefixes only when that finds fewer than
+# ``limit`` rows: a short prefix can expand to a term per row (every
+# "seed123" email token starts with "seed"), which whole words never do.
+# Elsewhere, or on a database migrated before the index
+# existed, each term becomes a case-insensitive LIKE on the same columns:
+# unranked and a full scan, but the same results for whole words.
+
+# Terms after the first MAX_TERMS are ignored
+MAX_TERMS = 8
+# Matches ranked per query; ranking is exact for queries matching fewer rows
+SEARCH_MAX_CANDIDATES = int(os.environ.get("SEARCH_MAX_CANDIDATES", 5000))
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+USER_HIT_COLUMNS = (User.id, User.first_name, User.last_name, User.email, User.competition, User.team_members)
+REPOSITORY_HIT_COLUMNS = (
+    Repository.id, Repository.user_id, Repository.repository_name, Repository.repository_url, Repository.description,
+)
+# bm25 weight of each indexed column, in SEARCH_INDEXES order: names first
+USER_WEIGHTS = (10.0, 10.0, 5.0, 3.0)
+REPOSITORY_WEIGHTS = (10.0, 3.0)
+
+users_fts = table("users_fts", column("rowid"))
+repositories_fts = table("repositories_fts", column("rowid"))
+
+# Engines found to have the FTS5 tables, or not; checked once per process
+_fts_engines: Dict[object, bool] = {}
+
+
+def search_terms(query: str) -> List[str]:
+    """Words of the query, lower-cased; punctuation (e.g. in emails) separates them."""
+    return _TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def match_expression(terms: List[str], prefix: bool = True) -> str:
+    # Quoted, so user input can never be read as FTS5 query syntax
+    star = "*" if prefix else ""
+    return " ".join(f'"{term}"{star}' for term in terms)
+
+
+def fts_available(db: Session) -> bool:
+    bind = db.get_bind()
+    if bind not in _fts_engines:
+        _fts_engines[bind] = bind.dialect.name == "sqlite" and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'")
+        ).first() is not None
+    return _fts_engines[bind]
+
+
+def _fts_query(fts, model, columns, weights, terms: List[str], limit: int, prefix: bool = True):
+    # Score at most SEARCH_MAX_CANDIDATES matches, newest first, then join the
+    # best ``limit`` of them to their rows. A word found in most rows would
+    # otherwise cost a bm25 evaluation per row.
+    name = literal_column(fts.name)
+    candidates = (
+        select(fts.c.rowid.label("rowid"), func.bm25(name, *weights).label("score"))
+        .where(name.op("MATCH")(match_expression(terms, prefix)))
+        .order_by(fts.c.rowid.desc())
+        .limit(SEARCH_MAX_CANDIDATES)
+        .subquery()
+    )
+    return (
+        select(*columns)
+        .join_from(candidates, model, model.id == candidates.c.rowid)
+        .order_by(candidates.c.score, candidates.c.rowid.desc())
+        .limit(limit)
+    )
+
+
+def _fts_rows(db: Session, fts, model, columns, weights, terms: List[str], limit: int) -> list:
+    rows = db.execute(_fts_query(fts, model, columns, weights, terms, limit, prefix=False)).all()
+    if len(rows) < limit:
+        # Prefix matches include every whole-word match, so this replaces them
+        rows = db.execute(_fts_query(fts, model, columns, weights, terms, limit)).all()
+    return rows
+
+
+def _like_pattern(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _like_query(model, columns, searched, terms: List[str], limit: int):
+    # Every term has to appear in at least one searched column
+    conditions = [
+        or_(*(searched_column.ilike(_like_pattern(term), escape="\\") for searched_column in searched))
+        for term in terms
+    ]
+    return select(*columns).where(and_(*conditions)).order_by(model.id).limit(limit)
+
+
+def search(db: Session, terms: List[str], limit: int) -> dict:
+    """Best matching users and repositories, at most ``limit`` of each."""
+    if fts_available(db):
+        users = _fts_rows(db, users_fts, User, USER_HIT_COLUMNS, USER_WEIGHTS, terms, limit)
+        repositories = _fts_rows(
+            db, repositories_fts, Repository, REPOSITORY_HIT_COLUMNS, REPOSITORY_WEIGHTS, terms, limit
+        )
+    else:
+        users = db.execute(_like_query(
+            User, USER_HIT_COLUMNS,
+            (User.first_name, User.last_name, User.email, cast(User.team_members, String)), terms, limit,
+        )).all()
+        repositories = db.execute(_like_query(
+            Repository, REPOSITORY_HIT_COLUMNS, (Repository.repository_name, Repository.description), terms, limit
+        )).all()
+    return {
+        "users": [dict(row._mapping) for row in users],
+        "repositories": [dict(row._mapping) for row in repositories],
+    }
@@ -0,0 +1,62 @@
+# serializers.py
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Permission, Repository
+
+# Response rows built straight from column tuples. The database is trusted to
+# hold values that already satisfy the response models, so the list endpoints
+# skip per-row pydantic validation and return these with FastJSONResponse.
+# The fields and formats here must stay in step with schemas.py.
+
+REPOSITORY_COLUMNS = (
+    Repository.repository_name,
+    Repository.repository_url,
+    Repository.description,
+    Repository.id,
+    Repository.user_id,
+    Repository.created_at,
+    Repository.updated_at,
+)
+PERMISSION_COLUMNS = (Permission.user_id, Permission.competition_access, Permission.id)
+
+# user_id values per IN (...) when loading repositories for a page of users
+REPOSITORY_LOOKUP_SIZE = 500
+
+
+def _as_date(value):
+    # RepositoryResponse declares created_at/updated_at as dates
+    return value.date() if isinstance(value, datetime) else value
+
+
+def repository_row(row) -> dict:
+    return {
+        "repository_name": row.repository_name,
+        "repository_url": row.repository_url,
+        "description": row.description,
+        "id": row.id,
+        "user_id": row.user_id,
+        "created_at": _as_date(row.created_at),
+        "updated_at": _as_date(row.updated_at),
+    }
+
+
+def permission_row(row) -> dict:
+    return {"user_id": row.user_id, "competition_access": row.competition_access, "id": row.id}
+
+
+def repositories_by_user(db: Session, user_ids: Iterable[int]) -> Dict[int, List[dict]]:
+    """Load the repositories of many users in a few IN (...) queries."""
+    user_ids = list(user_ids)
+    grouped: Dict[int, List[dict]] = {user_id: [] for user_id in user_ids}
+    for start in range(0, len(user_ids), REPOSITORY_LOOKUP_SIZE):
+        chunk = user_ids[start:start + REPOSITORY_LOOKUP_SIZE]
+        rows = db.execute(
+            select(*REPOSITORY_COLUMNS).where(Repository.user_id.in_(chunk)).order_by(Repository.user_id, Repository.id)
+        )
+        for row in rows:
+            grouped[row.user_id].append(repository_row(row))
+    return grouped
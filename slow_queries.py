@@ -0,0 +1,160 @@
+# slow_queries.py
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import metrics
+
+logger = logging.getLogger("slow_queries")
+
+# Statements slower than this are logged; a negative value turns the log off
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 200))
+# Each fingerprint is logged at most once per interval; repeats are counted
+SLOW_QUERY_LOG_INTERVAL = float(os.environ.get("SLOW_QUERY_LOG_INTERVAL", 60))
+# Cap on entries per minute across all fingerprints
+SLOW_QUERY_MAX_PER_MINUTE = int(os.environ.get("SLOW_QUERY_MAX_PER_MINUTE", 30))
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "1") == "1"
+
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROW_LIST = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so that queries differing only in values match.
+
+    Literals and placeholders become ``?`` and IN/VALUES lists of any length
+    collapse to one item, so ``id IN (1, 2)`` and ``id IN (?, ?, ?)`` agree.
+    """
+    normalized = " ".join(statement.split())
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(?...)", normalized)
+    normalized = _ROW_LIST.sub("(?...)", normalized)
+    return normalized
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """Describe bound parameters by type only; values may hold personal data."""
+    if executemany:
+        rows = list(parameters or [])
+        first = parameter_shape(rows[0], False) if rows else "()"
+        return f"{len(rows)} x {first}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+
+class SlowQueryLog:
+    """Logs statements slower than a threshold, with their query plan.
+
+    Entries are deduplicated by fingerprint: one per ``interval`` seconds,
+    reporting how many similar slow statements were suppressed in between,
+    and never more than ``max_per_minute`` in total.
+    """
+
+    def __init__(self, threshold_ms: float, interval: float, max_per_minute: int, explain: bool):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.max_per_minute = max_per_minute
+        self.explain = explain
+        self._last_logged: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._window_start = 0.0
+        self._window_count = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Forget what was logged, e.g. between test cases."""
+        with self._lock:
+            self._last_logged.clear()
+            self._suppressed.clear()
+            self._window_start, self._window_count = 0.0, 0
+
+    def install(self, engine: Engine):
+        if self.threshold < 0 or event.contains(engine, "before_cursor_execute", self._before):
+            return
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_start = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._slow_query_start
+        if elapsed < self.threshold:
+            return
+        key = hashlib.sha1(fingerprint(statement).encode()).hexdigest()[:12]
+        suppressed = self._admit(key)
+        if suppressed is None:
+            return
+
+        stats = metrics.request_stats.get()
+        origin = f"{stats.method} {stats.route}" if stats is not None else "outside a request"
+        plan = self._plan(conn, statement, parameters, executemany) if self.explain else None
+        lines = [
+            f"Slow query {key}: {elapsed * 1000:.1f} ms in {origin}"
+            + (f" (+{suppressed} similar since last report)" if suppressed else ""),
+            f"  SQL: {' '.join(statement.split())}",
+            f"  Parameters: {parameter_shape(parameters, executemany)}",
+        ]
+        if plan:
+            lines.append("  Plan:")
+            lines.extend(f"    {line}" for line in plan)
+        logger.warning("\n".join(lines))
+
+    def _admit(self, key: str) -> Optional[int]:
+        """Return the suppressed count if this entry may be logged now, else ``None``."""
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_logged.get(key)
+            if last is not None and now - last < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return None
+            if now - self._window_start >= 60:
+                self._window_start, self._window_count = now, 0
+            if self._window_count >= self.max_per_minute:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return None
+            self._window_count += 1
+            self._last_logged[key] = now
+            return self._suppressed.pop(key, 0)
+
+    def _plan(self, conn, statement: str, parameters, executemany: bool) -> Optional[List[str]]:
+        words = statement.lstrip().split(None, 1)
+        if not words or words[0].upper() not in EXPLAINABLE:
+            return None
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        dialect = conn.dialect.name
+        prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+        try:
+            # A raw DBAPI cursor on the same connection: no events, same transaction
+            explain_cursor = conn.connection.cursor()
+            try:
+                explain_cursor.execute(prefix + statement, parameters)
+                rows = explain_cursor.fetchall()
+            finally:
+                explain_cursor.close()
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        if dialect == "sqlite":
+            return [row[-1] for row in rows]
+        return [" ".join(str(value) for value in row) for row in rows]
+
+
+slow_query_log = SlowQueryLog(
+    SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_INTERVAL, SLOW_QUERY_MAX_PER_MINUTE, SLOW_QUERY_EXPLAIN
+)
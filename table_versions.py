@@ -0,0 +1,59 @@
+# table_versions.py
+from itertools import chain
+from typing import Sequence, Tuple
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from models import TRACKED_TABLES, TableVersion
+
+# Every commit that writes to a tracked table bumps its row in table_versions,
+# in the same transaction. Readers compare versions instead of rows, e.g. to
+# build ETags. Writes are seen whether they go through the unit of work
+# (flushes) or through Session.execute (Core insert/update/delete); statements
+# run on a bare Connection are not.
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    tables = session.info.setdefault("changed_tables", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        name = getattr(obj, "__tablename__", None)
+        if name in TRACKED_TABLES and (obj not in session.dirty or session.is_modified(obj)):
+            tables.add(name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_table(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        name = getattr(orm_execute_state.statement.table, "name", None)
+        if name in TRACKED_TABLES:
+            orm_execute_state.session.info.setdefault("changed_tables", set()).add(name)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_table_versions(session):
+    # Pending changes are otherwise flushed after this hook has run
+    session.flush()
+    tables = session.info.pop("changed_tables", None)
+    if tables:
+        session.connection().execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.name.in_(sorted(tables)))
+            .values(version=TableVersion.version + 1)
+        )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_table_changes(session, transaction):
+    # A rolled-back transaction changed nothing
+    if transaction.parent is None:
+        session.info.pop("changed_tables", None)
+
+
+def table_versions(db: Session, tables: Sequence[str]) -> Tuple[int, ...]:
+    """Current versions of ``tables``, in the order given."""
+    versions = dict(
+        db.execute(select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(tables))).all()
+    )
+    return tuple(versions.get(name, 0) for name in tables)
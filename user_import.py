@@ -0,0 +1,195 @@
+# user_import.py
+import csv
+import io
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import User
+from schemas import UserCreate
+
+logger = logging.getLogger(__name__)
+
+# SQLite binds at most 999 parameters per statement. Batches are sized by the
+# parameters each record binds: a users row per insert (drivers such as
+# psycopg2 send a batch as one multi-row VALUES statement), an email and a
+# phone number per existence lookup
+MAX_BOUND_PARAMETERS = 999
+IMPORT_BATCH_SIZE = MAX_BOUND_PARAMETERS // len(User.__table__.columns)
+LOOKUP_CHUNK_SIZE = MAX_BOUND_PARAMETERS // 2
+
+LIST_FIELDS = ("team_members", "team_member_emails")
+BOOL_FIELDS = ("agreed_to_rules", "team_signup")
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _csv_record(row: Dict[str, str]) -> dict:
+    record = {key: value for key, value in row.items() if key and value not in (None, "")}
+    for field in LIST_FIELDS:
+        if field in record:
+            record[field] = [item.strip() for item in record[field].split(";") if item.strip()]
+    for field in BOOL_FIELDS:
+        if field in record:
+            record[field] = record[field].strip().lower() in ("1", "true", "yes", "y")
+    return record
+
+
+def parse_records(data: str, fmt: str) -> List[Tuple[int, object]]:
+    """Split an NDJSON or CSV payload into ``(row_number, record)`` pairs.
+
+    A record that cannot be decoded is returned as the error message string.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(data))
+        return [(number, _csv_record(row)) for number, row in enumerate(reader, start=1)]
+
+    records = []
+    for number, line in enumerate(data.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            records.append((number, json.loads(line)))
+        except json.JSONDecodeError as e:
+            records.append((number, f"Invalid JSON: {e.msg}"))
+    return records
+
+
+class ImportPlan:
+    """Per-row state of one bulk import, filled in phase by phase."""
+
+    def __init__(self):
+        self.results: Dict[int, dict] = {}
+        self.pending: List[Tuple[int, UserCreate]] = []
+
+    def reject(self, row: int, email: Optional[str], status: str, detail: str):
+        self.results[row] = {"row": row, "email": email, "status": status, "detail": detail}
+
+    def report(self) -> dict:
+        results = [self.results[row] for row in sorted(self.results)]
+        counts = {"created": 0, "duplicate": 0, "invalid": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return {**counts, "results": results}
+
+
+def prepare_import(data: str, fmt: str) -> ImportPlan:
+    """Validate every record and drop duplicates within the payload itself."""
+    plan = ImportPlan()
+    seen_emails: Set[str] = set()
+    seen_phones: Set[str] = set()
+    for row, record in parse_records(data, fmt):
+        if isinstance(record, str):
+            plan.reject(row, None, "invalid", record)
+            continue
+        try:
+            user = UserCreate.parse_obj(record)
+        except ValidationError as e:
+            email = record.get("email") if isinstance(record, dict) else None
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            plan.reject(row, email, "invalid", errors)
+            continue
+        if user.email in seen_emails:
+            plan.reject(row, user.email, "duplicate", "Email appears earlier in this import")
+            continue
+        if user.phone_number in seen_phones:
+            plan.reject(row, user.email, "duplicate", "Phone number appears earlier in this import")
+            continue
+        seen_emails.add(user.email)
+        seen_phones.add(user.phone_number)
+        plan.pending.append((row, user))
+    return plan
+
+
+def mark_existing(db: Session, plan: ImportPlan):
+    """Drop records whose email or phone number is already registered."""
+    existing_emails: Set[str] = set()
+    existing_phones: Set[str] = set()
+    for chunk in _chunks(plan.pending, LOOKUP_CHUNK_SIZE):
+        emails = [user.email for _, user in chunk]
+        phones = [user.phone_number for _, user in chunk]
+        rows = db.execute(
+            select(User.email, User.phone_number).where(
+                or_(User.email.in_(emails), User.phone_number.in_(phones))
+            )
+        )
+        for email, phone in rows:
+            existing_emails.add(email)
+            existing_phones.add(phone)
+
+    pending = []
+    for row, user in plan.pending:
+        if user.email in existing_emails:
+            plan.reject(row, user.email, "duplicate", "Email already registered")
+        elif user.phone_number in existing_phones:
+            plan.reject(row, user.email, "duplicate", "Phone number already registered")
+        else:
+            pending.append((row, user))
+    plan.pending = pending
+
+
+def _user_values(user: UserCreate, hashed_password: str) -> dict:
+    return {
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "birth_date": user.birth_date,
+        "email": user.email,
+        "hashed_password": hashed_password,
+        "phone_number": user.phone_number,
+        "competition": user.competition,
+        "agreed_to_rules": user.agreed_to_rules,
+        "team_signup": user.team_signup,
+        "team_members": user.team_members,
+        "team_member_emails": user.team_member_emails,
+        "is_active": True,
+        "is_superuser": False,
+    }
+
+
+def insert_pending(db: Session, plan: ImportPlan, hashes: List[str]):
+    """Insert the remaining records in batched transactions.
+
+    ``hashes`` lines up with ``plan.pending``. A batch that hits a uniqueness
+    race is retried row by row so only the conflicting rows are reported.
+    """
+    rows = [(row, user, hashed) for (row, user), hashed in zip(plan.pending, hashes)]
+    for batch in _chunks(rows, IMPORT_BATCH_SIZE):
+        try:
+            db.execute(insert(User), [_user_values(user, hashed) for _, user, hashed in batch])
+            db.commit()
+            inserted = batch
+        except IntegrityError:
+            db.rollback()
+            inserted = []
+            for row, user, hashed in batch:
+                try:
+                    db.execute(insert(User), [_user_values(user, hashed)])
+                    db.commit()
+                    inserted.append((row, user, hashed))
+                except IntegrityError as e:
+                    db.rollback()
+                    logger.info(f"Bulk import row {row} conflicted: {e.orig}")
+                    plan.reject(row, user.email, "duplicate", "Email or phone number already registered")
+
+        ids = {}
+        for chunk in _chunks(inserted, LOOKUP_CHUNK_SIZE):
+            ids.update(db.execute(
+                select(User.email, User.id).where(User.email.in_([user.email for _, user, _ in chunk]))
+            ).all())
+        for row, user, _ in inserted:
+            plan.results[row] = {
+                "row": row,
+                "email": user.email,
+                "status": "created",
+                "detail": None,
+                "user_id": ids.get(user.email),
+            }
+    plan.pending = []
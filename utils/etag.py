@@ -0,0 +1,98 @@
+# utils/etag.py
+import hashlib
+from typing import Callable, Optional, Sequence
+
+from fastapi import Request, Response, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import run_db
+from utils.response_cache import response_cache
+from utils.responses import FastJSONResponse
+
+
+def _digest(parts: Sequence) -> str:
+    return hashlib.sha1(repr(tuple(parts)).encode()).hexdigest()
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over ``parts``: equal parts mean an equivalent representation."""
+    return 'W/"%s"' % _digest(parts)[:20]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+
+def _etag(key: str) -> str:
+    return 'W/"%s"' % key[:20]
+
+
+def _not_modified(request: Request, key: str) -> Optional[Response]:
+    etag = _etag(key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+
+def _cached(key: str, body: Optional[bytes]) -> Optional[Response]:
+    if body is None:
+        return None
+    return Response(body, media_type="application/json", headers={"ETag": _etag(key)})
+
+
+def _cache_key(db: Session, request: Request, version: Callable[[Session], Sequence]) -> str:
+    return _digest((request.url.path, request.url.query, *version(db)))
+
+
+def _conditional_json(
+    db: Session,
+    request: Request,
+    version: Callable[[Session], Sequence],
+    load: Callable[[Session], object],
+) -> Response:
+    key = _cache_key(db, request, version)
+    response = _not_modified(request, key) or _cached(key, response_cache.get(key))
+    if response is None:
+        response = FastJSONResponse(load(db), headers={"ETag": _etag(key)})
+        response_cache.set(key, response.body)
+    return response
+
+
+async def conditional_json(
+    db: Session,
+    request: Request,
+    version: Callable[[Session], Sequence],
+    load: Callable[[Session], object],
+) -> Response:
+    """Serve ``load(db)`` as JSON with an ETag, or a bodiless 304 if the client has it.
+
+    ``version`` returns cheap change markers covering everything the response
+    depends on, including the caller when the content is per-user. It is read
+    before ``load``, so a concurrent write can leave the ETag older than the
+    body (one extra download later) but never newer.
+
+    Rendered bodies are kept in ``response_cache`` under the same markers, so
+    a write invalidates them by changing the key; nothing has to be purged.
+    """
+    if not response_cache.blocking:
+        return await run_db(db, _conditional_json, request, version, load)
+    # The cache waits on file I/O: it runs on the threadpool, between the
+    # version read and the load rather than inside them (which, under
+    # DB_MODE=async, run on the event loop)
+    key = await run_db(db, _cache_key, request, version)
+    response = _not_modified(request, key) or _cached(key, await run_in_threadpool(response_cache.get, key))
+    if response is None:
+        response = FastJSONResponse(await run_db(db, load), headers={"ETag": _etag(key)})
+        await run_in_threadpool(response_cache.set, key, response.body)
+    return response
@@ -0,0 +1,103 @@
+# utils/hashing_pool.py
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import metrics
+from utils import security
+
+# Pool sizing (override with environment variables)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_MAX_PENDING = int(
+    os.environ.get("PASSWORD_HASH_MAX_PENDING", PASSWORD_HASH_WORKERS * 16)
+)
+# Passwords per job when hashing a bulk import
+PASSWORD_HASH_BATCH_SIZE = 32
+
+
+def hash_batch(passwords: List[str]) -> List[str]:
+    return [security.get_password_hash(password) for password in passwords]
+
+
+class HashingPoolFull(Exception):
+    """Raised when too many hash/verify jobs are already queued."""
+
+
+class HashingPool:
+    """Bounded process pool for password hashing work.
+
+    Hashing runs in separate processes so a burst of logins cannot starve the
+    event loop or Starlette's shared threadpool. ``max_pending`` caps the
+    number of jobs queued or running; callers past that get ``HashingPoolFull``
+    instead of waiting in an unbounded queue.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so that forking servers start the pool in each worker
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            raise HashingPoolFull("Password hashing queue is full")
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+            metrics.observe_hash(fn.__name__, time.perf_counter() - start)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(security.get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(security.verify_password, plain_password, hashed_password)
+
+    async def verify_and_needs_update(self, plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, bool]:
+        return await self.run(security.verify_and_needs_update, plain_password, hashed_password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash a bulk import across all workers.
+
+        At most one batch per worker is queued at a time, so interactive
+        logins submitted meanwhile are not stuck behind the whole import.
+        """
+        batches = [
+            passwords[start:start + PASSWORD_HASH_BATCH_SIZE]
+            for start in range(0, len(passwords), PASSWORD_HASH_BATCH_SIZE)
+        ]
+        slots = asyncio.Semaphore(self.workers)
+
+        async def run_batch(batch):
+            async with slots:
+                return await self.run(hash_batch, batch)
+
+        results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        return [hashed for batch in results for hashed in batch]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
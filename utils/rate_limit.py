@@ -0,0 +1,219 @@
+# utils/rate_limit.py
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+
+from utils.hashing_pool import PASSWORD_HASH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Admission control for /users/login, checked before any password is hashed:
+# a token bucket per client IP and per email, and a cap on concurrent
+# verifications. Rejections are cheap 429s with Retry-After.
+# Bucket state lives in a store: "memory" (per process), "sqlite" (one file
+# shared by every worker on the host, so the limits hold across gunicorn
+# workers) or "off". A store error admits the request rather than failing it.
+LOGIN_RATE_LIMIT = os.environ.get("LOGIN_RATE_LIMIT", "memory")
+LOGIN_RATE_LIMIT_PATH = os.environ.get("LOGIN_RATE_LIMIT_PATH", "./rate_limit.db")
+# A whole school may log in from one address, so the IP bucket is the larger
+LOGIN_IP_BURST = float(os.environ.get("LOGIN_IP_BURST", 30))
+LOGIN_IP_PER_MINUTE = float(os.environ.get("LOGIN_IP_PER_MINUTE", 30))
+LOGIN_EMAIL_BURST = float(os.environ.get("LOGIN_EMAIL_BURST", 10))
+LOGIN_EMAIL_PER_MINUTE = float(os.environ.get("LOGIN_EMAIL_PER_MINUTE", 5))
+# Per process, like the hashing pool it protects
+LOGIN_MAX_CONCURRENT_VERIFIES = int(
+    os.environ.get("LOGIN_MAX_CONCURRENT_VERIFIES", PASSWORD_HASH_WORKERS * 2)
+)
+
+
+class RateLimited(Exception):
+    """Raised when a limit rejects a request; ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+
+def _outcome(tokens: float, rate: float) -> float:
+    """0 when a token was available, otherwise the seconds until one is."""
+    return 0.0 if tokens >= 1 else (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Token buckets in this process, at most ``max_keys`` of them.
+
+    The least recently used buckets are dropped first; a dropped bucket
+    comes back full, which is what an idle one would have refilled to.
+    """
+
+    # Never waits on I/O, so it is checked on the event loop
+    blocking = False
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated_at, now, rate, burst)
+            wait = _outcome(tokens, rate)
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """Token buckets in a local SQLite file, shared by every worker process.
+
+    Each take is one short write transaction. Rows whose bucket has refilled
+    completely carry no state and are deleted every PRUNE_INTERVAL seconds.
+    """
+
+    PRUNE_INTERVAL = 60.0
+    # Waits on the file lock, so checks run in the threadpool
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._pruned_at = time.time()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and per process; never reused across a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            # Each check holds a threadpool thread, so never wait long for the lock
+            connection = sqlite3.connect(self.path, timeout=0.1, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_rate_limits_full_at ON rate_limits (full_at)")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.time()
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute("SELECT tokens, updated_at FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                tokens = _refill(row[0], row[1], now, rate, burst) if row else burst
+                wait = _outcome(tokens, rate)
+                if not wait:
+                    tokens -= 1
+                connection.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, now + (burst - tokens) / rate),
+                )
+                if now - self._pruned_at > self.PRUNE_INTERVAL:
+                    self._pruned_at = now
+                    connection.execute("DELETE FROM rate_limits WHERE full_at <= ?", (now,))
+            return wait
+        except sqlite3.Error as e:
+            logger.debug("Rate limit store failed, admitting: %s", e)
+            return 0.0
+
+    def clear(self):
+        self._connection().execute("DELETE FROM rate_limits")
+
+
+class NullBucketStore:
+    blocking = False
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        return 0.0
+
+    def clear(self):
+        pass
+
+
+def make_bucket_store(backend: str = LOGIN_RATE_LIMIT):
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore(LOGIN_RATE_LIMIT_PATH)
+    if backend == "off":
+        return NullBucketStore()
+    raise ValueError(f"Unknown LOGIN_RATE_LIMIT backend: {backend}")
+
+
+class TokenBucket:
+    """One limit, e.g. logins per client IP: ``burst`` at once, refilled at ``per_minute``."""
+
+    def __init__(self, name: str, burst: float, per_minute: float, store):
+        self.name = name
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.store = store
+
+    def _key(self, identity: str) -> str:
+        # Identities are hashed so the shared store holds no emails or addresses
+        return self.name + ":" + hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+    def take(self, identity: str):
+        wait = self.store.take(self._key(identity), self.rate, self.burst)
+        if wait:
+            raise RateLimited(wait)
+
+    async def take_async(self, identity: str):
+        """``take`` for the event loop: stores that wait on I/O run in the threadpool."""
+        if not self.store.blocking:
+            return self.take(identity)
+        wait = await run_in_threadpool(self.store.take, self._key(identity), self.rate, self.burst)
+        if wait:
+            raise RateLimited(wait)
+
+
+class ConcurrencyLimit:
+    """Non-blocking cap on concurrent operations; past it, callers get RateLimited.
+
+    Used from the event loop, so the counter needs no lock.
+    """
+
+    def __init__(self, limit: int, retry_after: float = 1.0):
+        self.limit = limit
+        self.retry_after = retry_after
+        self.active = 0
+
+    def __enter__(self):
+        if self.active >= self.limit:
+            raise RateLimited(self.retry_after)
+        self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.active -= 1
+
+
+login_bucket_store = make_bucket_store()
+login_ip_limit = TokenBucket("login_ip", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE, login_bucket_store)
+login_email_limit = TokenBucket("login_email", LOGIN_EMAIL_BURST, LOGIN_EMAIL_PER_MINUTE, login_bucket_store)
+login_verify_limit = ConcurrencyLimit(LOGIN_MAX_CONCURRENT_VERIFIES)
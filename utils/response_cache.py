@@ -0,0 +1,197 @@
+# utils/response_cache.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# "memory" (per process), "sqlite" (one file shared by every worker on the host) or "off"
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "memory")
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Keys carry the data version, so entries never go stale through the API; the
+# TTL bounds staleness after writes that bypass the Session
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 300))
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "./response_cache.db")
+
+
+class MemoryResponseCache:
+    """Thread-safe LRU of response bodies, capped by total size in bytes."""
+
+    # Never waits on I/O, so it is used wherever the response is built
+    blocking = False
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, body: bytes):
+        # A body that would take over the whole cache is not worth keeping
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (body, time.time() + self.ttl)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str):
+        body, _ = self._data.pop(key)
+        self._size -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "entries": len(self._data), "bytes": self._size,
+                "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+class SQLiteResponseCache:
+    """Response bodies in a local SQLite file, shared by every worker process.
+
+    Eviction is approximately LRU: a hit refreshes an entry's access time at
+    most once a second, so reads rarely take the file's write lock. Cache
+    errors (e.g. a busy file) count as misses; they never fail a request.
+    """
+
+    TOUCH_INTERVAL = 1.0
+    # Waits on the file lock, so it is used from the threadpool
+    blocking = True
+
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and per process; never reused across a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Losing cache entries on a crash is harmless
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_response_cache_accessed_at ON response_cache (accessed_at)"
+            )
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT body, expires_at, accessed_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                if now - row[2] > self.TOUCH_INTERVAL:
+                    connection.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return row[0]
+        except sqlite3.Error as e:
+            logger.debug("Response cache read failed: %s", e)
+        self.misses += 1
+        return None
+
+    def set(self, key: str, body: bytes):
+        if len(body) > self.max_bytes // 4:
+            return
+        now = time.time()
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, body, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, body, len(body), now + self.ttl, now),
+                )
+                connection.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+                size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+                if size > self.max_bytes:
+                    # Drop least recently used entries until the total is back under the cap
+                    evict = []
+                    for old_key, old_size in connection.execute(
+                        "SELECT key, size FROM response_cache ORDER BY accessed_at"
+                    ).fetchall():
+                        if size <= self.max_bytes:
+                            break
+                        evict.append((old_key,))
+                        size -= old_size
+                    connection.executemany("DELETE FROM response_cache WHERE key = ?", evict)
+        except sqlite3.Error as e:
+            logger.debug("Response cache write failed: %s", e)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM response_cache")
+
+    def stats(self) -> dict:
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+        ).fetchone()
+        return {"backend": "sqlite", "entries": entries, "bytes": size,
+                "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+class NullResponseCache:
+    blocking = False
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, body: bytes):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "off"}
+
+
+def make_response_cache(backend: str = RESPONSE_CACHE):
+    if backend == "memory":
+        return MemoryResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+    if backend == "sqlite":
+        return SQLiteResponseCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+    if backend == "off":
+        return NullResponseCache()
+    raise ValueError(f"Unknown RESPONSE_CACHE backend: {backend}")
+
+
+response_cache = make_response_cache()
@@ -0,0 +1,32 @@
+# utils/responses.py
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for content that is already plain dicts, lists and scalars.
+
+    Routes opt in by returning it directly, which skips FastAPI's
+    ``response_model`` validation and ``jsonable_encoder`` pass. Use it only for
+    rows built from trusted database columns that already match the declared
+    response model. Encodes with orjson when installed.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -1,10 +1,125 @@
 # utils/security.py
+import os
+import statistics
+import time
+from typing import Dict, Optional, Tuple
+
 from passlib.context import CryptContext
+from passlib.hash import argon2
+
+# The one place passwords are hashed and verified. The hashing pool's worker
+# processes import this module too, so they read the same settings.
+#
+# PASSWORD_HASH_SCHEME picks the scheme for new hashes: bcrypt, or argon2
+# (argon2id, needs the argon2-cffi package). Hashes in the other scheme, or
+# cheaper than the configured cost, still verify; needs_update reports them so
+# login can replace them. bcrypt hashes costlier than BCRYPT_ROUNDS are kept.
+# Pick the costs for the deployment host with:
+#   python create_superuser.py calibrate-hashing --target-ms 250
+PASSWORD_HASH_SCHEME = os.environ.get("PASSWORD_HASH_SCHEME", "bcrypt")
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", 65536))  # KiB
+# One lane per hash: the hashing pool already runs a process per core
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", 1))
+
+SCHEMES = ("bcrypt", "argon2")
+# Below this the calibration does not go, however slow the host
+MIN_BCRYPT_ROUNDS = 10
+MIN_ARGON2_TIME_COST = 2
+
+
+def make_context(
+    scheme: str = PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = BCRYPT_ROUNDS,
+    argon2_time_cost: int = ARGON2_TIME_COST,
+    argon2_memory_cost: int = ARGON2_MEMORY_COST,
+    argon2_parallelism: int = ARGON2_PARALLELISM,
+) -> CryptContext:
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unknown password hash scheme: {scheme}")
+    if scheme == "argon2" and not argon2.has_backend():
+        raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 needs the argon2-cffi package")
+    return CryptContext(
+        schemes=[scheme] + [other for other in SCHEMES if other != scheme],
+        deprecated="auto",
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = make_context()
 
-def get_password_hash(password):
+
+def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def verify_password(plain_password, hashed_password):
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def needs_update(hashed_password: str) -> bool:
+    """True if the hash is in a deprecated scheme or below the configured cost."""
+    return pwd_context.needs_update(hashed_password)
+
+
+def verify_and_needs_update(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, bool]:
+    """``(valid, needs_update)`` in one job; the rehash itself is left to the caller.
+
+    Without a hash (an unknown user) a dummy hash of the configured scheme and
+    cost is verified instead, so the answer takes as long as for a real user.
+    """
+    if hashed_password is None:
+        return pwd_context.dummy_verify(), False
+    valid = pwd_context.verify(plain_password, hashed_password)
+    return valid, valid and pwd_context.needs_update(hashed_password)
+
+
+def _verify_ms(context: CryptContext, samples: int) -> float:
+    hashed = context.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify("calibration-password", hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(scheme: str, target_ms: float, samples: int = 3,
+              argon2_memory_cost: int = ARGON2_MEMORY_COST,
+              argon2_parallelism: int = ARGON2_PARALLELISM) -> Dict[str, object]:
+    """The highest cost whose median verify time on this host stays within ``target_ms``.
+
+    bcrypt doubles its work per round; argon2 raises time_cost at a fixed
+    memory cost. The result never goes below MIN_BCRYPT_ROUNDS or
+    MIN_ARGON2_TIME_COST.
+    """
+    if scheme == "bcrypt":
+        setting, cost, limit = "BCRYPT_ROUNDS", MIN_BCRYPT_ROUNDS, 20
+
+        def context_for(value):
+            return make_context("bcrypt", bcrypt_rounds=value)
+    else:
+        setting, cost, limit = "ARGON2_TIME_COST", MIN_ARGON2_TIME_COST, 50
+
+        def context_for(value):
+            return make_context("argon2", argon2_time_cost=value, argon2_memory_cost=argon2_memory_cost,
+                                argon2_parallelism=argon2_parallelism)
+
+    measured = {cost: _verify_ms(context_for(cost), samples)}
+    while cost < limit:
+        elapsed = _verify_ms(context_for(cost + 1), samples)
+        if elapsed > target_ms:
+            break
+        cost += 1
+        measured[cost] = elapsed
+
+    settings = {"PASSWORD_HASH_SCHEME": scheme, setting: cost}
+    if scheme == "argon2":
+        settings.update(ARGON2_MEMORY_COST=argon2_memory_cost, ARGON2_PARALLELISM=argon2_parallelism)
+    return {"settings": settings, "verify_ms": round(measured[cost], 1), "target_ms": target_ms}
+
@@ -0,0 +1,66 @@
+# utils/upsert.py
+from typing import List, Optional, Sequence, Set
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+
+def insert_ignore(db: Session, model):
+    """Return ``INSERT ... ON CONFLICT DO NOTHING`` for the session's dialect.
+
+    Rows that would violate a unique constraint are skipped by the database
+    instead of raising ``IntegrityError``.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+        return postgresql_insert(model).on_conflict_do_nothing()
+    if dialect == "mysql":
+        return insert(model).prefix_with("IGNORE")
+    raise NotImplementedError(f"insert_ignore is not supported on {dialect}")
+
+
+def execute_insert_ignore(db: Session, stmt) -> Optional[int]:
+    """Run a single-row ``insert_ignore`` statement in one round trip.
+
+    Returns the new row's primary key, or ``None`` when a unique constraint
+    swallowed the row. PostgreSQL reports the key with RETURNING; SQLite and
+    MySQL report it through the cursor's lastrowid.
+    """
+    pk = list(stmt.table.primary_key.columns)[0]
+    if db.get_bind().dialect.name == "postgresql":
+        return db.execute(stmt.returning(pk)).scalar()
+    result = db.execute(stmt)
+    if not result.rowcount:
+        return None
+    return result.lastrowid
+
+
+def insert_ignore_rows(db: Session, model, rows: List[dict], key: Sequence[str]) -> Set[tuple]:
+    """Insert ``rows`` with ``insert_ignore`` and return the ``key`` values of those written.
+
+    Rows skipped by a unique constraint, whether they existed beforehand or
+    were committed concurrently, are left out. PostgreSQL reports the rows
+    with RETURNING. On SQLite the statement holds the write lock, so the rows
+    it wrote have consecutive ids ending at lastrowid and are read back by
+    that range. Elsewhere each row is inserted on its own and its rowcount
+    checked.
+    """
+    if not rows:
+        return set()
+    columns = [getattr(model, name) for name in key]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return set(map(tuple, db.execute(insert_ignore(db, model).values(rows).returning(*columns))))
+    if dialect == "sqlite":
+        result = db.execute(insert_ignore(db, model).values(rows))
+        if not result.rowcount:
+            return set()
+        pk = list(model.__table__.primary_key.columns)[0]
+        last = result.lastrowid
+        return set(map(tuple, db.execute(select(*columns).where(pk > last - result.rowcount, pk <= last))))
+    stmt = insert_ignore(db, model)
+    return {tuple(row[name] for name in key) for row in rows if db.execute(stmt, row).rowcount}